@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Compares per-sample conversions with the batch conversions of ftdu.calibration.
+"""
+import timeit
+from array import array
+from ftdu.calibration import Linear, Table
+
+N = 1000000
+
+
+def main():
+    values = array('i', (i % 10000 for i in range(N)))
+    linear = Linear(0.001, unit='V')
+    table = Table([(0, 100), (1000, 60), (5000, 20), (10000, 5)])
+    for name, conv in (('linear', linear), ('table', table)):
+        t_loop = min(timeit.repeat(lambda: [conv(v) for v in values], number=1, repeat=3))
+        t_batch = min(timeit.repeat(lambda: conv.batch(values), number=1, repeat=3))
+        print('{0:<8} per sample: {1:8.1f} ms   batch: {2:8.1f} ms  ({3} samples)'
+              .format(name, t_loop * 1000, t_batch * 1000, N))
+
+
+if __name__ == '__main__':
+    main()
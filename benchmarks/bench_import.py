@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Measures the time of "import ftdu" in a fresh interpreter.
+
+"import ftdu" does not import pyserial, the second line shows the time
+which was spent if the serial stack were imported eagerly.
+"""
+import os
+import subprocess
+import sys
+import time
+
+REPEAT = 20
+
+
+def _measure(stmt):
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    cmd = [sys.executable, '-c', stmt]
+    subprocess.check_call(cmd, env=env)  # Warm up, writes the byte code
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.check_call(cmd, env=env)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    base = _measure('pass')
+    lazy = _measure('import ftdu, sys; assert "serial" not in sys.modules')
+    eager = _measure('import ftdu, serial, serial.tools.list_ports')
+    print('interpreter startup:             {0:6.1f} ms'.format(base * 1000))
+    print('import ftdu:                     {0:6.1f} ms (+{1:.1f} ms)'.format(lazy * 1000, (lazy - base) * 1000))
+    print('import ftdu + pyserial (eager):  {0:6.1f} ms (+{1:.1f} ms)'.format(eager * 1000, (eager - base) * 1000))
+
+
+if __name__ == '__main__':
+    main()
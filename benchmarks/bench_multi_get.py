@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Snapshot of all inputs and counters with one command per port (pipelining)
+and with the multi_get command.
+
+The emulator needs 50 us per command to simulate the parsing of a command
+by the sketch.
+"""
+import time
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+
+COUNT = 500
+
+
+def _slow(emu):
+    def handle(request):
+        time.sleep(0.00005)
+        return emu.handle(request)
+    return handle
+
+
+def run(features):
+    ftd = ftdu.BaseFtDuino(transport=LoopbackTransport(_slow(Emulator(features=features))))
+    values = ftd.snapshot()
+    start = time.perf_counter()
+    for _ in range(COUNT):
+        ftd.snapshot(values)
+    return (time.perf_counter() - start) / COUNT
+
+
+def main():
+    pipelined = run(())
+    multi = run((ftdu.FEATURE_MULTI_GET,))
+    print('pipelined: {0:7.1f} us per snapshot'.format(pipelined * 1e6))
+    print('multi_get: {0:7.1f} us per snapshot ({1:.1f}x)'.format(multi * 1e6, pipelined / multi))
+
+
+if __name__ == '__main__':
+    main()
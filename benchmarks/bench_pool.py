@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Compares sampling and filtering several (emulated) ftDuinos in one process
+with a FtDuinoPool (one worker process per device).
+"""
+import os
+import sys
+import time
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.filters import Median
+from ftdu.pool import FtDuinoPool
+from ftdu.transport import LoopbackTransport
+
+DURATION = 2.0
+
+
+def emulated(path):
+    return ftdu.BaseFtDuino(transport=LoopbackTransport(Emulator(path).handle))
+
+
+class Smooth:
+    """\
+    Per-sample processing: A median filter per port.
+    """
+    def __init__(self):
+        self.filters = [Median(15) for _ in ftdu.SNAPSHOT_PORTS]
+
+    def __call__(self, values):
+        return [flt.update(value) for flt, value in zip(self.filters, values)]
+
+
+def single_process(paths):
+    devices = [(emulated(path), Smooth()) for path in paths]
+    n = 0
+    end = time.time() + DURATION
+    while time.time() < end:
+        for ftd, smooth in devices:
+            smooth(ftd.snapshot())
+            n += 1
+    return n / DURATION
+
+
+def pool(paths):
+    n = 0
+    with FtDuinoPool(paths, factory=emulated, sample_interval=1e-6, process=Smooth()) as p:
+        time.sleep(0.5)  # Start up
+        p.samples()
+        end = time.time() + DURATION
+        while time.time() < end:
+            n += len(p.samples())
+            time.sleep(0.01)
+    return n / DURATION
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 4, os.cpu_count() or 4]
+    for count in counts:
+        paths = ['emu{0}'.format(i) for i in range(count)]
+        print('{0:3} devices: single process {1:9.0f} samples/s, pool {2:9.0f} samples/s'
+              .format(count, single_process(paths), pool(paths)))
+
+
+if __name__ == '__main__':
+    main()
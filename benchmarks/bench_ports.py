@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Measures the overhead of the port accessors. The in-memory transport answers
+each command with ``0``, so the Python call overhead dominates::
+
+    $ python benchmarks/bench_ports.py
+"""
+import timeit
+import ftdu
+from ftdu.transport import LoopbackTransport
+
+
+def main(n=100000):
+    ftd = ftdu.FtDuino(transport=LoopbackTransport(lambda request: '0'))
+    port = ftd.inputs[1]
+    cases = (
+        ('ftd.input_get("I1")', lambda: ftd.input_get('I1')),
+        ('ftd.i1', lambda: ftd.i1),
+        ('ftd.inputs[1].value', lambda: ftd.inputs[1].value),
+        ('port.value', lambda: port.value),
+        ('ftd.o1 = True', lambda: setattr(ftd, 'o1', True)),
+        ('ftd.m1_left()', lambda: ftd.m1_left()),
+    )
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=n, repeat=3))
+        print('{0:<22} {1:>8.2f} us/call'.format(name, elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Compares the CPU time of the reply parsing.
+
+The transport answers from memory, so only the client side is measured::
+
+    $ python benchmarks/bench_reply.py
+"""
+import timeit
+from array import array
+import ftdu
+from ftdu.transport import Transport
+
+
+class CannedTransport(Transport):
+    """\
+    Answers each command with ``4711``.
+    """
+    def __init__(self):
+        self._count = 0
+
+    def write(self, data):
+        self._count += data.count(b'\n')
+
+    def readline(self):
+        self._count -= 1
+        return b'4711\r\n'
+
+    def readinto(self, buf):
+        data = b'4711\r\n' * self._count
+        buf[:len(data)] = data
+        self._count = 0
+        return len(data)
+
+    def flush(self):
+        self._count = 0
+
+    def close(self):
+        pass
+
+
+def legacy_input_get(ftd, port):
+    """\
+    input_get as implemented in ftdu 0.0.2
+    """
+    transport = ftd._transport
+    transport.flush()
+    cmd = 'input_get {0}'.format(port)
+    cmd += '\n'
+    transport.write(cmd.encode('utf-8'))
+    data = transport.readline().decode('utf-8').rstrip('\r\n')
+    return int(data if data != '' else None)
+
+
+def legacy_snapshot(ftd):
+    return [legacy_input_get(ftd, port) for port in ftdu.INPUT_PORTS] \
+           + [int(ftd.comm('counter_get {0}'.format(port))) for port in ftdu.COUNTER_PORTS]
+
+
+def main(n=20000):
+    ftd = ftdu.FtDuino(transport=CannedTransport())
+    out = array('i', [0] * len(ftdu.SNAPSHOT_PORTS))
+    cases = (
+        ('legacy input_get', lambda: legacy_input_get(ftd, 'I1')),
+        ('input_get', lambda: ftd.input_get('I1')),
+        ('ftd.i1', lambda: ftd.i1),
+        ('legacy 12 ports', lambda: legacy_snapshot(ftd)),
+        ('snapshot(out)', lambda: ftd.snapshot(out)),
+    )
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=n, repeat=3))
+        print('{0:<18} {1:>8.2f} us/call'.format(name, elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    main()
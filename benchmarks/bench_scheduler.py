@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Latency of control commands while a reader floods the link, with and
+without the CONTROL lane of ftdu.scheduler.
+
+The emulator answers each command after 100 us to simulate the USB link.
+"""
+import threading
+import time
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.scheduler import Scheduler, BULK, CONTROL
+from ftdu.transport import LoopbackTransport
+
+
+def _slow(emu):
+    def handle(request):
+        time.sleep(0.0001)
+        return emu.handle(request)
+    return handle
+
+
+def run(lane):
+    scheduler = Scheduler(ftdu.BaseFtDuino(transport=LoopbackTransport(_slow(Emulator()))))
+    stop = threading.Event()
+
+    def flood():
+        while not stop.is_set():
+            futures = [scheduler.submit('input_get I1') for _ in range(64)]
+            futures[-1].result()
+
+    threads = [threading.Thread(target=flood) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    for _ in range(100):
+        start = time.perf_counter()
+        scheduler.comm('motor_set M1 brake 0', lane=lane)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.002)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    scheduler.close()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[-1]
+
+
+def main():
+    for name, lane in (('FIFO (bulk lane)', BULK), ('control lane', CONTROL)):
+        median, worst = run(lane)
+        print('{0:<18} motor_set latency: median {1:7.2f} ms, max {2:7.2f} ms'.format(name, median * 1000, worst * 1000))
+
+
+if __name__ == '__main__':
+    main()
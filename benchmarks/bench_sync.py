@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Overhead of the reply verification with sync commands (see
+``BaseFtDuino.sync_interval``) for batched reads and snapshots.
+
+The emulator needs 50 us per command to simulate the parsing of a command
+by the sketch.
+"""
+import time
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+
+COUNT = 300
+
+_CMDS = ['input_get I{0}'.format(i % 8 + 1) for i in range(32)]
+
+
+def _slow(emu):
+    def handle(request):
+        time.sleep(0.00005)
+        return emu.handle(request)
+    return handle
+
+
+def run(interval):
+    ftd = ftdu.BaseFtDuino(transport=LoopbackTransport(_slow(Emulator())))
+    ftd.sync_interval = interval
+    values = ftd.snapshot()
+    start = time.perf_counter()
+    for _ in range(COUNT):
+        ftd.comm_batch(_CMDS)
+    batch = (time.perf_counter() - start) / COUNT
+    start = time.perf_counter()
+    for _ in range(COUNT):
+        ftd.snapshot(values)
+    return batch, (time.perf_counter() - start) / COUNT
+
+
+def main():
+    base_batch, base_snapshot = run(None)
+    print('{0:>13}: {1:8.1f} us per batch of {2}  {3:8.1f} us per snapshot'
+          .format('without sync', base_batch * 1e6, len(_CMDS), base_snapshot * 1e6))
+    for interval in (32, 8, 1):
+        batch, snapshot = run(interval)
+        print('{0:>13}: {1:8.1f} us per batch ({2:+5.1f} %)  {3:8.1f} us per snapshot ({4:+5.1f} %)'
+              .format('interval {0}'.format(interval), batch * 1e6, (batch / base_batch - 1) * 100,
+                      snapshot * 1e6, (snapshot / base_snapshot - 1) * 100))
+
+
+if __name__ == '__main__':
+    main()
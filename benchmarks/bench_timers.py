@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Many timed output actions on several (emulated) ftDuinos, run by one
+ftdu.timers.TimerWheel thread, while the main thread keeps reading.
+"""
+import random
+import time
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.timers import TimerWheel
+from ftdu.transport import LoopbackTransport
+
+TIMERS = 10000
+BOARDS = 4
+
+
+def main():
+    boards = [ftdu.FtDuino(transport=LoopbackTransport(Emulator().handle)) for _ in range(BOARDS)]
+    rnd = random.Random(1)
+    with TimerWheel() as wheel:
+        start = time.perf_counter()
+        for i in range(TIMERS):
+            port = 'O{0}'.format(rnd.randint(1, 8))
+            wheel.schedule(rnd.uniform(0, 1), {port: bool(i & 1)}, ftd=boards[i % BOARDS])
+        elapsed = time.perf_counter() - start
+        print('schedule: {0} timers, {1:.1f} us per timer'.format(TIMERS, elapsed / TIMERS * 1e6))
+        reads = 0
+        worst = 0
+        while len(wheel):
+            t = time.perf_counter()
+            boards[reads % BOARDS].snapshot()
+            worst = max(worst, time.perf_counter() - t)
+            reads += 1
+    print('fired:    {0} timers with {1} batched writes'.format(wheel.fired, wheel.writes))
+    print('reads:    {0} snapshots meanwhile, slowest {1:.2f} ms'.format(reads, worst * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Cost of recording each exchange with ftdu.trace.TraceWriter (emulated ftDuino).
+"""
+import os
+import tempfile
+import timeit
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.trace import TraceWriter
+from ftdu.transport import LoopbackTransport
+
+NUMBER = 20000
+
+
+def measure(ftd):
+    single = min(timeit.repeat(lambda: ftd.i1, number=NUMBER, repeat=5)) / NUMBER
+    values = ftd.snapshot()
+    batch = min(timeit.repeat(lambda: ftd.snapshot(values), number=NUMBER // 10, repeat=5)) / (NUMBER // 10)
+    return single, batch / len(ftdu.SNAPSHOT_PORTS)
+
+
+def main():
+    ftd = ftdu.FtDuino(transport=LoopbackTransport(Emulator().handle))
+    plain = measure(ftd)
+    path = os.path.join(tempfile.mkdtemp(), 'bench.trace')
+    with TraceWriter(path, size=1024 * 1024, ftd=ftd) as writer:
+        traced = measure(ftd)
+        total = writer.total
+    os.remove(path)
+    for name, a, b in (('single read', plain[0], traced[0]), ('per command in snapshot', plain[1], traced[1])):
+        print('{0:<24} {1:6.2f} us -> {2:6.2f} us traced (+{3:.2f} us)'.format(name, a * 1e6, b * 1e6, (b - a) * 1e6))
+    print('{0} records written into a 1 MiB ring'.format(total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Compares the round trip times of the transports.
+
+The loopback, fd and socket transports talk to an emulated ftDuino. If a
+device path is provided, the serial transport and the fd transport are
+measured against the real device as well::
+
+    $ python benchmarks/bench_transport.py [/dev/ttyACM0]
+"""
+import socket
+import sys
+import threading
+import time
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport, FdTransport, SocketTransport, SerialTransport
+
+
+def bench(name, transport, n=5000):
+    with ftdu.BaseFtDuino(transport=transport) as ftd:
+        for _ in range(100):  # Warm up
+            ftd.input_get('I1')
+        start = time.time()
+        for _ in range(n):
+            ftd.input_get('I1')
+        elapsed = time.time() - start
+    print('{0:<10} {1:>10.0f} cmd/s {2:>8.1f} us/cmd'.format(name, n / elapsed, elapsed / n * 1e6))
+
+
+def serve(emu, sock):
+    thread = threading.Thread(target=emu.serve, args=(sock,))
+    thread.daemon = True
+    thread.start()
+
+
+def main():
+    emu = Emulator()
+    bench('loopback', LoopbackTransport(emu.handle))
+    a, b = socket.socketpair()
+    serve(emu, b)
+    bench('fd', FdTransport(a.detach()))
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    client = socket.create_connection(server.getsockname())
+    conn, _ = server.accept()
+    serve(emu, conn)
+    bench('socket', SocketTransport(client))
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+        bench('serial', SerialTransport(path), n=500)
+        bench('fd (tty)', FdTransport.open(path), n=500)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+ftDuino Handbuch - 4.8.1 Einfache Ampel, declarative variant of kap_04_81.py
+"""
+import ftdu
+from ftdu.rules import Engine, RuleSet, rising
+
+
+def example():
+    traffic_light = RuleSet('Ampel', initial={'O1': True})  # Rote Lampe einschalten
+    # Taster gedrückt: Rote Lampe aus-, grüne Lampe einschalten, nach 10 Sek. zurück
+    traffic_light.when(rising('I1'), {'O1': False, 'O2': True}, duration=10)
+    with ftdu.FtDuino() as ftd:
+        engine = Engine()
+        engine.add(ftd, traffic_light)
+        engine.run()
+
+
+if __name__ == '__main__':
+    example()
@@ -0,0 +1,1336 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Python client to communicate with a ftDuino via USB.
+
+It uses the ``ftduino_direct`` sketch written by Peter Habermehl.
+See <https://github.com/PeterDHabermehl/ftduino_direct>
+"""
+from __future__ import absolute_import, unicode_literals, print_function
+import threading
+from array import array
+from .transport import SerialTransport
+from .reply import ReplyBuffer
+
+__version__ = '0.0.2'
+
+# <https://wiki.python.org/moin/PortingToPy3k/BilingualQuickRef#New_Style_Classes>
+__metaclass__ = type
+
+
+INPUT_MODE_SWITCH = 'switch'
+INPUT_MODE_RESISTANCE = 'resistance'
+INPUT_MODE_VOLTAGE = 'voltage'
+
+_VALID_INPUT_MODES = (INPUT_MODE_SWITCH, INPUT_MODE_RESISTANCE, INPUT_MODE_VOLTAGE)
+
+MOTOR_OFF = 'off'
+MOTOR_LEFT = 'left'
+MOTOR_RIGHT = 'right'
+MOTOR_BRAKE = 'brake'
+
+_VALID_MOTOR_DIRECTIONS = (MOTOR_LEFT, MOTOR_RIGHT, MOTOR_BRAKE, MOTOR_OFF)
+
+COUNTER_EDGE_NONE = 'none'
+COUNTER_EDGE_RISING = 'rising'
+COUNTER_EDGE_FALLING = 'falling'
+COUNTER_EDGE_ANY = 'any'
+
+_VALID_COUNTER_MODES = (COUNTER_EDGE_NONE, COUNTER_EDGE_RISING,
+                        COUNTER_EDGE_FALLING, COUNTER_EDGE_ANY)
+
+OFF = 0
+HIGH = 1
+LOW = 2
+
+MIN = OFF
+# Should be 62, see <https://github.com/PeterDHabermehl/ftduino_direct/issues/4>
+MAX = 512
+
+INPUT_PORTS = ('I1', 'I2', 'I3', 'I4', 'I5', 'I6', 'I7', 'I8')
+OUTPUT_PORTS = ('O1', 'O2', 'O3', 'O4', 'O5', 'O6', 'O7', 'O8')
+COUNTER_PORTS = ('C1', 'C2', 'C3', 'C4')
+MOTOR_PORTS = ('M1', 'M2', 'M3', 'M4')
+
+#: Ports read by :py:func:`BaseFtDuino.snapshot` (in this order).
+SNAPSHOT_PORTS = INPUT_PORTS + COUNTER_PORTS
+
+
+#: Feature of the ftduino_direct sketch: ``multi_get <port> ...`` reads
+#: several input ports / counters and answers with one line of
+#: space-separated values.
+FEATURE_MULTI_GET = 'multi_get'
+
+# Command which marks the end of a group of commands, see BaseFtDuino.sync_interval
+_SYNC_CMD = b'ftduino_direct_get_version\n'
+# Number of attempts to exchange a group of commands with aligned replies
+_SYNC_ATTEMPTS = 3
+
+_VALUE_TYPECODE = 'i'
+
+
+class BaseFtDuino:
+    """\
+    Base class to communicate with a ftDuino.
+
+    This class implements all high level functions of the ftDuino API.
+
+    To issue other commands, the :py:func:`comm` method can be used.
+    """
+    def __init__(self, path=None, transport=None):
+        """\
+        Initializes a connection to a ftDuino.
+
+        If the `path` is ``None`` (default), the first ftDuino found by a scan
+        will be used.
+
+        :param path: Optional device path to ftDuino.
+        :param transport: Optional :class:`ftdu.transport.Transport`. If
+                provided, the `path` is ignored. By default, a
+                :class:`ftdu.transport.SerialTransport` is used.
+        """
+        if transport is None:
+            if path is None:
+                try:
+                    path, name = next(ftduino_iter())
+                except StopIteration:
+                    pass  # Handled in next line
+            if path is None:
+                raise ValueError('No ftDuino found.')
+            transport = SerialTransport(path)
+        self._transport = transport
+        self._rx = ReplyBuffer()
+        # Serializes the exchanges of several threads, i.e. of the timer thread
+        self._lock = threading.Lock()
+        # Input modes set via this instance, maps port name (upper case) to mode
+        self._input_modes = {}
+        # Features of the sketch, detected on demand, see features
+        self._features = None
+        # Maps a tuple of ports to the payload and the number of reply lines of a bulk read
+        self._bulk = {}
+        # Version string of the sketch, the reply of the sync command
+        self._version = None
+        self._sync_interval = None
+        #: Number of detected reply misalignments, see :py:attr:`sync_interval`.
+        self.resyncs = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def comm(self, cmd):
+        """\
+        Low level access to the ftDuino.
+
+        See <https://github.com/PeterDHabermehl/ftduino_direct#use> for a list
+        of commands.
+
+        :param cmd: The command to execute.
+        :rtype: str
+        :return: The result of the command or ``None`` in case of an error.
+        """
+        cmd += '\n'
+        data = self._request(cmd.encode('utf-8')).decode('utf-8').rstrip('\r\n')
+        return data if data != '' else None
+
+    def _request(self, payload):
+        """\
+        Writes one command and returns the reply.
+
+        :param bytes payload: The command, terminated by ``\\n``.
+        :rtype: bytes
+        :return: The reply line including the line terminator (empty if the
+                 ftDuino did not answer).
+        """
+        with self._lock:
+            if self._sync_interval is not None:
+                return self._framed_exchange(payload)[0]
+            transport = self._transport
+            transport.flush()
+            transport.write(payload)
+            return transport.readline()
+
+    def comm_batch(self, cmds):
+        """\
+        Executes several commands with one write.
+
+        The commands are sent at once and the replies are read afterwards,
+        this saves a round trip per command. Each command must be answered by
+        exactly one line.
+
+        :param cmds: Sequence of commands.
+        :rtype: list
+        :return: The results, see :py:func:`comm`.
+        """
+        replies = self._exchange(''.join(cmd + '\n' for cmd in cmds).encode('utf-8'), len(cmds))
+        return [reply.decode('utf-8').rstrip('\r\n') or None for reply in replies]
+
+    def _exchange(self, payload, count):
+        """\
+        Writes the `payload` which contains `count` commands and returns the
+        replies.
+
+        :param bytes payload: The commands, separated by ``\\n``.
+        :param int count: The number of commands.
+        :return: List of reply lines (bytes, including the line terminator).
+        """
+        with self._lock:
+            if self._sync_interval is not None:
+                return self._framed_exchange(payload)
+            transport = self._transport
+            transport.flush()
+            transport.write(payload)
+            readline = transport.readline
+            return [readline() for _ in range(count)]
+
+    @property
+    def sync_interval(self):
+        """\
+        Number of commands after which a sync command is sent, ``None``
+        (default) to disable the verification of the replies.
+
+        If several commands are sent at once (:py:func:`comm_batch`,
+        :py:func:`snapshot`, ...), a lost or an additional reply line would
+        shift the later replies onto the wrong commands. If enabled, the
+        command ``ftduino_direct_get_version`` is sent after each group of
+        `sync_interval` commands (and after the last command). Its reply is
+        known, so a group is accepted only if the expected number of replies
+        is followed by the version string.
+
+        If the replies of a group are misaligned, the received lines are
+        discarded until the ftDuino does not answer anymore (one read
+        timeout) and the group and the following groups are sent again. The
+        replies of the previous groups are kept. The commands should be
+        idempotent (setting an output, reading a port, ...). If the replies
+        are still misaligned after the third attempt, a :class:`ValueError`
+        is raised. The number of misalignments is available as
+        :py:attr:`resyncs`.
+
+        A lost reply and an additional reply within the same group are not
+        detected.
+
+        :raise: ValueError if the interval is less than 1 or if the sketch
+                did not report its version.
+        """
+        return self._sync_interval
+
+    @sync_interval.setter
+    def sync_interval(self, interval):
+        if interval is not None:
+            if interval < 1:
+                raise ValueError('The sync interval must be at least 1, got {0}'.format(interval))
+            if self._version is None:
+                self.ftduino_direct_get_version()
+            if not self._version:
+                raise ValueError('The sketch did not report its version')
+        self._sync_interval = interval
+
+    def _framed_exchange(self, payload):
+        """\
+        Sends the commands of the `payload` with a sync command after each
+        group of commands and returns the replies, see :py:attr:`sync_interval`.
+
+        The caller must hold the lock.
+        """
+        cmds = payload.split(b'\n')[:-1]
+        interval = self._sync_interval
+        sentinel = self._version.encode('utf-8')
+        transport = self._transport
+        replies = []
+        for _ in range(_SYNC_ATTEMPTS):
+            groups = [cmds[i:i + interval] for i in range(len(replies), len(cmds), interval)]
+            transport.flush()
+            transport.write(b''.join(b''.join(cmd + b'\n' for cmd in group) + _SYNC_CMD for group in groups))
+            readline = transport.readline
+            for group in groups:
+                lines = _read_frame(readline, len(group), sentinel)
+                if lines is None:
+                    break
+                replies.extend(lines)
+            else:
+                return replies
+            self.resyncs += 1
+            _drain(transport)
+        raise ValueError('Misaligned replies: {0} of {1} commands verified'.format(len(replies), len(cmds)))
+
+    def read_inputs(self, out=None, ports=INPUT_PORTS):
+        """\
+        Reads several input ports with one batched exchange.
+
+        .. code-block:: python
+
+            values = array('i', [0] * 8)
+            ftd.read_inputs(values)  # values contains I1 .. I8
+
+        :param out: Optional, preallocated, mutable sequence of integers
+                    (i.e. an :class:`array.array` or a NumPy array) with
+                    (at least) one item per port. If ``None``, a new
+                    :class:`array.array` is created.
+        :param ports: The input ports to read, default: I1 .. I8.
+        :return: `out`
+        :raise: ValueError in case of an error.
+        """
+        return self._read_values(tuple(ports), out)
+
+    def read_counters(self, out=None, ports=COUNTER_PORTS):
+        """\
+        Reads several counters with one batched exchange.
+
+        See :py:func:`read_inputs` for the parameters, the default ports are C1 .. C4.
+        """
+        return self._read_values(tuple(ports), out)
+
+    def snapshot(self, out=None):
+        """\
+        Reads all input ports and all counters with one batched exchange.
+
+        See :py:func:`read_inputs` for the `out` parameter.
+
+        :return: The values of the ports in the order of ``ftdu.SNAPSHOT_PORTS``
+                 (I1 .. I8, C1 .. C4).
+        """
+        return self._read_values(SNAPSHOT_PORTS, out)
+
+    def write_outputs(self, modes, pwms=None, ports=OUTPUT_PORTS):
+        """\
+        Sets several output ports with one batched exchange.
+
+        .. code-block:: python
+
+            ftd.write_outputs([ftdu.HIGH] * 8, [0, 64, 128, 192, 256, 320, 384, 512])
+
+        :param modes: Sequence of modes (0 = OFF, 1 = HIGH, 2 = LOW), one per port.
+        :param pwms: Optional sequence of pulse-width modulation values, one
+                     per port. If ``None``, the values depend on the modes,
+                     see :py:func:`output_set`.
+        :param ports: The output ports, default: O1 .. O8.
+        """
+        if pwms is None:
+            pwms = (None,) * len(ports)
+        if not len(modes) == len(pwms) == len(ports):
+            raise ValueError('Expected {0} modes and pwm values'.format(len(ports)))
+        payload = ''.join('output_set {0} {1} {2}\n'.format(port, *_output_args(mode, pwm))
+                          for port, mode, pwm in zip(ports, modes, pwms))
+        self._exchange(payload.encode('utf-8'), len(ports))
+
+    @property
+    def features(self):
+        """\
+        Returns the features of the ``ftduino_direct`` sketch, i.e.
+        :py:data:`FEATURE_MULTI_GET`.
+
+        The features are announced by the version string (the tokens after
+        the version number, i.e. ``'1.4.0 multi_get'``). They are detected by
+        the first call of :py:func:`ftduino_direct_get_version`, which is
+        issued on demand.
+
+        :rtype: frozenset
+        """
+        if self._features is None:
+            self.ftduino_direct_get_version()
+        return self._features
+
+    def _read_values(self, ports, out):
+        """\
+        Reads the provided input ports / counters with one exchange and
+        parses the values into `out`.
+
+        Uses a ``multi_get`` command if supported by the sketch, otherwise
+        one command per port. If the sketch rejects the ``multi_get`` command
+        (an error reply without any integer, i.e. ``Fail``), the feature is
+        disabled and the ports are read with one command per port. Timeouts
+        and malformed replies are raised and keep the feature.
+
+        :param tuple ports: The ports, i.e. ``('I1', 'C1')``.
+        """
+        try:
+            payload, lines = self._bulk[ports]
+        except KeyError:
+            payload, lines = self._bulk[ports] = self._bulk_payload(ports)
+        count = len(ports)
+        try:
+            return self._read_ints(payload, count, out, lines)
+        except ValueError:
+            if lines == count:
+                raise
+            with self._lock:
+                rejected = _is_rejection(self._rx.lines())
+            if not rejected:
+                raise
+            self._features = self._features - frozenset([FEATURE_MULTI_GET])
+            self._bulk.clear()
+            return self._read_values(ports, out)
+
+    def _bulk_payload(self, ports):
+        """\
+        Returns a tuple of the payload and the number of reply lines to read
+        the provided ports.
+        """
+        cmds = _get_commands(ports)
+        if len(ports) > 1 and FEATURE_MULTI_GET in self.features:
+            return 'multi_get {0}\n'.format(' '.join(port.upper() for port in ports)).encode('utf-8'), 1
+        return ''.join(cmd + '\n' for cmd in cmds).encode('utf-8'), len(cmds)
+
+    def _read_ints(self, payload, count, out, lines=None):
+        """\
+        Writes the `payload` which contains `count` commands and parses the
+        integer replies into `out`.
+
+        The replies are received into a reusable buffer and parsed without
+        decoding, see :class:`ftdu.reply.ReplyBuffer`.
+
+        :param int lines: Number of reply lines if the replies of several
+                commands are combined into one line (``multi_get``). By
+                default, one line per command.
+        """
+        if out is None:
+            out = array(_VALUE_TYPECODE, [0]) * count
+        with self._lock:
+            if self._sync_interval is not None:
+                return self._framed_read_ints(payload, count, out, count if lines is None else lines)
+            transport = self._transport
+            transport.flush()
+            transport.write(payload)
+            rx = self._rx
+            rx.read(transport, count if lines is None else lines)
+            return rx.ints(out, count)
+
+    def _framed_read_ints(self, payload, count, out, lines):
+        """\
+        Like :py:func:`_read_ints` with a sync command after the payload, see
+        :py:attr:`sync_interval`. The reads are repeated if the replies are
+        misaligned.
+
+        The caller must hold the lock.
+        """
+        transport, rx = self._transport, self._rx
+        payload += _SYNC_CMD
+        sentinel = self._version.encode('utf-8')
+        for _ in range(_SYNC_ATTEMPTS):
+            transport.flush()
+            transport.write(payload)
+            try:
+                rx.read(transport, lines + 1)
+                aligned = rx.line_count() == lines + 1 and rx.pop_line() == sentinel
+            except ValueError:  # Timeout
+                aligned = False
+            if aligned:
+                return rx.ints(out, count)
+            self.resyncs += 1
+            _drain(transport)
+        raise ValueError('Misaligned replies: Expected {0} replies and the sync reply'.format(lines))
+
+    def after(self, delay, action):
+        """\
+        Runs `action` once after `delay` seconds without blocking the caller.
+
+        .. code-block:: python
+
+            ftd.o2 = True
+            ftd.after(10, {'O1': True, 'O2': False})
+
+        The timers of all ftDuinos are run by one thread, see
+        :py:func:`ftdu.timers.default_wheel`.
+
+        :param float delay: Delay in seconds.
+        :param action: A callable without arguments or a dict of output port
+                names (O1 .. O8, M1 .. M4, LED) to values. The output values
+                of all timers which expire at the same time are written with
+                one batched write.
+        :rtype: ftdu.timers.Timer
+        :return: The timer, use :py:func:`ftdu.timers.Timer.cancel` to cancel it.
+        """
+        from .timers import default_wheel
+        return default_wheel().schedule(delay, action, ftd=self)
+
+    def every(self, interval, action):
+        """\
+        Runs `action` every `interval` seconds without blocking the caller.
+
+        See :py:func:`after` for the `action` parameter.
+
+        :param float interval: Interval in seconds.
+        :rtype: ftdu.timers.Timer
+        """
+        from .timers import default_wheel
+        return default_wheel().schedule(interval, action, interval=interval, ftd=self)
+
+    def close(self):
+        """\
+        Closes the connection to the ftDuino.
+
+        Use the ``with`` statement to ensure that this method is called.
+
+        .. code-block:: python
+
+            with BaseFtduino() as ftd:
+                ftd.led = True
+        """
+        self._transport.close()
+
+    def output_set(self, port, mode, pwm=None):
+        """\
+        Sets the provided output port into the provided mode.
+
+        :param port: Port name, i.e. 'O1'. The port name is case-insensitive.
+        :param mode: 0 = OFF, 1 = HIGH, 2 = LOW
+        :param pwm: Pulse-width modulation value. If ``None`` the value
+                    depends on the mode. If the mode is ``1`` (high), the
+                    pwm will be set to the max. pwm value, otherwise to the
+                    min. pwm value.
+        """
+        self.comm('output_set {0} {1} {2}'.format(port, *_output_args(mode, pwm)))
+
+    def input_get(self, port):
+        """\
+        Reads a value from the provided input port.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :rtype: int
+        :return: The integer value read from the specified port.
+        :raise: ValueError in case of an error.
+        """
+        return int(self._request('input_get {0}\n'.format(port).encode('utf-8')))
+
+    def input_set_mode(self, port, mode):
+        """\
+        Sets the mode for the provided input port.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :param mode: 'switch', 'resistance', or 'voltage' (case-insensitive), see
+                     constants ``ftdu.INPUT_MODE_SWITCH``, ``ftdu.INPUT_MODE_RESISTANCE``
+                     and ``ftdu.INPUT_MODE_VOLTAGE``.
+        :raise: ValueError in case the provided mode is unknown.
+        """
+        if mode.lower() not in _VALID_INPUT_MODES:
+            raise ValueError('Invalid mode "{0}". Use one of: {1}'.format(mode, _VALID_INPUT_MODES))
+        self.comm('input_set_mode {0} {1}'.format(port, mode))
+        self._input_modes[port.upper()] = mode.lower()
+
+    def input_get_mode(self, port):
+        """\
+        Returns the mode of the provided input port.
+
+        The ftDuino cannot report the mode, this method returns the mode which
+        was set by :py:func:`input_set_mode`.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :rtype: str
+        :return: The mode or ``None`` if the mode was not set by this instance.
+        """
+        return self._input_modes.get(port.upper())
+
+    def counter_set_mode(self, port, mode):
+        """\
+        Sets the mode of the provided counter.
+
+        :param port: Port name, i.e. 'C1'. The port name is case-insensitive.
+        :param mode: 'none', 'rising', 'falling', or 'any' (case-insensitive)
+        """
+        if mode.lower() not in _VALID_COUNTER_MODES:
+            raise ValueError('Invalid mode "{0}". Use {1}'.format(mode, _VALID_COUNTER_MODES))
+        self.comm('counter_set_mode {0} {1}'.format(port, mode))
+
+    def counter_get(self, port):
+        """\
+        Returns the value of the provided counter port.
+
+        :param port: Port name, i.e. 'C1'. The port name is case-insensitive.
+        :rtype: int
+        :return: The value of the provided counter.
+        """
+        return int(self._request('counter_get {0}\n'.format(port).encode('utf-8')))
+
+    def counter_clear(self, port):
+        """\
+        Clears the provided counter port.
+
+        :param port: Port name, i.e. 'C1'. The port name is case-insensitive.
+        """
+        self.comm('counter_clear {0}'.format(port))
+
+    def counter_get_state(self, port):
+        """\
+        Returns the state of the provied counter port.
+
+        :param port: Port name, i.e. 'C1'. The port name is case-insensitive.
+        :rtype: bool
+        :return: The state, a boolean of the port.
+        """
+        return self.comm('counter_get_state {0}'.format(port)) == '1'
+
+    def ultrasonic_get(self):
+        """\
+        Reads and returns the value of the ultrasonic sensor.
+
+        :rtype: int
+        :return: The value of the ultrasonic sensor.
+        """
+        return int(self._request(b'ultrasonic_get\n'))
+
+    def ultrasonic_enable(self, enable):
+        """\
+        Enables / disables the ultrasonic sensor.
+
+        :param bool enable: ``True`` to enable, ``False`` to disable.
+        """
+        self.comm('ultrasonic_enable {0}'.format('true' if enable else 'false'))
+
+    def motor_set(self, port, mode, pwm=None):
+        """\
+        Sets the provided motor port into the given state.
+
+        :param port: Port name, i.e. 'M1'. The port name is case-insensitive.
+        :param mode: 'off',  'left', 'right', or 'brake' (case-insensitive), see constants
+                     ``ftdu.MOTOR_OFF``, ``ftdu.MOTOR_LEFT``, ``ftdu.MOTOR_RIGHT``,
+                     and ``ftdu.MOTOR_BRAKE``.
+        :param pwm: Pulse-width modulation value. If ``None`` the max. PWM value will be used.
+        """
+        if mode.lower() not in _VALID_MOTOR_DIRECTIONS:
+            raise ValueError('Invalid motor mode "{0}", use {1}'.format(mode, _VALID_MOTOR_DIRECTIONS))
+        if pwm is None:
+            pwm = MAX
+        self.comm('motor_set {0} {1} {2}'.format(port, mode, pwm))
+
+    def motor_counter(self, port, mode, pwm, counter):
+        """\
+        Sets the state of an encoder motor.
+
+        :param port: Port name, i.e. 'M1'. The port name is case-insensitive.
+        :param mode: 'off',  'left', 'right', or 'brake' (case-insensitive), see constants
+                     ``ftdu.MOTOR_OFF``, ``ftdu.MOTOR_LEFT``, ``ftdu.MOTOR_RIGHT``,
+                     and ``ftdu.MOTOR_BRAKE``.
+        :param pwm: Pulse-width modulation value.
+        :param counter: Counter value. The motor stops after reaching the value.
+        """
+        if mode.lower() not in _VALID_MOTOR_DIRECTIONS:
+            raise ValueError('Invalid motor mode "{0}", use {1}'.format(mode, _VALID_MOTOR_DIRECTIONS))
+        self.comm('motor_counter {0} {1} {2} {3}'.format(port, mode, pwm, counter))
+
+    def motor_counter_active(self, port):
+        """\
+        Returns if a counter is active for the given motor port.
+
+        :param port: Port name, i.e. 'M1'. The port name is case-insensitive.
+        :return: ``True`` if the counter is active, otherwise ``False``.
+        """
+        return self.comm('motor_counter_active {0}'.format(port)) == '1'
+
+    def motor_counter_set_brake(self, port, enable):
+        """\
+        Indicates if the motor should be stopped indirectly (``False``) or
+        directly (``True``).
+
+        :param port: Port name, i.e. 'M1'. The port name is case-insensitive.
+        :param enable: ``True`` to set the brake, otherwise ``False``
+        """
+        self.comm('motor_counter_set_brake {0} {1}'.format(port, ('true' if enable else 'false')))
+
+    def led_set(self, enable):
+        """\
+        Switches the LED on or off
+
+        :param enable: ``True`` to switch the LED on, ``False`` to switch the LED off.
+        """
+        self.comm('led_set {0}'.format(1 if enable else 0))
+
+    #
+    # ftduino_direct commands
+    #
+    def ftduino_direct_get_version(self):
+        """\
+        Returns the ftduino_direct version
+
+        The result is used to detect the features of the sketch, see
+        :py:attr:`features`.
+
+        :return: A version string.
+        """
+        version = self.comm('ftduino_direct_get_version')
+        self._set_version(version)
+        return version
+
+    def _set_version(self, version, features=None):
+        """\
+        Sets the version string of the sketch and its features, i.e. if the
+        version was requested together with other commands or is known from
+        a cache (see :py:mod:`ftdu.cache`).
+
+        :param str version: The version string.
+        :param features: Iterable of features. By default, the features
+                announced by the version string.
+        """
+        self._version = version
+        self._features = _parse_features(version) if features is None else frozenset(features)
+        self._bulk.clear()
+
+    def ftduino_id_get(self):
+        """\
+        Returns the ID of the connected ftDuino.
+
+        :return: The ID of the ftDuino.
+        """
+        return self.comm('ftduino_id_get')
+
+    def ftduino_id_set(self, identifier):
+        """\
+        Sets the ftDuino ID.
+
+        :param str|unicode identifier: The identifier.
+        """
+        self.comm('ftduino_id_set {0}'.format(identifier))
+
+
+def _output_value(value):
+    """\
+    Converts an assigned output value (boolean, integer, or a tuple of mode
+    and pwm) into a tuple (mode, pwm).
+    """
+    pwm = None
+    if value in (True, HIGH):
+        mode = HIGH
+    elif value is False:
+        mode = OFF
+    elif value in (OFF, LOW):
+        mode = value
+    else:
+        mode, pwm = value
+    return mode, pwm
+
+
+def _read_frame(readline, count, sentinel):
+    """\
+    Reads the replies of `count` commands followed by the reply of the sync
+    command.
+
+    :return: The reply lines or ``None`` if the replies are misaligned or
+            the transport timed out.
+    """
+    lines = []
+    for _ in range(count):
+        line = readline()
+        if line[-1:] != b'\n':
+            return None
+        lines.append(line)
+    return lines if readline().rstrip(b'\r\n') == sentinel else None
+
+
+def _drain(transport, max_lines=10000):
+    """\
+    Discards the received lines until the transport times out and flushes
+    the transport.
+    """
+    for _ in range(max_lines):
+        if transport.readline()[-1:] != b'\n':
+            break
+    transport.flush()
+
+
+def _parse_features(version):
+    """\
+    Returns the features announced by the provided version string, i.e.
+    ``'1.4.0 multi_get'``.
+
+    :rtype: frozenset
+    """
+    return frozenset(version.split()[1:]) if version else frozenset()
+
+
+def _is_rejection(lines):
+    """\
+    Returns if the provided reply lines (bytes, including the line terminators)
+    are an error reply, i.e. ``Fail``: At least one complete line and no
+    integer at all.
+    """
+    complete = [line for line in lines if line.endswith(b'\n')]
+    return bool(complete) and not any(token.lstrip(b'-').isdigit() for line in complete for token in line.split())
+
+
+def _output_args(mode, pwm):
+    """\
+    Validates the mode and returns a tuple (mode, pwm), see :py:func:`BaseFtDuino.output_set`.
+    """
+    if mode not in (OFF, HIGH, LOW):
+        raise ValueError('Invalid mode "{0}". Use 0, 1 or 2.'.format(mode))
+    if pwm is None:
+        pwm = MAX if mode == HIGH else MIN
+    return mode, pwm
+
+
+def _encode(cmd):
+    """\
+    Returns the payload of the provided command.
+    """
+    return (cmd + '\n').encode('utf-8')
+
+
+def _get_commands(ports):
+    """\
+    Returns the commands which read the provided input ports and counters.
+
+    :raise: ValueError in case of an unsupported port.
+    """
+    cmds = []
+    for port in ports:
+        kind = port[:1].upper()
+        if kind not in ('I', 'C'):
+            raise ValueError('Unsupported port "{0}", use I1 .. I8 or C1 .. C4'.format(port))
+        cmds.append('{0} {1}'.format('input_get' if kind == 'I' else 'counter_get', port.upper()))
+    return cmds
+
+
+def _set_command(port, value):
+    """\
+    Returns the command which sets the output `port` (O1 .. O8, M1 .. M4 or
+    LED) to `value`.
+
+    The value of an output port is an assigned output value, see
+    :py:func:`_output_value`, the value of a motor is a mode or a tuple of
+    mode and pwm, the value of the LED is a boolean.
+
+    :raise: ValueError in case of an unsupported port or value.
+    """
+    kind = port[:1]
+    if kind == 'O':
+        return 'output_set {0} {1} {2}'.format(port, *_output_args(*_output_value(value)))
+    if kind == 'M':
+        mode, pwm = (value, MAX) if not isinstance(value, tuple) else value
+        mode = mode.lower()
+        if mode not in _VALID_MOTOR_DIRECTIONS:
+            raise ValueError('Invalid motor mode "{0}", use {1}'.format(mode, _VALID_MOTOR_DIRECTIONS))
+        return 'motor_set {0} {1} {2}'.format(port, mode, pwm)
+    if port == 'LED':
+        return 'led_set {0}'.format(1 if value else 0)
+    raise ValueError('Unsupported output "{0}", use O1 .. O8, M1 .. M4 or LED'.format(port))
+
+
+def _output_commands(port):
+    """\
+    Returns a dict of the frequently assigned output values (``True``, ``False``,
+    ``HIGH``, ``LOW``, ``OFF``) to output_set commands.
+    """
+    # True == HIGH, False == OFF
+    return dict((value, 'output_set {0} {1} {2}'.format(port, *_output_args(*_output_value(value))))
+                for value in (True, False, LOW))
+
+
+def _motor_commands(port):
+    """\
+    Returns a dict of motor modes to tuples of (motor_set format, motor_counter format).
+    """
+    return dict((mode, ('motor_set {0} {1} {{0}}'.format(port, mode),
+                        'motor_counter {0} {1} {{0}} {{1}}'.format(port, mode)))
+                for mode in _VALID_MOTOR_DIRECTIONS)
+
+
+def _motor_run(ftd, cmds, pwm, steps):
+    """\
+    Issues a motor_set or a motor_counter command (if `steps` is provided).
+    """
+    if pwm is None:
+        pwm = MAX
+    if steps is None:
+        ftd.comm(cmds[0].format(pwm))
+    else:
+        ftd.comm(cmds[1].format(pwm, steps))
+
+
+class _Port:
+    """\
+    Base class of the port objects.
+
+    The port objects are created on demand by a :class:`PortMap`, the commands
+    are prepared once per port.
+    """
+    __slots__ = ('_ftd', 'name')
+
+    def __init__(self, ftd, name):
+        self._ftd = ftd
+        #: The port name, i.e. 'I1'
+        self.name = name
+
+    def __repr__(self):
+        return '<{0} {1}>'.format(self.__class__.__name__, self.name)
+
+
+class InputPort(_Port):
+    """\
+    Input port I1 .. I8.
+    """
+    __slots__ = ('_get_cmd',)
+
+    def __init__(self, ftd, name):
+        super(InputPort, self).__init__(ftd, name)
+        self._get_cmd = _encode('input_get ' + name)
+
+    @property
+    def value(self):
+        """\
+        Returns the value of the input port.
+
+        :rtype: int
+        """
+        return int(self._ftd._request(self._get_cmd))
+
+    def _set_mode(self, mode):
+        self._ftd.input_set_mode(self.name, mode)
+
+    #: Sets the mode, see :py:func:`BaseFtDuino.input_set_mode`
+    mode = property(None, _set_mode)
+
+
+class OutputPort(_Port):
+    """\
+    Output port O1 .. O8.
+    """
+    __slots__ = ('_set_fmt', '_cmds')
+
+    def __init__(self, ftd, name):
+        super(OutputPort, self).__init__(ftd, name)
+        self._set_fmt = 'output_set ' + name + ' {0} {1}'
+        self._cmds = _output_commands(name)
+
+    def set(self, mode, pwm=None):
+        """\
+        Sets the output port into the provided mode.
+
+        See :py:func:`BaseFtDuino.output_set`
+        """
+        self._ftd.comm(self._set_fmt.format(*_output_args(mode, pwm)))
+
+    def _set_value(self, value):
+        try:
+            cmd = self._cmds[value]
+        except (KeyError, TypeError):
+            cmd = self._set_fmt.format(*_output_args(*_output_value(value)))
+        self._ftd.comm(cmd)
+
+    #: Sets the output, see :class:`FtDuino` for the accepted values.
+    value = property(None, _set_value)
+
+
+class CounterPort(_Port):
+    """\
+    Counter C1 .. C4.
+    """
+    __slots__ = ('_get_cmd', '_clear_cmd', '_state_cmd')
+
+    def __init__(self, ftd, name):
+        super(CounterPort, self).__init__(ftd, name)
+        self._get_cmd = _encode('counter_get ' + name)
+        self._clear_cmd = 'counter_clear ' + name
+        self._state_cmd = 'counter_get_state ' + name
+
+    @property
+    def value(self):
+        """\
+        Returns the value of the counter.
+
+        :rtype: int
+        """
+        return int(self._ftd._request(self._get_cmd))
+
+    @property
+    def state(self):
+        """\
+        Returns the state of the counter.
+
+        :rtype: bool
+        """
+        return self._ftd.comm(self._state_cmd) == '1'
+
+    def clear(self):
+        """\
+        Clears the counter (sets the counter value to zero).
+        """
+        self._ftd.comm(self._clear_cmd)
+
+    def _set_mode(self, mode):
+        self._ftd.counter_set_mode(self.name, mode)
+
+    #: Sets the mode, see :py:func:`BaseFtDuino.counter_set_mode`
+    mode = property(None, _set_mode)
+
+
+class MotorPort(_Port):
+    """\
+    Motor port M1 .. M4.
+    """
+    __slots__ = ('_cmds', '_active_cmd')
+
+    def __init__(self, ftd, name):
+        super(MotorPort, self).__init__(ftd, name)
+        self._cmds = _motor_commands(name)
+        self._active_cmd = 'motor_counter_active ' + name
+
+    def left(self, pwm=None, steps=None):
+        """\
+        Sets the rotation of the motor to "left".
+
+        :param pwm: Pulse-width modulation value. If ``None`` the value is
+                    set to the maximum.
+        :param steps: Number of steps until the motor stops (encoder motor required).
+        """
+        _motor_run(self._ftd, self._cmds[MOTOR_LEFT], pwm, steps)
+
+    def right(self, pwm=None, steps=None):
+        """\
+        Sets the rotation of the motor to "right".
+
+        :param pwm: Pulse-width modulation value. If ``None`` the value is
+                    set to the maximum.
+        :param steps: Number of steps until the motor stops (encoder motor required).
+        """
+        _motor_run(self._ftd, self._cmds[MOTOR_RIGHT], pwm, steps)
+
+    def off(self, steps=None):
+        """\
+        Switches the motor off.
+
+        :param steps: Number of steps until the motor stops (encoder motor required).
+        """
+        _motor_run(self._ftd, self._cmds[MOTOR_OFF], OFF, steps)
+
+    def brake(self, pwm=None, steps=None):
+        """\
+        Brakes the motor.
+
+        :param pwm: Pulse-width modulation value. If ``None`` the value is
+                    set to the maximum.
+        :param steps: Number of steps until the motor stops (encoder motor required).
+        """
+        _motor_run(self._ftd, self._cmds[MOTOR_BRAKE], pwm, steps)
+
+    @property
+    def counter_active(self):
+        """\
+        Returns if the motor counter is active.
+
+        :rtype: bool
+        """
+        return self._ftd.comm(self._active_cmd) == '1'
+
+    def _set_counter_brake(self, enable):
+        self._ftd.motor_counter_set_brake(self.name, enable)
+
+    #: Sets the motor counter brake, see :py:func:`BaseFtDuino.motor_counter_set_brake`
+    counter_brake = property(None, _set_counter_brake)
+
+
+class PortMap:
+    """\
+    Read-only mapping of ports.
+
+    The ports are accessible by their number (``ftd.inputs[1]``) or by their
+    name (``ftd.inputs['I1']``, case-insensitive). The port objects are
+    created on first access.
+    """
+    __slots__ = ('_ftd', '_cls', '_prefix', '_ports')
+
+    def __init__(self, ftd, cls, prefix, count):
+        self._ftd = ftd
+        self._cls = cls
+        self._prefix = prefix
+        self._ports = [None] * count
+
+    def __len__(self):
+        return len(self._ports)
+
+    def __iter__(self):
+        for i in range(1, len(self._ports) + 1):
+            yield self[i]
+
+    def __getitem__(self, key):
+        idx = key
+        if not isinstance(key, int):
+            try:
+                prefix, idx = key[:1].upper(), int(key[1:])
+            except (TypeError, ValueError):
+                prefix = None
+            if prefix != self._prefix:
+                raise KeyError(key)
+        if not 0 < idx <= len(self._ports):
+            raise KeyError(key)
+        port = self._ports[idx - 1]
+        if port is None:
+            port = self._ports[idx - 1] = self._cls(self._ftd, '{0}{1}'.format(self._prefix, idx))
+        return port
+
+
+# Attribute name, port class, port name prefix, number of ports
+_PORT_TABLE = (
+    ('inputs', InputPort, 'I', 8),
+    ('outputs', OutputPort, 'O', 8),
+    ('counters', CounterPort, 'C', 4),
+    ('motors', MotorPort, 'M', 4),
+)
+
+
+class FtDuino(BaseFtDuino):
+    """\
+    This class provides all functions of the :class:`BaseFtDuino` and
+    adds a higher level API to access ports via attributes.
+
+    The red LED can be switched on and off via ``led = True`` or ``led = False``.
+
+    .. code-block:: python
+
+        ftd = FtDuino()
+        ftd.led = True  # Switches the LED on.
+
+
+    The input ports can be read by using the port names (i1 .. i8), i.e.
+    ``ftd.i1`` to get the value of input port "I1".
+
+    The output ports (o1 .. o8) can be enabled / disabled by assigning a boolean
+    value.
+
+    Example:
+
+    .. code-block:: python
+
+        ftd = FtDuino()
+        ftd.o1 = True   # Sets the output O1 to HIGH with a max. PWM value
+        ftd.o2 = False  # Sets the output O2 to LOW with a min. PWM value
+
+
+    Further, it is possible to specify the PWM value if a tuple is used:
+
+    .. code-block:: python
+
+        ftd = FtDuino()
+        ftd.o1 = ftdu.HIGH, ftdu.MAX / 2  # Sets the output O1 to HIGH with half speed
+
+
+    This class provides also methods to control motors at the ports M1 .. M4.
+
+    .. code-block:: python
+
+        ftd = FtDuino()
+        ftd.m1_left()   # Rotation left at full speed
+        ftd.m1_right(pwm=ftdu.MAX / 2)  # Rotation right with half speed
+
+        # Rotation right, full speed, stop after 38 steps (encoder motor)
+        ftd.m2_right(steps=38)
+
+
+    The ports are available as objects via :py:attr:`inputs`, :py:attr:`outputs`,
+    :py:attr:`counters`, and :py:attr:`motors`, see :class:`PortMap`.
+
+    .. code-block:: python
+
+        ftd = FtDuino()
+        ftd.inputs[1].value     # Same as ftd.i1
+        ftd.outputs['O2'].value = True
+        ftd.motors['M2'].left(steps=38)
+    """
+    def __init__(self, path=None, transport=None):
+        """\
+        See :class:`BaseFtDuino`
+        """
+        super(FtDuino, self).__init__(path, transport)
+
+    @property
+    def ultrasonic(self):
+        """\
+        Returns the value of the ultrasonic sensor.
+
+        :rtype: int
+        :return: The value of the ultrasonic sensor.
+        """
+        return self.ultrasonic_get()
+
+    def _led_set(self, enable):
+        """\
+        Sets the LED on / off.
+
+        :param bool enable: ``True`` to put the light on, ``False`` to switch it off.
+        """
+        self.led_set(enable)
+
+    led = property(None, _led_set)
+
+
+def _port_map_property(attr, cls, prefix, count):
+    """\
+    Returns a property which creates the :class:`PortMap` on first access.
+    """
+    private_attr = '_' + attr
+
+    def get(self):
+        try:
+            return self.__dict__[private_attr]
+        except KeyError:
+            ports = self.__dict__[private_attr] = PortMap(self, cls, prefix, count)
+            return ports
+
+    return property(get, doc='Returns the {0} {1}1 .. {1}{2}, see :class:`PortMap`.'
+                    .format(attr, prefix, count))
+
+
+def _method(name, func, doc):
+    func.__name__ = str(name)
+    func.__doc__ = doc
+    return func
+
+
+def _input_accessors(name):
+    get_cmd = _encode('input_get ' + name)
+    return {
+        name.lower(): property(lambda self: int(self._request(get_cmd)),
+                               doc='Returns the value of input port "{0}".\n\n'
+                                   ':rtype: int\n'.format(name)),
+        name.lower() + '_mode': property(None, lambda self, mode: self.input_set_mode(name, mode),
+                                         doc='Sets the mode of input port "{0}".'.format(name)),
+    }
+
+
+def _output_accessors(name):
+    set_fmt = 'output_set ' + name + ' {0} {1}'
+    cmds = _output_commands(name)
+
+    def set_output(self, value):
+        try:
+            cmd = cmds[value]
+        except (KeyError, TypeError):
+            cmd = set_fmt.format(*_output_args(*_output_value(value)))
+        self.comm(cmd)
+
+    return {
+        name.lower(): property(None, set_output, doc='Sets output port "{0}".'.format(name)),
+    }
+
+
+def _counter_accessors(name):
+    lname = name.lower()
+    get_cmd = _encode('counter_get ' + name)
+    clear_cmd, state_cmd = 'counter_clear ' + name, 'counter_get_state ' + name
+
+    def clear(self):
+        self.comm(clear_cmd)
+
+    return {
+        lname: property(lambda self: int(self._request(get_cmd)),
+                        doc='Returns the value of counter "{0}".\n\n:rtype: int\n'.format(name)),
+        lname + '_clear': _method(lname + '_clear', clear,
+                                  'Clears counter {0} (sets the counter value to zero).'.format(name)),
+        lname + '_state': property(lambda self: self.comm(state_cmd) == '1',
+                                   doc='Returns the state of counter "{0}".\n\n:rtype: bool\n'.format(name)),
+        lname + '_mode': property(None, lambda self, mode: self.counter_set_mode(name, mode),
+                                  doc='Sets the mode of counter "{0}".'.format(name)),
+    }
+
+
+def _motor_accessors(name):
+    lname = name.lower()
+    cmds = _motor_commands(name)
+    left, right, off, brake = cmds[MOTOR_LEFT], cmds[MOTOR_RIGHT], cmds[MOTOR_OFF], cmds[MOTOR_BRAKE]
+    active_cmd = 'motor_counter_active ' + name
+    params = '\n\n:param pwm: Pulse-width modulation value. If ``None`` the value is\n' \
+             '            set to the maximum.\n' \
+             ':param steps: Number of steps until the motor stops (encoder motor required).\n'
+    return {
+        lname + '_left': _method(lname + '_left',
+                                 lambda self, pwm=None, steps=None: _motor_run(self, left, pwm, steps),
+                                 'Sets the rotation of the motor at {0} to "left".{1}'.format(name, params)),
+        lname + '_right': _method(lname + '_right',
+                                  lambda self, pwm=None, steps=None: _motor_run(self, right, pwm, steps),
+                                  'Sets the rotation of the motor at {0} to "right".{1}'.format(name, params)),
+        lname + '_off': _method(lname + '_off',
+                                lambda self, steps=None: _motor_run(self, off, OFF, steps),
+                                'Switches the motor at {0} off.\n\n:param steps: Number of steps until '
+                                'the motor stops (encoder motor required).\n'.format(name)),
+        lname + '_brake': _method(lname + '_brake',
+                                  lambda self, pwm=None, steps=None: _motor_run(self, brake, pwm, steps),
+                                  'Brakes the motor at {0}.\n\nSee also :py:func:`motor_counter_set_brake`{1}'
+                                  .format(name, params)),
+        lname + '_counter_active': property(lambda self: self.comm(active_cmd) == '1',
+                                            doc='Returns if the motor counter for port {0} is active.\n\n'
+                                                ':rtype: bool\n'.format(name)),
+        lname + '_counter_brake': property(None, lambda self, enable: self.motor_counter_set_brake(name, enable),
+                                           doc='Sets the motor counter brake of port {0}, see '
+                                               ':py:func:`motor_counter_set_brake`.'.format(name)),
+    }
+
+
+def _install_ports(cls):
+    """\
+    Adds the port attributes (i1 .. i8, o1 .. o8, c1 .. c4, m1 .. m4) and the
+    port maps to the provided class.
+    """
+    accessors = {'I': _input_accessors, 'O': _output_accessors,
+                 'C': _counter_accessors, 'M': _motor_accessors}
+    for attr, port_cls, prefix, count in _PORT_TABLE:
+        setattr(cls, attr, _port_map_property(attr, port_cls, prefix, count))
+        for i in range(1, count + 1):
+            for name, value in accessors[prefix]('{0}{1}'.format(prefix, i)).items():
+                setattr(cls, name, value)
+
+
+_install_ports(FtDuino)
+
+
+def ftduino_iter():
+    """\
+    Returns an iterator / generator over all ftDuinos connected to the host device.
+    """
+    for path in _ftduino_paths():
+        yield path, _ftduino_probe(path)
+
+
+def ftduino_scan(max_workers=None):
+    """\
+    Returns all ftDuinos connected to the host device.
+
+    In contrast to :py:func:`ftduino_iter`, the ftDuinos are probed in parallel.
+
+    :param max_workers: Max. number of parallel probes. By default, all
+            ftDuinos are probed at once.
+    :rtype: list
+    :return: A list of ``(path, name)`` tuples.
+    """
+    paths = _ftduino_paths()
+    if not paths:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers or len(paths)) as executor:
+        return list(zip(paths, executor.map(_ftduino_probe, paths)))
+
+
+def _ftduino_paths():
+    """\
+    Returns the device paths of the connected ftDuinos.
+    """
+    from serial.tools import list_ports  # Imported on demand, it takes a while
+    # FTDUINO_VIRGIN_VIDPID = '1c40:0537', FTDUINO_VIDPID = '1c40:0538'
+    return [lpi.device for lpi in list_ports.grep(r'vid:pid=1c40:053[78]')]
+
+
+def _ftduino_probe(path):
+    """\
+    Returns the name of the ftDuino connected to `path`.
+    """
+    with SerialTransport(path) as conn:
+        conn.flush()
+        conn.write('ftduino_id_get\n'.encode('utf-8'))
+        return conn.readline().decode('utf-8')[:-2]
+
+
+def ftduino_find_by_name(name):
+    """
+    Returns the path of the ftDuino with the specified `name`.
+
+    :param name: Name of the ftDuino.
+    :return: The path of the ftDuino or ``None`` if the ftDuino was not found.
+    """
+    for path, device_name in ftduino_iter():
+        if device_name == name:
+            return path
+    return None
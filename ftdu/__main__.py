@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Runs the ``ftdu`` command, see :mod:`ftdu.cli`.
+"""
+from .cli import main
+
+main()
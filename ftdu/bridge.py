@@ -0,0 +1,583 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Network bridge which shares ftDuinos with many clients.
+
+Only one process can open the serial port of a ftDuino. The :class:`Bridge`
+owns one or more :class:`ftdu.BaseFtDuino` instances and accepts clients
+via TCP and / or a Unix domain socket. The requests of all clients are
+queued per device and executed in batches. A sampling stream of the ports
+is read once per device and fanned out to all subscribers.
+
+Clients use :class:`RemoteFtDuino` which provides the API of :class:`ftdu.FtDuino`:
+
+.. code-block:: python
+
+    from ftdu.bridge import RemoteFtDuino
+
+    with RemoteFtDuino(('localhost', 8765), device='Ampel') as ftd:
+        ftd.o1 = True
+        for timestamp, values in ftd.subscribe():
+            print(timestamp, values)
+
+Start the bridge with::
+
+    $ python -m ftdu.bridge --port 8765 /dev/ttyACM0
+
+The protocol is line based, each line is terminated by ``\\r\\n``. A client
+sends ``ftduino_direct`` commands and receives one reply per command (an
+empty line if the ftDuino did not answer). Lines starting with ``@`` select
+a device (``@Ampel``), ``!devices`` lists the device names and
+``!subscribe`` switches the connection into streaming mode: the bridge sends
+a header line ``# I1 I2 ...`` followed by lines ``<timestamp> <value> <value> ...``.
+"""
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import FtDuino
+from .transport import SocketTransport
+
+
+#: Reply if a request was successful but returned no value.
+ACK = 'Ok'
+#: Reply if a request failed.
+FAIL = 'Fail'
+
+#: Default port of the bridge.
+DEFAULT_PORT = 8765
+
+#: Ports which are sampled by default.
+DEFAULT_SAMPLE_PORTS = ('I1', 'I2', 'I3', 'I4', 'I5', 'I6', 'I7', 'I8',
+                        'C1', 'C2', 'C3', 'C4')
+
+
+class Bridge:
+    """\
+    Serves ftDuinos to many clients.
+    """
+    def __init__(self, devices, sample_ports=DEFAULT_SAMPLE_PORTS, sample_interval=0.05,
+                 max_batch=64, subscriber_queue_size=100):
+        """\
+        :param dict devices: Mapping of device names to :class:`ftdu.BaseFtDuino` instances.
+        :param sample_ports: The ports which are sampled for subscribers.
+        :param float sample_interval: Seconds between two samples.
+        :param int max_batch: Max. number of requests which are executed in a batch.
+        :param int subscriber_queue_size: Max. number of samples which are
+                queued per subscriber. If a subscriber is too slow, samples are dropped.
+        """
+        if not devices:
+            raise ValueError('No devices provided')
+        self._devices = dict((name, _Device(ftd, sample_ports, sample_interval, max_batch))
+                             for name, ftd in devices.items())
+        self._subscriber_queue_size = subscriber_queue_size
+        self._servers = []
+        self._writers = set()
+        self._loop = None
+        self._thread = None
+        #: The addresses the bridge listens to, available after :py:func:`start`
+        self.addresses = []
+
+    @property
+    def devices(self):
+        """\
+        Returns the device names.
+        """
+        return sorted(self._devices)
+
+    def stats(self):
+        """\
+        Returns a dict of device names to dicts of statistics.
+        """
+        return dict((name, dev.stats()) for name, dev in self._devices.items())
+
+    async def start(self, host=None, port=None, path=None):
+        """\
+        Starts the servers.
+
+        :param host: Host name / IP address to listen to (TCP).
+        :param port: TCP port (``0`` to choose a free port), ``None`` to
+                disable TCP.
+        :param path: Path of the Unix domain socket, ``None`` to disable it.
+        :return: List of addresses.
+        """
+        if port is None and path is None:
+            raise ValueError('Provide a TCP port or a socket path')
+        self._loop = asyncio.get_event_loop()
+        for dev in self._devices.values():
+            dev.start()
+        if port is not None:
+            server = await asyncio.start_server(self._handle, host, port)
+            self._servers.append(server)
+            self.addresses.append(server.sockets[0].getsockname()[:2])
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle, path)
+            self._servers.append(server)
+            self.addresses.append(path)
+        return self.addresses
+
+    async def close(self):
+        """\
+        Stops the servers. The ftDuinos are not closed.
+        """
+        for server in self._servers:
+            server.close()
+        for writer in list(self._writers):
+            writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        del self._servers[:]
+        for dev in self._devices.values():
+            await dev.stop()
+
+    def serve_forever(self, host=None, port=DEFAULT_PORT, path=None):
+        """\
+        Starts the servers and blocks until the process is interrupted.
+
+        See :py:func:`start` for the parameters.
+        """
+        async def main():
+            await self.start(host, port, path)
+            try:
+                await asyncio.gather(*[server.serve_forever() for server in self._servers])
+            finally:
+                await self.close()
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+
+    def start_thread(self, host='127.0.0.1', port=0, path=None):
+        """\
+        Starts the bridge in a background thread.
+
+        See :py:func:`start` for the parameters. Use :py:func:`stop` to stop the bridge.
+
+        :return: List of addresses.
+        """
+        ready = threading.Event()
+        errors = []
+        loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start(host, port, path))
+            except Exception as ex:
+                errors.append(ex)
+                ready.set()
+                return
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='ftdu-bridge')
+        self._thread.daemon = True
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self.addresses
+
+    def stop(self):
+        """\
+        Stops a bridge which was started by :py:func:`start_thread`.
+        """
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+
+    async def _handle(self, reader, writer):
+        """\
+        Handles a client connection.
+        """
+        device = next(iter(self._devices.values())) if len(self._devices) == 1 else None
+        # Replies are sent in the order of the requests, the requests are
+        # submitted without waiting for the previous reply (pipelining).
+        replies = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send_replies(replies, writer))
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                req = line.decode('utf-8').rstrip('\r\n')
+                if req.startswith('@'):
+                    device = self._devices.get(req[1:])
+                    replies.put_nowait(ACK if device is not None else FAIL)
+                elif req == '!devices':
+                    replies.put_nowait(' '.join(self.devices))
+                elif req == '!subscribe':
+                    if device is None:
+                        replies.put_nowait(FAIL)
+                        continue
+                    replies.put_nowait(ACK)
+                    replies.put_nowait(None)
+                    await sender
+                    await self._stream(device, reader, writer)
+                    return
+                elif device is None:
+                    replies.put_nowait(FAIL)
+                else:
+                    replies.put_nowait(device.submit(req))
+        except ConnectionError:
+            pass
+        finally:
+            if not sender.done():
+                replies.put_nowait(None)
+                try:
+                    await sender
+                except ConnectionError:
+                    pass
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _send_replies(self, replies, writer):
+        """\
+        Writes the replies in the order of the requests until ``None`` is received.
+        """
+        while True:
+            reply = await replies.get()
+            if reply is None:
+                break
+            if not isinstance(reply, str):  # Future
+                try:
+                    reply = await reply
+                except Exception:
+                    reply = FAIL
+                if reply is None:
+                    reply = ''
+            writer.write((reply + '\r\n').encode('utf-8'))
+            if replies.empty():
+                await writer.drain()
+        await writer.drain()
+
+    async def _stream(self, device, reader, writer):
+        """\
+        Sends the samples of the device until the client disconnects.
+        """
+        samples = asyncio.Queue(self._subscriber_queue_size)
+        writer.write(('# ' + ' '.join(device.sample_ports) + '\r\n').encode('utf-8'))
+        device.subscribe(samples)
+        eof = asyncio.ensure_future(reader.read())
+        try:
+            while True:
+                get = asyncio.ensure_future(samples.get())
+                done, _ = await asyncio.wait((eof, get), return_when=asyncio.FIRST_COMPLETED)
+                if get not in done:
+                    get.cancel()
+                    break
+                writer.write(get.result())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            eof.cancel()
+            device.unsubscribe(samples)
+            writer.close()
+
+
+class _Device:
+    """\
+    Queues the requests for a ftDuino and executes them in batches.
+    """
+    def __init__(self, ftd, sample_ports, sample_interval, max_batch):
+        self.ftd = ftd
+        self.sample_ports = tuple(sample_ports)
+        self._sample_cmds = [_read_command(port) for port in self.sample_ports]
+        # Input ports and counters are read as integers with one exchange (see BaseFtDuino.snapshot)
+        self._sample_ints = 'ultrasonic' not in (port.lower() for port in self.sample_ports)
+        self._sample_values = None
+        self._sample_interval = sample_interval
+        self._max_batch = max_batch
+        self._queue = None
+        self._worker = None
+        self._sampler = None
+        self._subscribers = set()
+        # All requests are executed by the same thread
+        self._executor = ThreadPoolExecutor(1)
+        self._requests = 0
+        self._batches = 0
+        self._samples = 0
+        self._dropped = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        for task in (self._worker, self._sampler):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._executor.shutdown()
+
+    def stats(self):
+        return {'requests': self._requests, 'batches': self._batches,
+                'samples': self._samples, 'dropped': self._dropped,
+                'subscribers': len(self._subscribers)}
+
+    def submit(self, cmd):
+        """\
+        Queues the command and returns a future of the reply.
+        """
+        fut = asyncio.get_event_loop().create_future()
+        self._queue.put_nowait((cmd, fut))
+        return fut
+
+    def subscribe(self, queue):
+        self._subscribers.add(queue)
+        if self._sampler is None:
+            self._sampler = asyncio.ensure_future(self._sample())
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    async def _run(self):
+        queue, max_batch = self._queue, self._max_batch
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            results = await loop.run_in_executor(self._executor, self._execute,
+                                                 [cmd for cmd, _ in batch])
+            self._requests += len(batch)
+            self._batches += 1
+            for (_, fut), res in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(res, Exception):
+                    fut.set_exception(res)
+                else:
+                    fut.set_result(res)
+
+    def _execute(self, cmds):
+        """\
+        Executes the commands with one exchange (runs in the executor thread).
+
+        If the exchange fails, the error is reported to the clients of all
+        commands. The commands are not sent again, some of them may have
+        been executed by the ftDuino.
+        """
+        try:
+            return self.ftd.comm_batch(cmds)
+        except Exception as ex:
+            return [ex] * len(cmds)
+
+    async def _sample(self):
+        loop = asyncio.get_event_loop()
+        interval = self._sample_interval
+        next_tick = loop.time()
+        try:
+            while self._subscribers:
+                try:
+                    results = await loop.run_in_executor(self._executor, self._read_samples)
+                except Exception:
+                    results = (None,) * len(self._sample_cmds)
+                line = '{0:.6f} {1}\r\n'.format(time.time(), ' '.join(_to_value(res) for res in results))
+                line = line.encode('utf-8')
+                self._samples += 1
+                for subscriber in list(self._subscribers):
+                    try:
+                        subscriber.put_nowait(line)
+                    except asyncio.QueueFull:
+                        self._dropped += 1
+                next_tick += interval
+                delay = next_tick - loop.time()
+                if delay < 0:
+                    next_tick = loop.time()
+                await asyncio.sleep(max(delay, 0))
+        finally:
+            self._sampler = None
+
+    def _read_samples(self):
+        """\
+        Reads the sampled ports with one exchange (runs in the executor thread).
+        """
+        if self._sample_ints:
+            self._sample_values = self.ftd._read_values(self.sample_ports, self._sample_values)
+            return self._sample_values
+        return self.ftd.comm_batch(self._sample_cmds)
+
+
+class RemoteFtDuino(FtDuino):
+    """\
+    A :class:`ftdu.FtDuino` which is connected to a :class:`Bridge`.
+    """
+    def __init__(self, address=('localhost', DEFAULT_PORT), device=None, timeout=5):
+        """\
+        Connects to the bridge.
+
+        :param address: Tuple (host, port) or the path of a Unix domain socket.
+        :param device: The device name. Optional if the bridge serves one device.
+        :param float timeout: Timeout in seconds.
+        """
+        super(RemoteFtDuino, self).__init__(transport=SocketTransport(_connect(address, timeout), timeout))
+        self._address = address
+        self._timeout = timeout
+        self.device = device
+        if device is not None and self.comm('@{0}'.format(device)) != ACK:
+            self.close()
+            raise ValueError('Unknown device "{0}"'.format(device))
+
+    def devices(self):
+        """\
+        Returns the names of the devices served by the bridge.
+        """
+        return self.comm('!devices').split()
+
+    def subscribe(self):
+        """\
+        Returns a :class:`Subscription` to the samples of the device.
+        """
+        return Subscription(self._address, self.device, self._timeout)
+
+
+class Subscription:
+    """\
+    Iterator over the samples provided by a :class:`Bridge`.
+
+    Each sample is a tuple ``(timestamp, values)``. The values are integers
+    in the order of the :py:attr:`ports`.
+    """
+    def __init__(self, address, device=None, timeout=5):
+        sock = _connect(address, timeout)
+        self._file = sock.makefile('rb')
+        self._sock = sock
+        try:
+            if device is not None:
+                sock.sendall('@{0}\n'.format(device).encode('utf-8'))
+                if self._readline() != ACK:
+                    raise ValueError('Unknown device "{0}"'.format(device))
+            sock.sendall(b'!subscribe\n')
+            header = self._readline()
+            if header == FAIL:
+                raise ValueError('Subscription failed, no device selected')
+            header = self._readline()
+        except Exception:
+            self.close()
+            raise
+        # Samples may arrive at a lower rate than the timeout
+        sock.settimeout(None)
+        #: The sampled ports.
+        self.ports = tuple(header[2:].split())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self._readline()
+        if not line:
+            raise StopIteration()
+        parts = line.split()
+        return float(parts[0]), tuple(int(v) for v in parts[1:])
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def _readline(self):
+        return self._file.readline().decode('utf-8').rstrip('\r\n')
+
+
+def _connect(address, timeout):
+    """\
+    Returns a socket connected to the provided address.
+    """
+    if isinstance(address, (tuple, list)):
+        return socket.create_connection(tuple(address), timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(address)
+    return sock
+
+
+def _read_command(port):
+    """\
+    Returns the command to read the value of the provided port.
+    """
+    if port.lower() == 'ultrasonic':
+        return 'ultrasonic_get'
+    kind = port[:1].upper()
+    if kind == 'I':
+        return 'input_get {0}'.format(port)
+    elif kind == 'C':
+        return 'counter_get {0}'.format(port)
+    raise ValueError('Unsupported port "{0}", use I1 .. I8, C1 .. C4 or "ultrasonic"'.format(port))
+
+
+def _to_value(reply):
+    """\
+    Converts a reply into an integer string, ``-1`` in case of an error.
+    """
+    try:
+        return str(int(reply))
+    except (TypeError, ValueError):
+        return '-1'
+
+
+def main(args=None):
+    """\
+    Starts the bridge daemon.
+    """
+    import argparse
+    from . import BaseFtDuino, ftduino_iter
+    parser = argparse.ArgumentParser(prog='ftdu-bridge', description='Shares ftDuinos via TCP / Unix domain sockets')
+    parser.add_argument('paths', nargs='*', metavar='PATH',
+                        help='Device paths. If omitted, all connected ftDuinos are used')
+    parser.add_argument('--host', default='127.0.0.1', help='Host / IP address to listen to (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='TCP port (default: %(default)s)')
+    parser.add_argument('--no-tcp', action='store_true', help='Disable TCP')
+    parser.add_argument('--unix', metavar='PATH', help='Path of a Unix domain socket')
+    parser.add_argument('--interval', type=float, default=0.05, help='Sample interval in seconds (default: %(default)s)')
+    parser.add_argument('--emulate', type=int, default=0, metavar='N', help='Serve N emulated ftDuinos')
+    opts = parser.parse_args(args)
+    devices = {}
+    if opts.emulate:
+        from .emulator import Emulator
+        from .transport import LoopbackTransport
+        for i in range(1, opts.emulate + 1):
+            name = 'emu{0}'.format(i)
+            devices[name] = BaseFtDuino(transport=LoopbackTransport(Emulator(name).handle))
+    paths = opts.paths or ([] if opts.emulate else [path for path, _ in ftduino_iter()])
+    for path in paths:
+        ftd = BaseFtDuino(path)
+        devices[ftd.ftduino_id_get() or path] = ftd
+    if not devices:
+        parser.error('No ftDuino found')
+    bridge = Bridge(devices, sample_interval=opts.interval)
+    port = None if opts.no_tcp else opts.port
+    print('Serving {0}'.format(', '.join(bridge.devices)))
+    try:
+        bridge.serve_forever(opts.host, port, opts.unix)
+    finally:
+        for ftd in devices.values():
+            ftd.close()
+
+
+if __name__ == '__main__':
+    main()
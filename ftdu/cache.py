@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Persistent cache of what is known about a ftDuino.
+
+A :class:`DeviceCache` keeps one entry per ftDuino ID
+(:py:func:`ftdu.BaseFtDuino.ftduino_id_get`) and ``ftduino_direct`` version
+in a JSON file. An entry contains the features of the sketch, the measured
+round trip time, a tuned read timeout and optionally a calibration (see :py:func:`ftdu.calibration.Calibration.as_dict`).
+
+:py:func:`DeviceCache.connect` asks the ftDuino for its ID and version with
+one exchange. A known ftDuino is set up from the cache, i.e. the fast paths
+which depend on the features (see :py:attr:`ftdu.BaseFtDuino.features`) are
+used immediately. The round trip time of an unknown ftDuino is measured once
+and the result is stored.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.cache import DeviceCache
+    from ftdu.calibration import Calibration
+
+    cache = DeviceCache()
+    with ftdu.FtDuino() as ftd:
+        entry = cache.connect(ftd)
+        cal = Calibration.from_dict(entry.get('calibration', {}), ftd)
+        ...
+        cache.put(entry['id'], entry['version'], calibration=cal.as_dict())
+
+If the firmware is updated, the version changes and the ftDuino is probed
+again.
+"""
+import io
+import json
+import os
+import threading
+import time
+from .metrics import summary
+
+
+#: The tuned timeout is the 99th percentile of the round trip time multiplied by this factor ...
+TIMEOUT_FACTOR = 10
+#: ... but not less than this value (seconds).
+MIN_TIMEOUT = 0.05
+
+_FORMAT_VERSION = 1
+
+
+def default_path():
+    """\
+    Returns the default path of the cache file: ``ftdu/devices.json`` within
+    ``$XDG_CACHE_HOME`` (``~/.cache``) or ``%LOCALAPPDATA%`` on Windows.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ftdu', 'devices.json')
+
+
+class DeviceCache:
+    """\
+    Device ID and version keyed cache, stored as JSON file.
+    """
+    def __init__(self, path=None):
+        """\
+        :param path: Path of the cache file, see :py:func:`default_path`. The
+                file is created by the first :py:func:`put`.
+        """
+        self.path = path or default_path()
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+    def get(self, device_id, version):
+        """\
+        Returns the entry of the provided ftDuino or ``None``.
+
+        :param str device_id: The ID of the ftDuino.
+        :param str version: The version string of the sketch.
+        :rtype: dict
+        """
+        with self._lock:
+            entry = self._load().get(_key(device_id, version))
+            return dict(entry) if entry is not None else None
+
+    def put(self, device_id, version, **values):
+        """\
+        Updates the entry of the provided ftDuino and writes the cache file.
+
+        :param str device_id: The ID of the ftDuino.
+        :param str version: The version string of the sketch.
+        :param values: The values to set, i.e. ``features`` (list), ``rtt``,
+                ``timeout`` (seconds) or ``calibration`` (dict).
+        :rtype: dict
+        :return: The updated entry.
+        """
+        if not device_id or version is None:
+            raise ValueError('Expected a device ID and a version, got {0!r}, {1!r}'.format(device_id, version))
+        with self._lock:
+            entries = self._load()
+            key = _key(device_id, version)
+            entry = entries.get(key) or {'id': device_id, 'version': version}
+            entry.update(values)
+            entry['updated'] = time.time()
+            entries[key] = entry
+            self._save()
+            return dict(entry)
+
+    def remove(self, device_id, version=None):
+        """\
+        Removes the entry of the provided ftDuino, all entries of the ID if
+        the `version` is ``None``.
+
+        :rtype: int
+        :return: The number of removed entries.
+        """
+        with self._lock:
+            entries = self._load()
+            keys = [key for key, entry in entries.items()
+                    if entry['id'] == device_id and version in (None, entry['version'])]
+            for key in keys:
+                del entries[key]
+            if keys:
+                self._save()
+            return len(keys)
+
+    def connect(self, ftd, probe=True):
+        """\
+        Identifies the ftDuino and sets it up from the cache.
+
+        If the cache has no entry for the ftDuino and `probe` is ``True``, the
+        ftDuino is probed (see :py:func:`probe_device`) and the result is stored.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino`.
+        :param bool probe: Indicates if an unknown ftDuino should be probed.
+        :rtype: dict
+        :return: The entry of the ftDuino. The entry of an unknown ftDuino
+                which was not probed contains the ID, the version and the
+                features only.
+        :raise: IOError if the ftDuino did not provide its ID.
+        """
+        device_id, version = identify(ftd)
+        entry = self.get(device_id, version)
+        if entry is None:
+            if not probe:
+                return {'id': device_id, 'version': version, 'features': sorted(ftd.features)}
+            entry = self.put(device_id, version, **probe_device(ftd))
+        apply(ftd, entry)
+        return entry
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with io.open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (IOError, OSError, ValueError):
+                data = {}
+            if not isinstance(data, dict) or data.get('format') != _FORMAT_VERSION \
+                    or not isinstance(data.get('devices'), dict):
+                data = {'devices': {}}
+            self._entries = data['devices']
+        return self._entries
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        tmp = '{0}.{1}.tmp'.format(self.path, os.getpid())
+        with io.open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'format': _FORMAT_VERSION, 'devices': self._entries}, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+
+
+def identify(ftd):
+    """\
+    Returns the ID and the version string of the ftDuino, requested with one
+    exchange. The features of the ftDuino are detected as side effect.
+
+    :param ftd: The :class:`ftdu.BaseFtDuino`.
+    :rtype: tuple
+    :return: ``(device_id, version)``
+    :raise: IOError if the ftDuino did not provide its ID.
+    """
+    device_id, version = ftd.comm_batch(['ftduino_id_get', 'ftduino_direct_get_version'])
+    if not device_id:
+        raise IOError('The ftDuino did not provide its ID')
+    version = version or ''
+    ftd._set_version(version)
+    return device_id, version
+
+
+def probe_device(ftd, count=20):
+    """\
+    Measures the round trip time.
+
+    :param ftd: The :class:`ftdu.BaseFtDuino`.
+    :param int count: Number of round trip measurements.
+    :rtype: dict
+    :return: A dict with the keys ``features``, ``rtt`` (the median in
+            seconds) and ``timeout``.
+    """
+    request = ftd._request
+    payload = b'ftduino_id_get\n'
+    rtts = []
+    for _ in range(count):
+        start = time.perf_counter()
+        request(payload)
+        rtts.append(time.perf_counter() - start)
+    rtt = summary(rtts)
+    return {'features': sorted(ftd.features), 'rtt': rtt['p50'],
+            'timeout': max(MIN_TIMEOUT, rtt['p99'] * TIMEOUT_FACTOR)}
+
+
+def apply(ftd, entry):
+    """\
+    Sets the version, the features and the read timeout of the provided entry.
+
+    The timeout is set if the transport of the ftDuino has a ``timeout``
+    attribute.
+
+    :param ftd: The :class:`ftdu.BaseFtDuino`.
+    :param dict entry: An entry, see :py:func:`DeviceCache.get`.
+    """
+    if 'features' in entry:
+        ftd._set_version(entry['version'], entry['features'])
+    timeout = entry.get('timeout')
+    if timeout is not None and hasattr(ftd._transport, 'timeout'):
+        ftd._transport.timeout = timeout
+
+
+def _key(device_id, version):
+    return '{0}|{1}'.format(device_id, version)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Conversion of raw port values into physical units.
+
+The meaning of the value of an input port depends on its mode: ``switch``
+(``0`` / ``1``), ``resistance`` (Ohm) or ``voltage`` (mV). A :class:`Calibration`
+knows the modes set via :py:func:`ftdu.BaseFtDuino.input_set_mode` and converts
+single values, snapshots or whole columns of samples (i.e. of a
+:class:`ftdu.recorder.Recorder` or a :class:`ftdu.recorder.Capture`).
+
+Columns are converted with NumPy if it is installed, the result is an
+``array('d')`` otherwise.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.calibration import Calibration, Table
+
+    with ftdu.FtDuino() as ftd:
+        ftd.input_set_mode('I1', ftdu.INPUT_MODE_VOLTAGE)
+        cal = Calibration(ftd)
+        # NTC: resistance (Ohm) -> temperature (°C)
+        cal.set('I2', Table([(900, 60), (2000, 40), (5000, 20), (10000, 5)], unit='°C'))
+        ftd.input_set_mode('I2', ftdu.INPUT_MODE_RESISTANCE)
+        volts, celsius = cal.convert_values(('I1', 'I2'), ftd.read_inputs(ports=('I1', 'I2')))
+"""
+from array import array
+from bisect import bisect_right
+from . import INPUT_MODE_SWITCH, INPUT_MODE_RESISTANCE, INPUT_MODE_VOLTAGE
+
+
+class Linear:
+    """\
+    Linear conversion ``value = raw * scale + offset``.
+    """
+    __slots__ = ('scale', 'offset', 'unit')
+
+    def __init__(self, scale=1.0, offset=0.0, unit=None):
+        """\
+        :param scale: The factor.
+        :param offset: The offset which is added after scaling.
+        :param unit: Optional name of the unit, i.e. ``'V'``.
+        """
+        self.scale = scale
+        self.offset = offset
+        self.unit = unit
+
+    def __call__(self, raw):
+        """\
+        Converts a single value.
+        """
+        return raw * self.scale + self.offset
+
+    def batch(self, values):
+        """\
+        Converts a sequence of values.
+
+        :param values: A sequence or buffer of raw values, i.e. an ``array``,
+                a :class:`memoryview` or a NumPy array.
+        :return: A NumPy float64 array if NumPy is available, an ``array('d')``
+                otherwise.
+        """
+        scale, offset = self.scale, self.offset
+        np = _numpy()
+        if np is not None:
+            res = np.asarray(values, dtype=np.float64) * scale
+            if offset:
+                res += offset
+            return res
+        return array('d', [raw * scale + offset for raw in values])
+
+    def as_dict(self):
+        """\
+        Returns the conversion as dict, see :py:func:`conversion_from_dict`.
+        """
+        return dict(type='linear', scale=self.scale, offset=self.offset, unit=self.unit)
+
+    def __repr__(self):
+        return 'Linear(scale={0!r}, offset={1!r}, unit={2!r})'.format(self.scale, self.offset, self.unit)
+
+
+class Table:
+    """\
+    Conversion by a lookup table with linear interpolation between the points.
+
+    Values outside of the table are clamped to the first / last point.
+    """
+    __slots__ = ('raws', 'values', 'unit')
+
+    def __init__(self, points, unit=None):
+        """\
+        :param points: Iterable of ``(raw, value)`` tuples, at least one.
+        :param unit: Optional name of the unit, i.e. ``'°C'``.
+        :raise: ValueError if no points are provided or if a raw value occurs
+                more than once.
+        """
+        points = sorted(points)
+        if not points:
+            raise ValueError('At least one point is required')
+        raws = [raw for raw, value in points]
+        if len(set(raws)) != len(raws):
+            raise ValueError('Duplicate raw values in {0}'.format(raws))
+        self.raws = tuple(raws)
+        self.values = tuple(value for raw, value in points)
+        self.unit = unit
+
+    def __call__(self, raw):
+        """\
+        Converts a single value.
+        """
+        raws, values = self.raws, self.values
+        idx = bisect_right(raws, raw)
+        if idx == 0:
+            return values[0]
+        if idx == len(raws):
+            return values[-1]
+        x0, x1 = raws[idx - 1], raws[idx]
+        y0, y1 = values[idx - 1], values[idx]
+        return y0 + (raw - x0) * (y1 - y0) / float(x1 - x0)
+
+    def batch(self, values):
+        """\
+        Converts a sequence of values.
+
+        :param values: A sequence or buffer of raw values, i.e. an ``array``,
+                a :class:`memoryview` or a NumPy array.
+        :return: A NumPy float64 array if NumPy is available, an ``array('d')``
+                otherwise.
+        """
+        np = _numpy()
+        if np is not None:
+            return np.interp(np.asarray(values, dtype=np.float64), self.raws, self.values)
+        return array('d', [self(raw) for raw in values])
+
+    def as_dict(self):
+        """\
+        Returns the conversion as dict, see :py:func:`conversion_from_dict`.
+        """
+        return dict(type='table', points=[list(p) for p in zip(self.raws, self.values)], unit=self.unit)
+
+    def __repr__(self):
+        return 'Table({0!r}, unit={1!r})'.format(list(zip(self.raws, self.values)), self.unit)
+
+
+#: Conversions of the input modes if no conversion was set for a port.
+MODE_CONVERSIONS = {
+    INPUT_MODE_SWITCH: Linear(),
+    INPUT_MODE_RESISTANCE: Linear(unit='Ohm'),
+    INPUT_MODE_VOLTAGE: Linear(0.001, unit='V'),
+}
+
+_IDENTITY = Linear()
+
+
+class Calibration:
+    """\
+    Per-port conversions of raw values.
+
+    The conversion of a port is looked up in this order: The conversion set
+    for the port (see :py:func:`set`), the conversion of the port's input mode
+    (see :py:data:`MODE_CONVERSIONS`), no conversion.
+    """
+    def __init__(self, ftd=None, conversions=None):
+        """\
+        :param ftd: Optional :class:`ftdu.BaseFtDuino` which provides the modes
+                of the input ports.
+        :param conversions: Optional dict which maps port names to conversions.
+        """
+        self._ftd = ftd
+        self._conversions = {}
+        for port, conversion in (conversions or {}).items():
+            self.set(port, conversion)
+
+    def set(self, port, conversion):
+        """\
+        Sets the conversion of the provided port.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :param conversion: A :class:`Linear`, a :class:`Table` or ``None`` to
+                remove the conversion.
+        """
+        port = port.upper()
+        if conversion is None:
+            self._conversions.pop(port, None)
+        else:
+            self._conversions[port] = conversion
+
+    def get(self, port):
+        """\
+        Returns the conversion of the provided port.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        """
+        port = port.upper()
+        conversion = self._conversions.get(port)
+        if conversion is None:
+            mode = self._ftd.input_get_mode(port) if self._ftd is not None and port.startswith('I') else None
+            conversion = MODE_CONVERSIONS.get(mode, _IDENTITY)
+        return conversion
+
+    def unit(self, port):
+        """\
+        Returns the unit of the provided port or ``None`` if the unit is unknown.
+        """
+        return self.get(port).unit
+
+    def convert(self, port, raw):
+        """\
+        Converts a single value.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :param raw: The raw value.
+        """
+        return self.get(port)(raw)
+
+    def convert_values(self, ports, values):
+        """\
+        Converts one value per port, i.e. the result of
+        :py:func:`ftdu.BaseFtDuino.snapshot`.
+
+        :param ports: Sequence of port names.
+        :param values: Sequence of raw values (in the order of `ports`).
+        :rtype: list
+        """
+        get = self.get
+        return [get(port)(raw) for port, raw in zip(ports, values)]
+
+    def convert_batch(self, port, values):
+        """\
+        Converts many values of one port.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :param values: A sequence or buffer of raw values, i.e. a column
+                of a :class:`ftdu.recorder.Chunk`.
+        :return: A NumPy float64 array if NumPy is available, an ``array('d')``
+                otherwise.
+        """
+        return self.get(port).batch(values)
+
+    def convert_columns(self, columns):
+        """\
+        Converts columns of samples.
+
+        :param columns: A dict which maps port names to columns, i.e. the
+                result of :py:func:`ftdu.recorder.Recorder.columns`. The
+                item ``'timestamp'`` is kept as it is.
+        :rtype: dict
+        """
+        return dict((port, values if port == 'timestamp' else self.convert_batch(port, values))
+                    for port, values in columns.items())
+
+    def as_dict(self):
+        """\
+        Returns the conversions set via :py:func:`set` as dict of
+        ``{port: dict}``. See :py:func:`from_dict`.
+        """
+        return dict((port, conversion.as_dict()) for port, conversion in self._conversions.items())
+
+    @classmethod
+    def from_dict(cls, conversions, ftd=None):
+        """\
+        Creates a calibration from the result of :py:func:`as_dict`.
+
+        :param dict conversions: Maps port names to dicts.
+        :param ftd: Optional :class:`ftdu.BaseFtDuino`.
+        """
+        return cls(ftd, dict((port, conversion_from_dict(d)) for port, d in conversions.items()))
+
+
+def conversion_from_dict(d):
+    """\
+    Creates a conversion from the result of ``Linear.as_dict()`` or ``Table.as_dict()``.
+
+    :param dict d: The conversion as dict.
+    :raise: ValueError if the type of the conversion is unknown.
+    """
+    kind = d.get('type')
+    if kind == 'linear':
+        return Linear(d.get('scale', 1.0), d.get('offset', 0.0), d.get('unit'))
+    if kind == 'table':
+        return Table([tuple(p) for p in d['points']], d.get('unit'))
+    raise ValueError('Unknown conversion type "{0}"'.format(kind))
+
+
+def _numpy():
+    """\
+    Returns the NumPy module or ``None`` if NumPy is not available.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+The ``ftdu`` command.
+
+Subcommands:
+
+``scan``
+    Lists the connected ftDuinos.
+``monitor``
+    Prints the values of all input ports and counters periodically.
+``bench``
+    Measures commands per second and the latency of the connection.
+``record``
+    Records port values into a capture file, see :mod:`ftdu.recorder`.
+``profile``
+    Breaks the time per command down into stages, see :mod:`ftdu.profiler`.
+``trace``
+    Prints a binary trace file, see :mod:`ftdu.trace`.
+``soak``
+    Runs a load / soak test against emulated ftDuinos, see :mod:`ftdu.soak`.
+
+The modules which are required by a subcommand are imported on demand.
+"""
+import argparse
+import sys
+import time
+
+
+def main(args=None):
+    """\
+    Runs the ``ftdu`` command.
+
+    :param args: Optional list of command line arguments.
+    """
+    parser = _make_parser()
+    opts = parser.parse_args(args)
+    if opts.command is None:
+        parser.print_help()
+        return
+    opts.func(parser, opts)
+
+
+def _make_parser():
+    parser = argparse.ArgumentParser(prog='ftdu', description='ftDuino command line tool')
+    device = argparse.ArgumentParser(add_help=False)
+    group = device.add_mutually_exclusive_group()
+    group.add_argument('--path', help='Device path. If omitted, the first ftDuino found is used')
+    group.add_argument('--name', help='Name of the ftDuino')
+    group.add_argument('--emulate', action='store_true', help='Use an emulated ftDuino')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    scan = subparsers.add_parser('scan', help='List the connected ftDuinos')
+    scan.add_argument('--workers', type=_positive(int), help='Max. number of parallel probes')
+    scan.set_defaults(func=_scan)
+    monitor = subparsers.add_parser('monitor', parents=[device], help='Print the input ports and counters')
+    monitor.add_argument('--rate', type=_positive(float), default=10, help='Rows per second (default: %(default)s)')
+    monitor.add_argument('--count', type=_positive(int), help='Number of rows. If omitted, runs until interrupted')
+    monitor.set_defaults(func=_monitor)
+    bench = subparsers.add_parser('bench', parents=[device], help='Measure throughput and latency')
+    bench.add_argument('--count', type=_positive(int), default=1000, help='Number of exchanges (default: %(default)s)')
+    bench.set_defaults(func=_bench)
+    record = subparsers.add_parser('record', parents=[device], help='Record port values into a capture file')
+    record.add_argument('file', help='Path of the capture file')
+    record.add_argument('--ports', nargs='+', default=['I1', 'I2', 'I3', 'I4', 'I5', 'I6', 'I7', 'I8'],
+                        metavar='PORT', help='Ports to record (default: I1 .. I8)')
+    record.add_argument('--interval', type=_positive(float), default=0.01,
+                        help='Seconds between two samples (default: %(default)s)')
+    record.add_argument('--duration', type=_positive(float), help='Duration in seconds')
+    record.add_argument('--count', type=_positive(int), help='Number of samples')
+    record.set_defaults(func=_record)
+    profile = subparsers.add_parser('profile', parents=[device], help='Break the time per command down into stages')
+    profile.add_argument('--count', type=_positive(int), default=1000, help='Number of rounds (default: %(default)s)')
+    profile.add_argument('--trace', metavar='FILE', help='Write a Chrome trace (JSON) into FILE')
+    profile.add_argument('--folded', metavar='FILE', help='Write folded stacks (flame graph input) into FILE')
+    profile.set_defaults(func=_profile)
+    trace = subparsers.add_parser('trace', help='Print a binary trace file')
+    trace.add_argument('file', help='Path of the trace file')
+    trace.add_argument('--json', metavar='FILE', help='Convert the trace into a JSON trace file (see ftdu.replay)')
+    trace.set_defaults(func=_trace)
+    soak = subparsers.add_parser('soak', help='Run a load / soak test against emulated ftDuinos')
+    soak.add_argument('--boards', type=_positive(int), default=20, help='Number of ftDuinos (default: %(default)s)')
+    soak.add_argument('--duration', type=_positive(float), default=60, help='Duration in seconds (default: %(default)s)')
+    soak.add_argument('--interval', type=_positive(float), default=5,
+                      help='Seconds per report line (default: %(default)s)')
+    soak.add_argument('--mix', default='read=6,snapshot=2,write=3,move=1',
+                      help='Operations and their weights (default: %(default)s)')
+    soak.add_argument('--latency', type=float, default=0.0002,
+                      help='Round trip time in seconds (default: %(default)s)')
+    soak.add_argument('--spike-rate', type=float, default=0.0,
+                      help='Share of exchanges with a latency spike (default: %(default)s)')
+    soak.add_argument('--spike', type=float, default=0.05,
+                      help='Duration of a latency spike in seconds (default: %(default)s)')
+    soak.add_argument('--drop-rate', type=float, default=0.0,
+                      help='Share of lost replies (default: %(default)s)')
+    soak.add_argument('--timeout', type=float, default=0.02,
+                      help='Read timeout in seconds (default: %(default)s)')
+    soak.add_argument('--sync', type=_positive(int), metavar='N',
+                      help='Verify the replies with a sync command after N commands')
+    soak.add_argument('--multi-get', action='store_true', help='Emulate a sketch which supports multi_get')
+    soak.add_argument('--seed', type=int, help='Seed of the operations and faults')
+    soak.set_defaults(func=_soak)
+    return parser
+
+
+def _positive(convert):
+    """\
+    Returns an argument type which accepts numbers greater than zero.
+    """
+    def positive(value):
+        number = convert(value)
+        if number <= 0:
+            raise argparse.ArgumentTypeError('Expected a value greater than zero, got {0}'.format(value))
+        return number
+    positive.__name__ = convert.__name__
+    return positive
+
+
+def _connect(parser, opts):
+    """\
+    Returns the :class:`ftdu.BaseFtDuino` selected by the command line options.
+    """
+    from . import BaseFtDuino, ftduino_find_by_name
+    if opts.emulate:
+        from .emulator import Emulator
+        from .transport import LoopbackTransport
+        return BaseFtDuino(transport=LoopbackTransport(Emulator().handle))
+    path = opts.path
+    if opts.name is not None:
+        path = ftduino_find_by_name(opts.name)
+        if path is None:
+            parser.error('ftDuino "{0}" not found'.format(opts.name))
+    try:
+        return BaseFtDuino(path)
+    except ValueError as ex:
+        parser.error(str(ex))
+
+
+def _scan(parser, opts):
+    from . import ftduino_scan
+    devices = ftduino_scan(opts.workers)
+    for path, name in devices:
+        print('{0}\t{1}'.format(path, name))
+    if not devices:
+        print('No ftDuino found', file=sys.stderr)
+
+
+def _monitor(parser, opts):
+    from . import SNAPSHOT_PORTS
+    interval = 1.0 / opts.rate
+    with _connect(parser, opts) as ftd:
+        print(' '.join('{0:>6}'.format(port) for port in SNAPSHOT_PORTS))
+        values = None
+        n = 0
+        next_tick = time.time()
+        try:
+            while opts.count is None or n < opts.count:
+                values = ftd.snapshot(values)
+                print(' '.join('{0:>6}'.format(value) for value in values))
+                sys.stdout.flush()
+                n += 1
+                next_tick += interval
+                delay = next_tick - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:  # Too slow, don't try to catch up
+                    next_tick = time.time()
+        except KeyboardInterrupt:
+            pass
+
+
+def _bench(parser, opts):
+    from . import SNAPSHOT_PORTS
+    from .metrics import percentile
+    count = opts.count
+    clock = time.perf_counter
+    with _connect(parser, opts) as ftd:
+        latencies = []
+        request = ftd._request
+        start = clock()
+        for _ in range(count):
+            t = clock()
+            request(b'input_get I1\n')
+            latencies.append(clock() - t)
+        elapsed = clock() - start
+        latencies.sort()
+        print('single:   {0} commands, {1:.0f} cmd/s'.format(count, count / elapsed))
+        print('latency:  {0} (us)'.format(', '.join('{0} {1:.1f}'.format(name, percentile(latencies, p) * 1e6)
+                                                     for name, p in (('p50', 50), ('p90', 90),
+                                                                     ('p99', 99), ('max', 100)))))
+        values = None
+        start = clock()
+        for _ in range(count):
+            values = ftd.snapshot(values)
+        elapsed = clock() - start
+        n = count * len(SNAPSHOT_PORTS)
+        print('snapshot: {0} commands, {1:.0f} cmd/s, {2:.1f} us per snapshot'
+              .format(n, n / elapsed, elapsed / count * 1e6))
+
+
+def _record(parser, opts):
+    from .recorder import Recorder
+    if opts.duration is None and opts.count is None:
+        parser.error('Provide --duration and / or --count')
+    with _connect(parser, opts) as ftd:
+        try:
+            rec = Recorder(ftd, opts.ports, path=opts.file)
+        except ValueError as ex:
+            parser.error(str(ex))
+        try:
+            rec.run(opts.interval, opts.duration, opts.count)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            rec.close()
+    print('Recorded {0} samples into "{1}"'.format(len(rec), opts.file))
+
+
+def _profile(parser, opts):
+    from .profiler import Profiler
+    with _connect(parser, opts) as ftd, Profiler(ftd, events=opts.count * 4) as profiler:
+        values = None
+        for _ in range(opts.count):
+            ftd.comm('input_get I1')
+            ftd.input_get('I1')
+            ftd.comm_batch(['input_get I1', 'counter_get C1'])
+            values = ftd.snapshot(values)
+    print(profiler.report())
+    if opts.trace:
+        profiler.chrome_trace(opts.trace)
+    if opts.folded:
+        with open(opts.folded, 'w') as f:
+            f.write(profiler.folded() + '\n')
+
+
+def _trace(parser, opts):
+    from .trace import read_trace, format_trace
+    try:
+        records = read_trace(opts.file)
+    except (IOError, ValueError) as ex:
+        parser.error(str(ex))
+    if opts.json:
+        from .replay import dump_trace
+        dump_trace(((t, request, reply) for t, request, reply, _ in records), opts.json)
+        return
+    for line in format_trace(records):
+        print(line)
+
+
+def _soak(parser, opts):
+    from . import FEATURE_MULTI_GET
+    from .soak import Soak, format_window
+    try:
+        mix = dict((name.strip(), float(weight)) for name, weight in
+                   (item.split('=') for item in opts.mix.split(',') if item.strip()))
+    except ValueError:
+        parser.error('Invalid mix "{0}", expected i.e. "read=6,write=1"'.format(opts.mix))
+    try:
+        soak = Soak(opts.boards, mix, latency=opts.latency, spike_rate=opts.spike_rate, spike=opts.spike,
+                    drop_rate=opts.drop_rate, timeout=opts.timeout, sync_interval=opts.sync,
+                    features=(FEATURE_MULTI_GET,) if opts.multi_get else (), seed=opts.seed)
+    except ValueError as ex:
+        parser.error(str(ex))
+    report = soak.run(opts.duration, opts.interval, callback=lambda window: print(format_window(window)))
+    print()
+    print(report.format(windows=False))
+
+
+if __name__ == '__main__':
+    main()
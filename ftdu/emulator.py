@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Emulation of a ftDuino running the ``ftduino_direct`` sketch.
+
+The :class:`Emulator` answers ``ftduino_direct`` commands and keeps the
+state of the ports. It can be used with :class:`ftdu.transport.LoopbackTransport`
+or it can serve a socket, see :py:func:`Emulator.serve`.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.emulator import Emulator
+    from ftdu.transport import LoopbackTransport
+
+    emu = Emulator()
+    emu.inputs['I1'] = 1
+    with ftdu.FtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        assert ftd.i1 == 1
+
+The emulator answers each command with exactly one line. Commands which do
+not return a value are answered with :py:data:`ACK`, invalid commands with
+:py:data:`FAIL`.
+
+The ``multi_get`` command (``multi_get I1 I2 C1``, answered by one line with
+space-separated values) is available if the emulator is created with the
+feature :py:data:`ftdu.FEATURE_MULTI_GET`.
+"""
+import threading
+
+
+#: Reply to commands which do not return a value.
+ACK = 'Ok'
+#: Reply to invalid commands.
+FAIL = 'Fail'
+
+#: The emulated ftduino_direct version.
+VERSION = '1.3.0'
+
+_INPUTS = tuple('I{0}'.format(i) for i in range(1, 9))
+_OUTPUTS = tuple('O{0}'.format(i) for i in range(1, 9))
+_COUNTERS = tuple('C{0}'.format(i) for i in range(1, 5))
+_MOTORS = tuple('M{0}'.format(i) for i in range(1, 5))
+
+_INPUT_MODES = ('switch', 'resistance', 'voltage')
+_COUNTER_MODES = ('none', 'rising', 'falling', 'any')
+_MOTOR_MODES = ('off', 'left', 'right', 'brake')
+_BOOLS = {'true': True, '1': True, 'false': False, '0': False}
+
+
+class Emulator:
+    """\
+    Emulates the ``ftduino_direct`` command set.
+
+    The state of the ports is available via the attributes :py:attr:`inputs`,
+    :py:attr:`input_modes`, :py:attr:`outputs`, :py:attr:`motors`,
+    :py:attr:`counters`, :py:attr:`counter_modes`, :py:attr:`led`,
+    :py:attr:`ultrasonic` and :py:attr:`ultrasonic_enabled`. The port names
+    are upper case.
+    """
+    def __init__(self, name='ftDuino', version=VERSION, features=()):
+        """\
+        :param name: The ID of the ftDuino, see :py:func:`ftdu.BaseFtDuino.ftduino_id_get`
+        :param version: The ftduino_direct version.
+        :param features: Optional features of the sketch which are announced
+                by the version string, i.e. ``(ftdu.FEATURE_MULTI_GET,)``.
+        """
+        self.name = name
+        self.version = version
+        #: The emulated features.
+        self.features = tuple(features)
+        #: Input values, can be changed to emulate sensors.
+        self.inputs = dict.fromkeys(_INPUTS, 0)
+        self.input_modes = dict.fromkeys(_INPUTS, 'switch')
+        #: Output states, tuples of (mode, pwm)
+        self.outputs = dict.fromkeys(_OUTPUTS, (0, 0))
+        #: Motor states, tuples of (mode, pwm)
+        self.motors = dict.fromkeys(_MOTORS, ('off', 0))
+        #: Remaining steps of motors which run with a counter.
+        self.motor_counters = dict.fromkeys(_MOTORS, 0)
+        self.motor_brakes = dict.fromkeys(_MOTORS, False)
+        #: Counter values, can be changed to emulate events.
+        self.counters = dict.fromkeys(_COUNTERS, 0)
+        self.counter_modes = dict.fromkeys(_COUNTERS, 'none')
+        #: Counter input states.
+        self.counter_states = dict.fromkeys(_COUNTERS, False)
+        self.led = False
+        self.ultrasonic_enabled = False
+        #: Distance reported by the ultrasonic sensor if enabled.
+        self.ultrasonic = 0
+        #: Number of handled commands.
+        self.count = 0
+        self._lock = threading.Lock()
+        self._commands = {
+            'output_set': (self._output_set, 3),
+            'input_get': (self._input_get, 1),
+            'input_set_mode': (self._input_set_mode, 2),
+            'counter_set_mode': (self._counter_set_mode, 2),
+            'counter_get': (self._counter_get, 1),
+            'counter_clear': (self._counter_clear, 1),
+            'counter_get_state': (self._counter_get_state, 1),
+            'ultrasonic_get': (self._ultrasonic_get, 0),
+            'ultrasonic_enable': (self._ultrasonic_enable, 1),
+            'motor_set': (self._motor_set, 3),
+            'motor_counter': (self._motor_counter, 4),
+            'motor_counter_active': (self._motor_counter_active, 1),
+            'motor_counter_set_brake': (self._motor_counter_set_brake, 2),
+            'led_set': (self._led_set, 1),
+            'ftduino_direct_get_version': (lambda: ' '.join((self.version,) + self.features), 0),
+            'ftduino_id_get': (lambda: self.name, 0),
+        }
+
+    def handle(self, request):
+        """\
+        Executes the provided command.
+
+        :param str request: A command line without line terminator, i.e. ``'input_get I1'``.
+        :rtype: str
+        :return: The reply.
+        """
+        parts = request.split()
+        if not parts:
+            return FAIL
+        cmd, args = parts[0].lower(), parts[1:]
+        with self._lock:
+            self.count += 1
+            if cmd == 'ftduino_id_set':
+                if not args:
+                    return FAIL
+                self.name = request.split(None, 1)[1].strip()
+                return ACK
+            if cmd == 'multi_get' and 'multi_get' in self.features:
+                return self._multi_get(args)
+            try:
+                func, num_args = self._commands[cmd]
+            except KeyError:
+                return FAIL
+            if len(args) != num_args:
+                return FAIL
+            try:
+                res = func(*args)
+            except (KeyError, ValueError):
+                return FAIL
+        return ACK if res is None else '{0}'.format(res)
+
+    def serve(self, sock):
+        """\
+        Answers the commands received via the provided socket until the
+        peer closes the connection.
+
+        :param sock: A connected socket.
+        """
+        buf = b''
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            buf += data
+            lines = buf.split(b'\n')
+            buf = lines.pop()
+            replies = [self.handle(line.decode('utf-8').rstrip('\r')) for line in lines]
+            if replies:
+                sock.sendall(''.join(reply + '\r\n' for reply in replies).encode('utf-8'))
+
+    def _output_set(self, port, mode, pwm):
+        port, mode, pwm = port.upper(), int(mode), _int(pwm)
+        if port not in self.outputs or mode not in (0, 1, 2):
+            raise ValueError()
+        self.outputs[port] = mode, pwm
+
+    def _multi_get(self, ports):
+        try:
+            values = [self.inputs[port.upper()] if port[:1] in 'iI' else self.counters[port.upper()]
+                      for port in ports]
+        except KeyError:
+            return FAIL
+        return ' '.join('{0}'.format(value) for value in values) if values else FAIL
+
+    def _input_get(self, port):
+        return self.inputs[port.upper()]
+
+    def _input_set_mode(self, port, mode):
+        port, mode = port.upper(), mode.lower()
+        if port not in self.input_modes or mode not in _INPUT_MODES:
+            raise ValueError()
+        self.input_modes[port] = mode
+
+    def _counter_set_mode(self, port, mode):
+        port, mode = port.upper(), mode.lower()
+        if port not in self.counter_modes or mode not in _COUNTER_MODES:
+            raise ValueError()
+        self.counter_modes[port] = mode
+
+    def _counter_get(self, port):
+        return self.counters[port.upper()]
+
+    def _counter_clear(self, port):
+        port = port.upper()
+        if port not in self.counters:
+            raise ValueError()
+        self.counters[port] = 0
+
+    def _counter_get_state(self, port):
+        return 1 if self.counter_states[port.upper()] else 0
+
+    def _ultrasonic_get(self):
+        return self.ultrasonic if self.ultrasonic_enabled else -1
+
+    def _ultrasonic_enable(self, enable):
+        self.ultrasonic_enabled = _BOOLS[enable.lower()]
+
+    def _motor_set(self, port, mode, pwm):
+        port, mode = port.upper(), mode.lower()
+        if port not in self.motors or mode not in _MOTOR_MODES:
+            raise ValueError()
+        self.motors[port] = mode, _int(pwm)
+        self.motor_counters[port] = 0
+
+    def _motor_counter(self, port, mode, pwm, counter):
+        self._motor_set(port, mode, pwm)
+        self.motor_counters[port.upper()] = _int(counter)
+
+    def _motor_counter_active(self, port):
+        return 1 if self.motor_counters[port.upper()] > 0 else 0
+
+    def _motor_counter_set_brake(self, port, enable):
+        port = port.upper()
+        if port not in self.motor_brakes:
+            raise ValueError()
+        self.motor_brakes[port] = _BOOLS[enable.lower()]
+
+    def _led_set(self, enable):
+        self.led = _BOOLS[enable.lower()]
+
+
+def _int(value):
+    """\
+    Converts a numeric argument into an integer, accepts floats, i.e. ``'256.0'``.
+    """
+    return int(float(value))
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Streaming export of sampled port values.
+
+The sampling loop hands the samples to a :class:`StreamExporter` which
+passes them through a bounded queue to a writer thread. The writer thread
+collects the samples into batches and writes them in bulk, so the sampling
+loop never waits for the disk.
+
+.. code-block:: python
+
+    import time
+    import ftdu
+    from ftdu.export import StreamExporter, CsvWriter
+
+    ports = ('I1', 'I2')
+    with ftdu.FtDuino() as ftd, StreamExporter(CsvWriter('run.csv', ports)) as exporter:
+        while True:
+            exporter.put(time.time(), [ftd.i1, ftd.i2])
+"""
+import csv
+import io
+import queue
+import threading
+import time
+from .recorder import Recorder
+
+
+_STOP = object()
+
+
+class ExportStats:
+    """\
+    Statistics of a :class:`StreamExporter`.
+    """
+    __slots__ = ('enqueued', 'written', 'dropped', 'batches', 'max_depth',
+                 'blocked', 'write_time')
+
+    def __init__(self):
+        #: Number of samples accepted by the exporter.
+        self.enqueued = 0
+        #: Number of samples written by the writer thread.
+        self.written = 0
+        #: Number of samples which were dropped because the queue was full.
+        self.dropped = 0
+        #: Number of bulk writes.
+        self.batches = 0
+        #: Max. number of samples waiting in the queue.
+        self.max_depth = 0
+        #: Seconds the sampling loop waited for the writer (``block=True`` only).
+        self.blocked = 0.0
+        #: Seconds spent by the writer thread for writing.
+        self.write_time = 0.0
+
+    def as_dict(self):
+        """\
+        Returns the statistics as dict.
+        """
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class StreamExporter:
+    """\
+    Writes samples in a background thread.
+    """
+    def __init__(self, writer, maxsize=10000, batch_size=1000, block=False):
+        """\
+        Initializes the exporter and starts the writer thread.
+
+        :param writer: The writer, i.e. :class:`CsvWriter` or :class:`ChunkWriter`.
+        :param int maxsize: Max. number of samples which are kept in the queue.
+        :param int batch_size: Max. number of samples per bulk write.
+        :param bool block: Indicates if :py:func:`put` should wait if the
+                queue is full (backpressure) or if the sample should be dropped
+                (default). Dropped samples are counted, see :py:attr:`stats`.
+        """
+        if maxsize < 1 or batch_size < 1:
+            raise ValueError('maxsize and batch_size must be positive')
+        self._writer = writer
+        self._queue = queue.Queue(maxsize)
+        self._batch_size = batch_size
+        self._block = block
+        self._error = None
+        self.stats = ExportStats()
+        self._thread = threading.Thread(target=self._run, name='ftdu-export')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def put(self, timestamp, values):
+        """\
+        Hands a sample over to the writer thread.
+
+        :param float timestamp: Timestamp of the sample.
+        :param values: Sequence of values (in the order of the columns of the writer).
+        :rtype: bool
+        :return: ``True`` if the sample was accepted, ``False`` if it was dropped.
+        """
+        if self._error is not None:
+            raise self._error
+        q, stats = self._queue, self.stats
+        try:
+            q.put_nowait((timestamp, values))
+        except queue.Full:
+            if not self._block:
+                stats.dropped += 1
+                return False
+            start = time.time()
+            q.put((timestamp, values))
+            stats.blocked += time.time() - start
+        stats.enqueued += 1
+        depth = q.qsize()
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+        return True
+
+    def close(self):
+        """\
+        Writes all pending samples and closes the writer.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self._writer.close()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        """\
+        The writer thread.
+        """
+        q, writer, stats, batch_size = self._queue, self._writer, self.stats, self._batch_size
+        clock = time.time
+        stop = False
+        while not stop:
+            batch = [q.get()]
+            while len(batch) < batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                stop = True
+                batch.pop()
+            if not batch or self._error is not None:
+                continue
+            start = clock()
+            try:
+                writer.write_rows(batch)
+            except Exception as ex:  # Reported by put() / close()
+                self._error = ex
+                continue
+            stats.write_time += clock() - start
+            stats.written += len(batch)
+            stats.batches += 1
+
+
+class CsvWriter:
+    """\
+    Writes samples as CSV.
+
+    The first column is the timestamp, followed by one column per port.
+    """
+    def __init__(self, path, columns, buffer_size=1 << 16):
+        """\
+        :param path: Path of the CSV file.
+        :param columns: Sequence of column names, i.e. ``('I1', 'I2')``.
+        :param int buffer_size: Size of the write buffer in bytes.
+        """
+        self._file = io.open(path, 'w', newline='', encoding='utf-8', buffering=buffer_size)
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(('timestamp',) + tuple(columns))
+        self._num_columns = len(columns)
+
+    def write_rows(self, rows):
+        """\
+        Writes the provided samples.
+
+        :param rows: Sequence of ``(timestamp, values)`` tuples.
+        """
+        num_columns = self._num_columns
+        for _, values in rows:
+            if len(values) != num_columns:
+                raise ValueError('Expected {0} values, got {1}'.format(num_columns, len(values)))
+        self._csv.writerows([(ts,) + tuple(values) for ts, values in rows])
+
+    def close(self):
+        """\
+        Closes the file.
+        """
+        self._file.close()
+
+
+class ChunkWriter:
+    """\
+    Writes samples in the chunked binary format of :class:`ftdu.recorder.Recorder`.
+
+    Use :class:`ftdu.recorder.Capture` to read the file.
+    """
+    def __init__(self, path, columns, chunk_size=4096):
+        """\
+        :param path: Path of the capture file.
+        :param columns: Sequence of port names, i.e. ``('I1', 'I2')``.
+        :param int chunk_size: Number of samples per chunk.
+        """
+        self._recorder = Recorder(ports=columns, chunk_size=chunk_size, path=path)
+
+    def write_rows(self, rows):
+        """\
+        Writes the provided samples.
+
+        :param rows: Sequence of ``(timestamp, values)`` tuples.
+        """
+        append = self._recorder.append
+        for ts, values in rows:
+            append(ts, values)
+
+    def close(self):
+        """\
+        Writes the pending samples and closes the file.
+        """
+        self._recorder.close()
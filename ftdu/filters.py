@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Incremental filters to smooth noisy port values.
+
+Each filter keeps a constant amount of state. :py:func:`Filter.update` filters
+one value, :py:func:`Filter.batch` filters a sequence of values (i.e. a column
+of a :class:`ftdu.recorder.Capture`).
+
+A :class:`FilterBank` attaches filters to ports and filters the values of
+:py:func:`ftdu.BaseFtDuino.snapshot` or :py:func:`ftdu.BaseFtDuino.read_inputs`.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.filters import FilterBank, MovingAverage, Kalman
+
+    with ftdu.FtDuino() as ftd:
+        ftd.ultrasonic_enable(True)
+        bank = FilterBank({'I1': MovingAverage(8)})
+        distance = Kalman()
+        while True:
+            i1, = bank.update(ftd.read_inputs(ports=('I1',)))
+            cm = distance.update(ftd.ultrasonic)
+"""
+from array import array
+from bisect import bisect_left, insort
+
+
+class Filter:
+    """\
+    Interface of all filters.
+    """
+    __slots__ = ()
+
+    def update(self, value):
+        """\
+        Adds a value and returns the filtered value.
+
+        :param value: The raw value.
+        :rtype: float
+        """
+        raise NotImplementedError()
+
+    def reset(self):
+        """\
+        Discards the state of the filter.
+        """
+        raise NotImplementedError()
+
+    def batch(self, values):
+        """\
+        Filters a sequence of values, the state of the filter is updated as if
+        :py:func:`update` was called for each value.
+
+        :param values: A sequence or buffer of raw values.
+        :rtype: array.array
+        :return: An ``array('d')`` with the filtered values.
+        """
+        update = self.update
+        return array('d', [update(value) for value in values])
+
+
+class MovingAverage(Filter):
+    """\
+    Average of the last `window` values.
+    """
+    __slots__ = ('window', '_ring', '_idx', '_count', '_sum')
+
+    def __init__(self, window):
+        """\
+        :param int window: Number of values, must be greater than zero.
+        :raise: ValueError if the window is not greater than zero.
+        """
+        if window < 1:
+            raise ValueError('The window must be greater than zero, got {0}'.format(window))
+        self.window = window
+        self._ring = array('d', bytes(8 * window))
+        self.reset()
+
+    def reset(self):
+        self._idx = self._count = 0
+        self._sum = 0.0
+
+    def update(self, value):
+        ring, idx = self._ring, self._idx
+        if self._count < self.window:
+            self._count += 1
+        else:
+            self._sum -= ring[idx]
+        ring[idx] = value
+        self._sum += value
+        self._idx = (idx + 1) % self.window
+        return self._sum / self._count
+
+
+class Exponential(Filter):
+    """\
+    Exponential moving average ``y = y + alpha * (x - y)``.
+    """
+    __slots__ = ('alpha', '_value')
+
+    def __init__(self, alpha):
+        """\
+        :param float alpha: Smoothing factor ``0 < alpha <= 1``. Smaller values
+                smooth stronger.
+        :raise: ValueError if alpha is out of range.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError('Alpha must be in (0, 1], got {0}'.format(alpha))
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self._value = None
+
+    def update(self, value):
+        current = self._value
+        self._value = value = float(value) if current is None else current + self.alpha * (value - current)
+        return value
+
+
+class Median(Filter):
+    """\
+    Median of the last `window` values, removes spikes.
+    """
+    __slots__ = ('window', '_ring', '_sorted', '_idx')
+
+    def __init__(self, window):
+        """\
+        :param int window: Number of values, must be greater than zero.
+        :raise: ValueError if the window is not greater than zero.
+        """
+        if window < 1:
+            raise ValueError('The window must be greater than zero, got {0}'.format(window))
+        self.window = window
+        self._ring = array('d', bytes(8 * window))
+        self.reset()
+
+    def reset(self):
+        self._sorted = []
+        self._idx = 0
+
+    def update(self, value):
+        value = float(value)
+        ring, idx, ordered = self._ring, self._idx, self._sorted
+        if len(ordered) == self.window:
+            del ordered[bisect_left(ordered, ring[idx])]
+        ring[idx] = value
+        insort(ordered, value)
+        self._idx = (idx + 1) % self.window
+        n = len(ordered)
+        mid = n // 2
+        return ordered[mid] if n % 2 else (ordered[mid - 1] + ordered[mid]) / 2.0
+
+
+class Kalman(Filter):
+    """\
+    One-dimensional Kalman filter, i.e. for the distance of the ultrasonic sensor.
+
+    Negative values (the ultrasonic sensor reports ``-1`` if it did not
+    receive an echo) are treated as missing measurements: The estimate is
+    kept and the uncertainty grows.
+    """
+    __slots__ = ('process_noise', 'measurement_noise', '_estimate', '_error')
+
+    def __init__(self, process_noise=1.0, measurement_noise=4.0):
+        """\
+        :param float process_noise: Variance of the change of the true value
+                between two measurements.
+        :param float measurement_noise: Variance of the measurements.
+        """
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self._estimate = None
+        self._error = 0.0
+
+    def update(self, value):
+        estimate = self._estimate
+        if value < 0:
+            if estimate is not None:
+                self._error += self.process_noise
+            return estimate
+        if estimate is None:
+            self._estimate = float(value)
+            self._error = self.measurement_noise
+            return self._estimate
+        error = self._error + self.process_noise
+        gain = error / (error + self.measurement_noise)
+        self._estimate = estimate = estimate + gain * (value - estimate)
+        self._error = (1 - gain) * error
+        return estimate
+
+    def batch(self, values):
+        # Leading missing measurements have no estimate, they become NaN
+        update = self.update
+        nan = float('nan')
+        return array('d', [nan if res is None else res for res in (update(value) for value in values)])
+
+
+class FilterBank:
+    """\
+    Filters the values of several ports.
+    """
+    def __init__(self, filters, ports=None):
+        """\
+        :param dict filters: Maps port names to :class:`Filter` instances.
+        :param ports: The ports (in the order of the values passed to
+                :py:func:`update`). By default, the keys of `filters`. Ports
+                without filter are passed through.
+        """
+        self.filters = dict((port.upper(), flt) for port, flt in filters.items())
+        self.ports = tuple(port.upper() for port in (ports or filters))
+        self._updates = [self.filters[port].update if port in self.filters else None for port in self.ports]
+
+    def update(self, values):
+        """\
+        Filters one value per port.
+
+        :param values: Sequence of raw values (in the order of :py:attr:`ports`),
+                i.e. the result of :py:func:`ftdu.BaseFtDuino.snapshot`.
+        :rtype: list
+        """
+        return [value if update is None else update(value) for update, value in zip(self._updates, values)]
+
+    def reset(self):
+        """\
+        Discards the state of all filters.
+        """
+        for flt in self.filters.values():
+            flt.reset()
+
+    def filter_columns(self, columns):
+        """\
+        Filters columns of samples.
+
+        :param dict columns: Maps port names to columns, i.e. the result of
+                :py:func:`ftdu.recorder.Recorder.columns`. Columns without
+                filter are kept as they are.
+        :rtype: dict
+        """
+        filters = self.filters
+        return dict((port, filters[port].batch(values) if port in filters else values)
+                    for port, values in columns.items())
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Helpers to summarize latency measurements.
+"""
+
+
+def percentile(values, p):
+    """\
+    Returns the `p` percentile (nearest rank) of the sorted `values`.
+
+    :param values: Sorted sequence of numbers.
+    :param p: The percentile (``0`` .. ``100``).
+    :return: The percentile or ``0.0`` if `values` is empty.
+    """
+    if not values:
+        return 0.0
+    idx = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values))) - 1))
+    return values[idx]
+
+
+def summary(values):
+    """\
+    Returns a dict with the keys ``count``, ``mean``, ``p50``, ``p90``,
+    ``p99`` and ``max`` of the provided (unsorted) `values`.
+    """
+    values = sorted(values)
+    return {'count': len(values),
+            'mean': sum(values) / len(values) if values else 0.0,
+            'p50': percentile(values, 50),
+            'p90': percentile(values, 90),
+            'p99': percentile(values, 99),
+            'max': values[-1] if values else 0.0}
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Drives several ftDuinos from one process with one worker process per device.
+
+Each worker owns the connection to its ftDuino. The parent talks to the
+workers via shared memory rings (see :class:`ftdu.shm.Ring`), the commands
+and replies are not pickled.
+
+A worker can sample its ftDuino periodically and process each sample (i.e.
+filter it) before the sample is published. Since each worker runs in its
+own process, the processing of the samples of different devices runs in
+parallel.
+
+.. code-block:: python
+
+    from ftdu.pool import FtDuinoPool
+
+    with FtDuinoPool(sample_interval=0.01) as pool:
+        for path, ftd in pool.items():
+            ftd.led = True
+        for path, timestamp, values in pool.samples():
+            print(path, values)
+"""
+import multiprocessing
+import struct
+import time
+from . import FtDuino, BaseFtDuino, SNAPSHOT_PORTS, _ftduino_paths
+from .reply import ReplyBuffer
+from .shm import Ring
+from .transport import Transport, TIMEOUT
+
+#: Size of the command / reply rings in bytes.
+RING_SIZE = 1 << 16
+#: Size of the sample rings in bytes.
+SAMPLE_RING_SIZE = 1 << 20
+
+# Request which stops the worker, no valid payload (commands are terminated by a newline)
+_STOP = b'\0'
+
+
+class FtDuinoPool:
+    """\
+    Starts one worker process per ftDuino.
+
+    The devices are available as :class:`ftdu.FtDuino` instances which
+    forward the commands to the workers.
+    """
+    def __init__(self, paths=None, factory=BaseFtDuino, sample_interval=None, process=None,
+                 timeout=1.0, mp_context=None):
+        """\
+        :param paths: Device paths. By default, all connected ftDuinos are used.
+        :param factory: Callable which accepts a path and returns a
+                :class:`ftdu.BaseFtDuino`. It is called in the worker process
+                and must be picklable (i.e. a module level function) if the
+                processes are spawned.
+        :param sample_interval: If provided, the workers read all input ports
+                and counters (see :py:func:`ftdu.BaseFtDuino.snapshot`) every
+                `sample_interval` seconds.
+        :param process: Optional callable which is called by the workers with
+                the values of each sample and returns the values to publish,
+                i.e. filtered values. Must return as many values as
+                ``ftdu.SNAPSHOT_PORTS`` has and must be picklable if the
+                processes are spawned.
+        :param float timeout: Max. seconds to wait for a reply.
+        :param mp_context: Optional :mod:`multiprocessing` context.
+        :raise: ValueError if no ftDuino was found.
+        """
+        if paths is None:
+            paths = _ftduino_paths()
+        paths = list(paths)
+        if not paths:
+            raise ValueError('No ftDuino found.')
+        ctx = mp_context or multiprocessing.get_context()
+        self._workers = {}
+        self.devices = {}
+        try:
+            for path in paths:
+                worker = _Worker(ctx, path, factory, sample_interval, process)
+                self._workers[path] = worker
+                self.devices[path] = FtDuino(transport=_RingTransport(worker, timeout))
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getitem__(self, path):
+        """\
+        Returns the :class:`ftdu.FtDuino` of the provided path.
+        """
+        return self.devices[path]
+
+    def __len__(self):
+        return len(self.devices)
+
+    def items(self):
+        """\
+        Returns the ``(path, ftdu.FtDuino)`` tuples.
+        """
+        return self.devices.items()
+
+    def samples(self, path=None, limit=None):
+        """\
+        Returns the samples which were published since the last call.
+
+        :param path: Optional device path. By default, the samples of all
+                devices are returned.
+        :param limit: Optional max. number of samples per device.
+        :rtype: list
+        :return: A list of ``(path, timestamp, values)`` tuples.
+        """
+        res = []
+        workers = self._workers.items() if path is None else [(path, self._workers[path])]
+        for p, worker in workers:
+            res.extend((p, sample[0], sample[1:]) for sample in worker.samples(limit))
+        return res
+
+    def dropped(self, path):
+        """\
+        Returns the number of samples the worker could not publish because
+        the sample ring was full.
+        """
+        return self._workers[path].dropped.value
+
+    def close(self):
+        """\
+        Stops all workers.
+        """
+        for worker in self._workers.values():
+            worker.stop()
+        self._workers = {}
+        self.devices = {}
+
+
+class _Worker:
+    """\
+    The parent's side of a worker process.
+    """
+    def __init__(self, ctx, path, factory, sample_interval, process):
+        self.requests = Ring(RING_SIZE, semaphore=ctx.Semaphore(0))
+        self.replies = Ring(RING_SIZE, semaphore=ctx.Semaphore(0))
+        self.sample_ring = None
+        if sample_interval:
+            self.sample_ring = Ring(SAMPLE_RING_SIZE)
+        self.dropped = ctx.Value('Q', 0, lock=False)
+        self._sample = struct.Struct('<{0}d'.format(len(SNAPSHOT_PORTS) + 1))
+        self.process = ctx.Process(target=_run_worker, name='ftdu-worker {0}'.format(path),
+                                   args=(path, factory, sample_interval, process,
+                                         self.requests.name, self.requests.semaphore,
+                                         self.replies.name, self.replies.semaphore,
+                                         self.sample_ring.name if self.sample_ring is not None else None,
+                                         self.dropped))
+        self.process.daemon = True
+        self.process.start()
+
+    def samples(self, limit=None):
+        ring = self.sample_ring
+        res = []
+        if ring is None:
+            return res
+        unpack = self._sample.unpack
+        while limit is None or len(res) < limit:
+            data = ring.get()
+            if data is None:
+                break
+            res.append(unpack(data))
+        return res
+
+    def stop(self):
+        if self.process.is_alive():
+            self.requests.put_wait(_STOP, 1)
+            self.process.join(2)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        for ring in (self.requests, self.replies, self.sample_ring):
+            if ring is not None:
+                ring.close()
+
+
+class _RingTransport(Transport):
+    """\
+    Transport which forwards the commands to a worker process.
+    """
+    def __init__(self, worker, timeout=TIMEOUT):
+        self._requests = worker.requests
+        self._replies = worker.replies
+        self._process = worker.process
+        self.timeout = timeout
+        self._buf = bytearray()
+
+    def write(self, data):
+        if not self._process.is_alive():
+            raise IOError('The worker process is not running')
+        if data:
+            self._requests.put_wait(bytes(data), self.timeout)
+
+    def readline(self):
+        buf = self._buf
+        idx = buf.find(b'\n')
+        while idx < 0:
+            data = self._replies.get(self.timeout)
+            if data is None:  # Timeout
+                line = bytes(buf)
+                del buf[:]
+                return line
+            start = len(buf)
+            buf += data
+            idx = buf.find(b'\n', start)
+        line = bytes(buf[:idx + 1])
+        del buf[:idx + 1]
+        return line
+
+    def readinto(self, buf):
+        pending = self._buf
+        if not pending:
+            data = self._replies.get(self.timeout)
+            if data is None:
+                return 0
+            pending += data
+        n = min(len(buf), len(pending))
+        buf[:n] = pending[:n]
+        del pending[:n]
+        return n
+
+    def flush(self):
+        del self._buf[:]
+        while self._replies.get() is not None:
+            pass
+
+    def close(self):
+        pass  # The pool owns the worker
+
+
+def _run_worker(path, factory, sample_interval, process, requests, requests_sem,
+                replies, replies_sem, samples, dropped):
+    """\
+    Main function of a worker process.
+    """
+    requests = Ring(name=requests, semaphore=requests_sem)
+    replies = Ring(name=replies, semaphore=replies_sem)
+    sample_ring = Ring(name=samples) if samples else None
+    pack = struct.Struct('<{0}d'.format(len(SNAPSHOT_PORTS) + 1)).pack
+    ftd = factory(path)
+    transport = ftd._transport
+    rx = ReplyBuffer()
+    values = None
+    clock = time.time
+    next_sample = clock() if sample_interval else None
+    try:
+        while True:
+            timeout = None if next_sample is None else max(0.0, next_sample - clock())
+            payload = requests.get(timeout)
+            if payload is not None:
+                if payload == _STOP:
+                    break
+                count = payload.count(b'\n')
+                transport.flush()
+                transport.write(payload)
+                if count:
+                    try:
+                        rx.read(transport, count)
+                    except ValueError:  # Timeout, forward what was received
+                        pass
+                    replies.put_wait(b''.join(rx.lines()))
+            if next_sample is not None and clock() >= next_sample:
+                values = ftd.snapshot(values)
+                timestamp = clock()
+                published = process(values) if process is not None else values
+                if not sample_ring.put(pack(timestamp, *published)):
+                    dropped.value += 1
+                next_sample += sample_interval
+                if next_sample < clock():  # Too slow, don't try to catch up
+                    next_sample = clock() + sample_interval
+    finally:
+        ftd.close()
+        for ring in (requests, replies, sample_ring):
+            if ring is not None:
+                ring.close()
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Breaks the time of each exchange with a ftDuino down into stages.
+
+A :class:`Profiler` wraps the exchange methods and the transport of a
+ftDuino. A timestamp (``time.perf_counter_ns``) is taken before and after
+each exchange and by the transport, the stages are:
+
+``encode``
+    Formatting and encoding of the command(s), including waiting for the
+    exchanges of other threads.
+``write``
+    Flushing the input and writing the command(s).
+``wait``
+    Waiting for the reply line(s).
+``decode`` / ``parse``
+    Decoding the reply (``comm``, ``comm_batch``) or parsing the integers
+    (``snapshot``, ``read_inputs``, ...).
+
+The reads of the port attributes (``ftd.i1``, ``ftd.inputs['I1'].value``)
+send prepared commands and convert the reply after the exchange, they have
+the stages ``write`` and ``wait`` only.
+
+.. code-block:: python
+
+    with ftdu.FtDuino() as ftd, Profiler(ftd) as profiler:
+        ...
+    print(profiler.report())
+    profiler.chrome_trace('trace.json')  # Open with chrome://tracing or Perfetto
+
+The timings are grouped by command name, batched exchanges are grouped by the
+name of the first command and the number of commands, i.e. ``input_get[12]``.
+
+If sync commands are enabled (see :py:attr:`ftdu.BaseFtDuino.sync_interval`),
+the stage ``wait`` includes the verification of the replies and the retries.
+"""
+import json
+import os
+import threading
+from collections import deque
+from time import perf_counter_ns
+from .metrics import summary
+from .transport import Transport, _unwrap
+
+
+# Replaced methods of the ftDuino: name, stage before the write, stage after the wait, function which returns the name
+_METHODS = (
+    ('comm', 'encode', 'decode', lambda cmd: _name(cmd)),
+    ('comm_batch', 'encode', 'decode', lambda cmds: '{0}[{1}]'.format(_name(cmds[0]) if cmds else '', len(cmds))),
+    ('_request', None, None, lambda payload: _name(payload.decode('utf-8'))),
+    ('_exchange', None, None, lambda payload, count: _batch_name(payload, count)),
+    ('_read_ints', None, 'parse', lambda payload, count, out, lines=None: _batch_name(payload, count)),
+)
+
+
+class Profiler:
+    """\
+    Records the stage timings of the exchanges with a ftDuino.
+    """
+    def __init__(self, ftd=None, events=100000, history=10000):
+        """\
+        :param ftd: Optional :class:`ftdu.BaseFtDuino`, see :py:func:`attach`.
+        :param int events: Max. number of kept exchanges (for :py:func:`chrome_trace`).
+        :param int history: Max. number of kept durations per command (for
+                the percentiles of :py:func:`stats`).
+        """
+        #: The latest exchanges, tuples ``(name, start ns, thread id, ((stage, ns), ...))``.
+        self.events = deque(maxlen=events)
+        self._history = history
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._marks = _Marks()
+        self._ftd = None
+        self._transport = None
+        if ftd is not None:
+            self.attach(ftd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detach()
+
+    def attach(self, ftd):
+        """\
+        Starts profiling the provided ftDuino.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino`.
+        :raise: ValueError if the profiler is attached to a ftDuino.
+        """
+        if self._ftd is not None:
+            raise ValueError('The profiler is attached to a ftDuino')
+        self._ftd = ftd
+        self._transport = _ProfiledTransport(ftd._transport, self._marks)
+        ftd._transport = self._transport
+        for name, pre, post, name_of in _METHODS:
+            setattr(ftd, name, self._wrap(ftd, name, pre, post, name_of))
+
+    def detach(self):
+        """\
+        Stops profiling. The recorded timings are kept.
+        """
+        ftd = self._ftd
+        if ftd is None:
+            return
+        for name, _, _, _ in _METHODS:
+            ftd.__dict__.pop(name, None)
+        _unwrap(ftd, self._transport)
+        self._ftd = self._transport = None
+
+    def clear(self):
+        """\
+        Removes the recorded timings.
+        """
+        with self._lock:
+            self.events.clear()
+            self._stats.clear()
+
+    def stats(self):
+        """\
+        Returns the timings per command.
+
+        :rtype: dict
+        :return: A dict of command names to dicts with the keys ``count``,
+                ``total`` (see :py:func:`ftdu.metrics.summary`, in
+                microseconds) and ``stages`` (dict of stage names to the
+                mean duration in microseconds). A command which was sent via
+                ``comm`` and as prepared command (port attributes) has
+                ``encode`` / ``decode`` timings of the ``comm`` calls only.
+        """
+        with self._lock:
+            items = [(name, stat.count, list(stat.totals), [(stage, ns, stat.counts[stage])
+                                                             for stage, ns in stat.stages.items()])
+                     for name, stat in self._stats.items()]
+        res = {}
+        for name, count, totals, stages in items:
+            total = summary([t / 1000.0 for t in totals])
+            res[name] = {'count': count, 'total': total,
+                         'stages': dict((stage, ns / 1000.0 / n) for stage, ns, n in stages)}
+        return res
+
+    def report(self):
+        """\
+        Returns a textual report: One line per command followed by the mean
+        duration and the share of each stage. Commands are sorted by their
+        total time.
+
+        :rtype: str
+        """
+        stats = self.stats()
+        lines = []
+        for name, stat in sorted(stats.items(), key=lambda item: -item[1]['count'] * item[1]['total']['mean']):
+            total = stat['total']
+            lines.append('{0:<24} {1:>8} calls  mean {2:9.1f} us  p50 {3:9.1f} us  p99 {4:9.1f} us'
+                         .format(name, stat['count'], total['mean'], total['p50'], total['p99']))
+            stage_sum = sum(stat['stages'].values()) or 1
+            for stage, mean in stat['stages'].items():
+                lines.append('    {0:<20} {1:9.1f} us {2:6.1f} %'.format(stage, mean, mean * 100.0 / stage_sum))
+        return '\n'.join(lines)
+
+    def folded(self):
+        """\
+        Returns the total nanoseconds per command and stage in the "folded
+        stacks" format of flame graph tools (one ``command;stage ns`` line each).
+
+        :rtype: str
+        """
+        with self._lock:
+            return '\n'.join('{0};{1} {2}'.format(name, stage, ns)
+                             for name, stat in sorted(self._stats.items())
+                             for stage, ns in stat.stages.items())
+
+    def chrome_trace(self, path):
+        """\
+        Writes the kept exchanges as Chrome trace (JSON), i.e. for
+        ``chrome://tracing`` or Perfetto. Each exchange is an event with one
+        nested event per stage.
+
+        :param path: Path of the file.
+        """
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace = []
+        for name, start, tid, stages in events:
+            ts = start / 1000.0
+            trace.append({'name': name, 'cat': 'ftdu', 'ph': 'X', 'pid': pid, 'tid': tid,
+                          'ts': ts, 'dur': sum(ns for _, ns in stages) / 1000.0})
+            for stage, ns in stages:
+                dur = ns / 1000.0
+                trace.append({'name': stage, 'cat': 'stage', 'ph': 'X', 'pid': pid, 'tid': tid,
+                              'ts': ts, 'dur': dur})
+                ts += dur
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ns'}, f)
+
+    def _record(self, name, start, stages):
+        with self._lock:
+            self.events.append((name, start, threading.get_ident(), stages))
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = self._stats[name] = _Stats(self._history)
+            stat.add(stages)
+
+    def _wrap(self, ftd, name, pre, post, name_of):
+        """\
+        Returns a variant of the method `name` of the ftDuino's class which
+        records its timings. The stages ``write`` and ``wait`` are marked by
+        the transport, the time before the first flush is recorded as stage
+        `pre`, the time after the last read as stage `post` (if ``None``, the
+        time is added to the stage ``write`` / ``wait``). Nested calls (i.e.
+        ``comm`` calls ``_request``) are recorded by the outermost call.
+        """
+        method = getattr(type(ftd), name).__get__(ftd)
+        marks, record = self._marks, self._record
+
+        def profiled(*args):
+            if marks.depth:
+                return method(*args)
+            marks.depth = 1
+            marks.flush = marks.write = marks.read = None
+            t0 = perf_counter_ns()
+            try:
+                res = method(*args)
+            finally:
+                marks.depth = 0
+            t4 = perf_counter_ns()
+            t1 = marks.flush or t0
+            t2 = marks.write or t1
+            t3 = marks.read or t2
+            stages = [(pre, t1 - t0), ('write', t2 - t1)] if pre else [('write', t2 - t0)]
+            stages += [('wait', t3 - t2), (post, t4 - t3)] if post else [('wait', t4 - t2)]
+            record(name_of(*args), t0, tuple(stages))
+            return res
+        return profiled
+
+
+class _Marks(threading.local):
+    """\
+    Timestamps of the current exchange of a thread.
+    """
+    def __init__(self):
+        self.depth = 0
+        self.flush = self.write = self.read = None
+
+
+class _ProfiledTransport(Transport):
+    """\
+    Transport which marks the first flush, the first write and the last read
+    of an exchange.
+    """
+    def __init__(self, transport, marks):
+        self.transport = transport
+        self._marks = marks
+
+    def write(self, data):
+        res = self.transport.write(data)
+        marks = self._marks
+        if marks.write is None:
+            marks.write = perf_counter_ns()
+        return res
+
+    def readline(self):
+        line = self.transport.readline()
+        self._marks.read = perf_counter_ns()
+        return line
+
+    def readinto(self, buf):
+        n = self.transport.readinto(buf)
+        self._marks.read = perf_counter_ns()
+        return n
+
+    def flush(self):
+        marks = self._marks
+        if marks.flush is None:
+            marks.flush = perf_counter_ns()
+        self.transport.flush()
+
+    def close(self):
+        self.transport.close()
+
+
+class _Stats:
+    """\
+    Timings of one command.
+    """
+    __slots__ = ('count', 'totals', 'stages', 'counts')
+
+    def __init__(self, history):
+        self.count = 0
+        self.totals = deque(maxlen=history)
+        # Stage name -> total ns, in the order of the stages
+        self.stages = {}
+        # Stage name -> number of timings
+        self.counts = {}
+
+    def add(self, stages):
+        self.count += 1
+        total = 0
+        for stage, ns in stages:
+            total += ns
+            self.stages[stage] = self.stages.get(stage, 0) + ns
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+        self.totals.append(total)
+
+
+def _name(cmd):
+    """\
+    Returns the command name of the provided command (line).
+    """
+    parts = cmd.split(None, 1)
+    return parts[0].lower() if parts else ''
+
+
+def _batch_name(payload, count):
+    """\
+    Returns the name of a batched exchange.
+    """
+    end = payload.find(b' ')
+    newline = payload.find(b'\n')
+    if end < 0 or 0 <= newline < end:
+        end = newline
+    return '{0}[{1}]'.format(payload[:end].decode('utf-8').lower(), count)
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Compact, columnar recording of ftDuino port values.
+
+A :class:`Recorder` stores timestamped samples in :mod:`array` backed chunks
+(one array per column). If a path is provided, full chunks are written to a
+binary capture file and dropped from memory, so the memory footprint of a
+recording stays constant regardless of its duration.
+
+Capture files are read back by :class:`Capture` which memory-maps the file
+and provides the columns as :class:`memoryview` or NumPy arrays without
+copying the data.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.recorder import Recorder, Capture
+
+    with ftdu.FtDuino() as ftd:
+        with Recorder(ftd, ports=('I1', 'I2', 'C1'), path='run.cap') as rec:
+            rec.run(interval=0.01, duration=3600)
+
+    with Capture('run.cap') as cap:
+        for chunk in cap.chunks():
+            print(chunk.timestamps[0], chunk['I1'][0])
+"""
+import io
+import mmap
+import struct
+import sys
+import time
+from array import array
+
+
+#: Default ports which are recorded.
+DEFAULT_PORTS = ('I1', 'I2', 'I3', 'I4', 'I5', 'I6', 'I7', 'I8')
+
+#: Default number of samples per chunk.
+DEFAULT_CHUNK_SIZE = 4096
+
+_MAGIC = b'FTDUREC1'
+_FORMAT_VERSION = 2
+# magic, format version, byte order ('<' or '>'), value typecode, number of columns, chunk size
+_HEADER = struct.Struct('<8sBccHI')
+# number of rows in a chunk (+ padding to keep the timestamps 8 byte aligned).
+# The chunk is followed by the timestamps, the columns and the padding to the next multiple of 8.
+_CHUNK_HEADER = struct.Struct('<I4x')
+
+_TIMESTAMP_TYPECODE = 'd'
+_VALUE_TYPECODE = 'i'
+_BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+
+
+class Recorder:
+    """\
+    Records timestamped port values into columnar chunks.
+
+    Each port becomes a column of signed 32 bit integers, the timestamps
+    (seconds since the epoch, see :func:`time.time`) are stored as doubles.
+    """
+    def __init__(self, ftd=None, ports=DEFAULT_PORTS, chunk_size=DEFAULT_CHUNK_SIZE,
+                 path=None):
+        """\
+        Initializes the recorder.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino` to read the samples from.
+                    May be ``None`` if the samples are provided via :py:func:`append`.
+        :param ports: Iterable of port names, i.e. ``('I1', 'C1')``.
+                      Input ports (I1 .. I8), counters (C1 .. C4) and
+                      ``'ultrasonic'`` are supported.
+        :param int chunk_size: Number of samples per chunk.
+        :param path: Optional path to a capture file. If provided, full
+                     chunks are written to the file and released from memory.
+        """
+        if chunk_size < 1:
+            raise ValueError('Invalid chunk size "{0}"'.format(chunk_size))
+        self.ports = tuple(port.upper() if port.lower() != 'ultrasonic' else 'ultrasonic'
+                           for port in ports)
+        if not self.ports:
+            raise ValueError('At least one port is required')
+        if len(set(self.ports)) != len(self.ports):
+            raise ValueError('Duplicate ports in {0}'.format(ports))
+        self._readers = tuple(_port_reader(ftd, port) for port in self.ports) if ftd is not None else None
+        self.chunk_size = chunk_size
+        self._timestamps = array(_TIMESTAMP_TYPECODE)
+        self._columns = tuple(array(_VALUE_TYPECODE) for _ in self.ports)
+        self._chunks = []
+        self._spilled = 0
+        self._file = None
+        if path is not None:
+            self._file = io.open(path, 'wb')
+            self._file.write(_encode_header(self.ports, chunk_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """\
+        Returns the total number of recorded samples.
+        """
+        return self._spilled + sum(len(ts) for ts, _ in self._chunks) + len(self._timestamps)
+
+    def sample(self):
+        """\
+        Reads all ports from the ftDuino and appends the values.
+
+        :return: The values read from the ftDuino (in the order of the ports).
+        """
+        if self._readers is None:
+            raise ValueError('No ftDuino provided, use append() to add samples')
+        values = [read() for read in self._readers]
+        self.append(time.time(), values)
+        return values
+
+    def append(self, timestamp, values):
+        """\
+        Appends a sample.
+
+        :param float timestamp: The timestamp of the sample.
+        :param values: Iterable of integer values, one value per port.
+        """
+        columns = self._columns
+        if len(values) != len(columns):
+            raise ValueError('Expected {0} values, got {1}'.format(len(columns), len(values)))
+        self._timestamps.append(timestamp)
+        for column, value in zip(columns, values):
+            column.append(value)
+        if len(self._timestamps) >= self.chunk_size:
+            self._finish_chunk()
+
+    def run(self, interval=0.0, duration=None, count=None):
+        """\
+        Samples the ftDuino periodically.
+
+        The method blocks until `duration` seconds elapsed or `count` samples
+        were taken. If neither is provided, the method runs forever.
+
+        :param float interval: Seconds between two samples.
+        :param duration: Optional duration in seconds.
+        :param count: Optional number of samples.
+        """
+        clock = time.time
+        start = next_tick = clock()
+        n = 0
+        while (count is None or n < count) \
+                and (duration is None or clock() - start < duration):
+            self.sample()
+            n += 1
+            if interval:
+                next_tick += interval
+                delay = next_tick - clock()
+                if delay > 0:
+                    time.sleep(delay)
+                else:  # Too slow, don't try to catch up
+                    next_tick = clock()
+
+    def columns(self):
+        """\
+        Returns the samples which are kept in memory as dict of
+        ``{'timestamp': array, port: array, ...}``.
+
+        The arrays are copies, spilled chunks are not included.
+        """
+        timestamps = array(_TIMESTAMP_TYPECODE)
+        columns = [array(_VALUE_TYPECODE) for _ in self.ports]
+        for ts, cols in self._chunks + [(self._timestamps, self._columns)]:
+            timestamps.extend(ts)
+            for target, col in zip(columns, cols):
+                target.extend(col)
+        res = dict(zip(self.ports, columns))
+        res['timestamp'] = timestamps
+        return res
+
+    def flush(self):
+        """\
+        Writes the pending samples into the capture file.
+
+        Does nothing if the recorder does not write into a file.
+        """
+        if self._file is None:
+            return
+        if self._timestamps:
+            self._finish_chunk()
+        self._file.flush()
+
+    def close(self):
+        """\
+        Writes pending samples and closes the capture file (if any).
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def _finish_chunk(self):
+        """\
+        Writes the current chunk into the file or keeps it in memory.
+        """
+        timestamps, columns = self._timestamps, self._columns
+        if self._file is None:
+            self._chunks.append((timestamps, columns))
+            self._timestamps = array(_TIMESTAMP_TYPECODE)
+            self._columns = tuple(array(_VALUE_TYPECODE) for _ in self.ports)
+            return
+        write = self._file.write
+        write(_CHUNK_HEADER.pack(len(timestamps)))
+        write(timestamps.tobytes())
+        size = 0
+        for column in columns:
+            size += write(column.tobytes())
+        write(b'\0' * (-size % 8))
+        self._spilled += len(timestamps)
+        # Reuse the arrays to avoid reallocations
+        del timestamps[:]
+        for column in columns:
+            del column[:]
+
+
+class Chunk:
+    """\
+    A chunk of a capture file.
+
+    The timestamps and the columns are zero-copy views into the memory-mapped
+    capture file.
+    """
+    __slots__ = ('timestamps', '_columns', '_names')
+
+    def __init__(self, timestamps, names, columns):
+        self.timestamps = timestamps
+        self._names = names
+        self._columns = columns
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, port):
+        """\
+        Returns the column of the provided port.
+
+        :param port: Port name, i.e. 'I1'.
+        """
+        try:
+            return self._columns[self._names.index(port)]
+        except ValueError:
+            raise KeyError(port)
+
+
+class Capture:
+    """\
+    Read-only access to a capture file written by a :class:`Recorder`.
+    """
+    def __init__(self, path):
+        """\
+        Opens the capture file.
+
+        :param path: Path to the capture file.
+        """
+        with io.open(path, 'rb') as f:
+            # mmap of an empty file fails, the header is checked afterwards
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                if f.seek(0, io.SEEK_END) else b''
+        self._view = memoryview(self._mm)
+        try:
+            self.ports, self.chunk_size, self._typecode, self._byteorder, offset = _decode_header(self._view)
+            self._itemsize = array(self._typecode).itemsize
+        except ValueError:
+            self.close()
+            raise
+        self._offsets = []
+        size = len(self._view)
+        n = 0
+        while offset + _CHUNK_HEADER.size <= size:
+            rows, = _CHUNK_HEADER.unpack_from(self._view, offset)
+            end = offset + _CHUNK_HEADER.size + rows * (8 + len(self.ports) * self._itemsize)
+            if end > size:  # Truncated chunk, i.e. the recorder was not closed properly
+                break
+            self._offsets.append((offset, rows))
+            n += rows
+            offset = end + -end % 8
+        self._len = n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """\
+        Returns the number of samples.
+        """
+        return self._len
+
+    def chunks(self, numpy=False):
+        """\
+        Returns an iterator over all chunks.
+
+        :param bool numpy: ``True`` to provide the columns as NumPy arrays,
+                           otherwise memoryviews are used. Both are zero-copy
+                           views into the capture file.
+        :rtype: iterator over :class:`Chunk` instances.
+        """
+        if numpy:
+            import numpy as np
+            order = '<' if self._byteorder == '<' else '>'
+            ts_dtype = np.dtype(order + 'f8')
+            val_dtype = np.dtype('{0}i{1}'.format(order, self._itemsize))
+
+            def view(offset, count, dtype):
+                return np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+        else:
+            if self._byteorder != _BYTE_ORDER.decode('ascii'):
+                raise ValueError('The capture file was written on a platform with a different byte order, use numpy=True')
+            ts_dtype, val_dtype = _TIMESTAMP_TYPECODE, self._typecode
+            mv = self._view
+
+            def view(offset, count, dtype):
+                return mv[offset:offset + count * (8 if dtype == 'd' else self._itemsize)].cast(str(dtype))
+        names, itemsize = self.ports, self._itemsize
+        for offset, rows in self._offsets:
+            offset += _CHUNK_HEADER.size
+            timestamps = view(offset, rows, ts_dtype)
+            offset += rows * 8
+            columns = []
+            for _ in names:
+                columns.append(view(offset, rows, val_dtype))
+                offset += rows * itemsize
+            yield Chunk(timestamps, names, columns)
+
+    def column(self, port):
+        """\
+        Returns all values of the provided column as NumPy array.
+
+        If the capture consists of one chunk, the result is a view into the
+        file, otherwise the chunks are concatenated (copied).
+
+        :param port: Port name, i.e. 'I1' or ``'timestamp'``.
+        """
+        import numpy as np
+        if port == 'timestamp':
+            parts = [chunk.timestamps for chunk in self.chunks(numpy=True)]
+        else:
+            if port not in self.ports:
+                raise KeyError(port)
+            parts = [chunk[port] for chunk in self.chunks(numpy=True)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return np.empty(0, dtype='f8' if port == 'timestamp' else 'i{0}'.format(self._itemsize))
+        return np.concatenate(parts)
+
+    def close(self):
+        """\
+        Closes the capture file.
+
+        All views which were provided by this instance must be released before.
+        """
+        self._view.release()
+        if not isinstance(self._mm, bytes):
+            self._mm.close()
+
+
+def _port_reader(ftd, port):
+    """\
+    Returns a callable which reads the value of the provided port.
+
+    :param ftd: The :class:`ftdu.BaseFtDuino`.
+    :param port: Port name.
+    """
+    if port == 'ultrasonic':
+        return ftd.ultrasonic_get
+    kind = port[:1]
+    if kind == 'I':
+        return lambda: ftd.input_get(port)
+    elif kind == 'C':
+        return lambda: ftd.counter_get(port)
+    raise ValueError('Unsupported port "{0}", use I1 .. I8, C1 .. C4 or "ultrasonic"'.format(port))
+
+
+def _encode_header(ports, chunk_size):
+    """\
+    Returns the file header.
+    """
+    buf = [_HEADER.pack(_MAGIC, _FORMAT_VERSION, _BYTE_ORDER,
+                        _VALUE_TYPECODE.encode('ascii'), len(ports), chunk_size)]
+    for port in ports:
+        name = port.encode('utf-8')
+        buf.append(struct.pack('<B', len(name)))
+        buf.append(name)
+    header = b''.join(buf)
+    # Keep the chunks 8 byte aligned
+    return header + b'\0' * (-len(header) % 8)
+
+
+def _decode_header(buf):
+    """\
+    Returns a tuple (ports, chunk size, typecode, byte order, offset of first chunk).
+    """
+    if len(buf) < _HEADER.size:
+        raise ValueError('Not a capture file')
+    magic, version, byteorder, typecode, num_columns, chunk_size = _HEADER.unpack_from(buf, 0)
+    if magic != _MAGIC:
+        raise ValueError('Not a capture file')
+    if version != _FORMAT_VERSION:
+        raise ValueError('Unsupported capture file version "{0}"'.format(version))
+    offset = _HEADER.size
+    ports = []
+    for _ in range(num_columns):
+        length = buf[offset]
+        offset += 1
+        ports.append(bytes(buf[offset:offset + length]).decode('utf-8'))
+        offset += length
+    offset += -offset % 8
+    return tuple(ports), chunk_size, typecode.decode('ascii'), byteorder.decode('ascii'), offset
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Replay of recorded ftDuino sessions without hardware.
+
+:class:`ReplayFtDuino` provides the API of :class:`ftdu.FtDuino` and answers
+the commands from a recording. Two kinds of recordings are supported:
+
+* A trace of ``comm`` exchanges, a sequence of ``(timestamp, request, reply)``
+  tuples. The requests are expected in the recorded order.
+* Port samples, a sequence of ``(timestamp, port, value)`` tuples or a capture
+  file written by :class:`ftdu.recorder.Recorder`. Reading a port returns the
+  value which was recorded at the current replay time.
+
+The replay runs as fast as possible (``speed=None``, default), in real time
+(``speed=1``) or faster / slower than real time (i.e. ``speed=10``).
+
+.. code-block:: python
+
+    from ftdu.replay import ReplayFtDuino
+
+    with ReplayFtDuino.from_capture('run.cap', speed=60) as ftd:
+        while True:
+            control_loop(ftd)  # Raises EOFError at the end of the recording
+"""
+import bisect
+import io
+import json
+import time
+from array import array
+from . import FtDuino
+from .transport import LoopbackTransport
+
+
+#: Reply to commands which are not answered by the recording (i.e. ``output_set``)
+#: in sample mode.
+ACK = 'Ok'
+
+
+class ReplayFtDuino(FtDuino):
+    """\
+    A :class:`ftdu.FtDuino` which replays a recording.
+
+    If the recording is exhausted, an :class:`EOFError` is raised.
+    """
+    def __init__(self, trace=None, samples=None, speed=None, strict=True):
+        """\
+        Initializes the replay. Either `trace` or `samples` must be provided.
+
+        :param trace: Iterable of ``(timestamp, request, reply)`` tuples.
+                      Further items of the tuples are ignored, i.e. the
+                      duration of the records of :func:`ftdu.trace.read_trace`.
+        :param samples: Iterable of ``(timestamp, port, value)`` tuples.
+        :param speed: ``None`` to replay as fast as possible, otherwise the
+                      speed factor (``1`` = real time).
+        :param bool strict: Only used in trace mode. If ``True`` (default),
+                    a request which differs from the recorded request causes
+                    a :class:`ValueError`. Otherwise, recorded exchanges are
+                    skipped until the request matches.
+        """
+        if (trace is None) == (samples is None):
+            raise ValueError('Provide either a trace or samples')
+        if speed is not None and speed <= 0:
+            raise ValueError('Invalid speed "{0}"'.format(speed))
+        if trace is not None:
+            transport = _TraceTransport(trace, speed, strict)
+        else:
+            transport = _SampleTransport(samples, speed)
+        super(ReplayFtDuino, self).__init__(transport=transport)
+        if trace is not None and not any(entry[1] == 'ftduino_direct_get_version' for entry in transport._trace):
+            # The recording was made without feature detection
+            self._features = frozenset()
+
+    @classmethod
+    def from_trace_file(cls, path, speed=None, strict=True):
+        """\
+        Returns a replay of a trace file, see :func:`load_trace`.
+        """
+        return cls(trace=load_trace(path), speed=speed, strict=strict)
+
+    @classmethod
+    def from_binary_trace(cls, path, speed=None, strict=True):
+        """\
+        Returns a replay of a binary trace file written by :class:`ftdu.trace.TraceWriter`.
+        """
+        from .trace import read_trace
+        return cls(trace=read_trace(path), speed=speed, strict=strict)
+
+    @classmethod
+    def from_capture(cls, path, speed=None):
+        """\
+        Returns a replay of a capture file written by :class:`ftdu.recorder.Recorder`.
+        """
+        return cls(samples=samples_from_capture(path), speed=speed)
+
+
+def load_trace(path):
+    """\
+    Reads a trace file.
+
+    The trace file contains one JSON object per line with the keys
+    ``t`` (timestamp), ``request`` and ``reply`` (``null`` if no reply was received).
+
+    :param path: Path to the trace file.
+    :rtype: list of ``(timestamp, request, reply)`` tuples.
+    """
+    with io.open(path, encoding='utf-8') as f:
+        return [_trace_entry(json.loads(line)) for line in f if line.strip()]
+
+
+def dump_trace(trace, path):
+    """\
+    Writes a trace file which can be read by :func:`load_trace`.
+
+    :param trace: Iterable of ``(timestamp, request, reply)`` tuples.
+    :param path: Path to the trace file.
+    """
+    with io.open(path, 'w', encoding='utf-8') as f:
+        for t, request, reply in trace:
+            f.write(json.dumps({'t': t, 'request': request, 'reply': reply}))
+            f.write('\n')
+
+
+def samples_from_capture(path):
+    """\
+    Returns the samples of a capture file.
+
+    :param path: Path to a capture file, see :class:`ftdu.recorder.Capture`.
+    :rtype: list of ``(timestamp, port, value)`` tuples.
+    """
+    from .recorder import Capture
+    res = []
+    with Capture(path) as cap:
+        ports = cap.ports
+        for chunk in cap.chunks():
+            timestamps = chunk.timestamps.tolist()
+            for port in ports:
+                res.extend(zip(timestamps, [port] * len(timestamps), chunk[port].tolist()))
+            # Release the views, otherwise the capture cannot be closed
+            chunk.timestamps.release()
+            for port in ports:
+                chunk[port].release()
+    res.sort(key=lambda sample: sample[0])
+    return res
+
+
+def _trace_entry(obj):
+    return obj['t'], obj['request'], obj.get('reply')
+
+
+class _ReplayClock:
+    """\
+    Maps the wall clock to the time of the recording.
+    """
+    def __init__(self, start, speed):
+        self._start = start
+        self._speed = speed
+        self._wall_start = None
+
+    def wait_until(self, t):
+        """\
+        Waits until the recording time `t` is reached (no-op if speed is ``None``).
+        """
+        if self._speed is None:
+            return
+        if self._wall_start is None:
+            self._wall_start = time.time()
+        delay = self._wall_start + (t - self._start) / self._speed - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def now(self):
+        """\
+        Returns the current recording time.
+        """
+        if self._wall_start is None:
+            self._wall_start = time.time()
+        return self._start + (time.time() - self._wall_start) * self._speed
+
+
+class _TraceTransport(LoopbackTransport):
+    """\
+    Replays a trace of ``comm`` exchanges.
+    """
+    def __init__(self, trace, speed, strict):
+        super(_TraceTransport, self).__init__(self._answer)
+        self._trace = list(trace)
+        self._idx = 0
+        self._strict = strict
+        self._clock = _ReplayClock(self._trace[0][0] if self._trace else 0, speed)
+
+    def _answer(self, request):
+        trace, idx = self._trace, self._idx
+        if idx >= len(trace):
+            raise EOFError('End of trace reached')
+        if trace[idx][1] != request:
+            if self._strict:
+                raise ValueError('Unexpected request "{0}" at #{1}, expected "{2}"'
+                                 .format(request, idx, trace[idx][1]))
+            while idx < len(trace) and trace[idx][1] != request:
+                idx += 1
+            if idx == len(trace):
+                raise EOFError('Request "{0}" not found in the remaining trace'.format(request))
+        t, reply = trace[idx][0], trace[idx][2]
+        self._idx = idx + 1
+        self._clock.wait_until(t)
+        return reply
+
+
+# Commands which read a port, the port name is the first argument
+_PORT_COMMANDS = ('input_get', 'counter_get')
+
+
+class _SampleTransport(LoopbackTransport):
+    """\
+    Answers port reads from recorded port values.
+    """
+    def __init__(self, samples, speed):
+        super(_SampleTransport, self).__init__(self._answer)
+        ports = {}
+        for t, port, value in samples:
+            port = port.upper() if port.lower() != 'ultrasonic' else 'ultrasonic'
+            try:
+                times, values = ports[port]
+            except KeyError:
+                times, values = ports[port] = array('d'), array('i')
+            times.append(t)
+            values.append(value)
+        self._ports = ports
+        self._speed = speed
+        start = min(times[0] for times, _ in ports.values()) if ports else 0
+        self._end = max(times[-1] for times, _ in ports.values()) if ports else 0
+        self._clock = _ReplayClock(start, speed or 1)
+        self._cursors = dict.fromkeys(ports, 0)
+
+    def _answer(self, request):
+        parts = request.split()
+        if not parts:
+            return None
+        cmd = parts[0]
+        if cmd == 'ultrasonic_get':
+            port = 'ultrasonic'
+        elif cmd in _PORT_COMMANDS and len(parts) > 1:
+            port = parts[1].upper()
+        else:
+            return ACK
+        try:
+            times, values = self._ports[port]
+        except KeyError:
+            raise ValueError('Port "{0}" was not recorded'.format(port))
+        if self._speed is None:
+            idx = self._cursors[port]
+            if idx >= len(values):
+                raise EOFError('End of recording reached for port "{0}"'.format(port))
+            self._cursors[port] = idx + 1
+        else:
+            now = self._clock.now()
+            if now > self._end:
+                raise EOFError('End of recording reached')
+            idx = max(bisect.bisect_right(times, now) - 1, 0)
+        return str(values[idx])
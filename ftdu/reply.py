@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Parsing of ftDuino replies.
+
+The ftDuino answers each command with a line. Integer replies are parsed
+from the received bytes (:func:`int` accepts bytes and ignores the line
+terminator), there is no need to decode them.
+
+A :class:`ReplyBuffer` reads the replies of several commands into one
+reusable buffer and parses all of them at once.
+"""
+
+
+class ReplyBuffer:
+    """\
+    Reusable receive buffer for the replies of batched commands.
+    """
+    __slots__ = ('_buf', '_view', '_size')
+
+    def __init__(self, capacity=512):
+        """\
+        :param int capacity: Initial size of the buffer in bytes. The buffer
+                grows if necessary.
+        """
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._size = 0
+
+    def __len__(self):
+        """\
+        Returns the number of bytes received by the last :py:func:`read`.
+        """
+        return self._size
+
+    def read(self, transport, count):
+        """\
+        Reads `count` reply lines from the transport.
+
+        :param transport: The :class:`ftdu.transport.Transport`.
+        :param int count: The number of expected lines.
+        :raise: ValueError if the transport timed out before all lines were received.
+        """
+        buf, view = self._buf, self._view
+        size = lines = 0
+        readinto = transport.readinto
+        while lines < count:
+            if len(buf) - size < 64:
+                view.release()
+                buf.extend(bytes(len(buf)))
+                view = self._view = memoryview(buf)
+            n = readinto(view[size:])
+            if not n:
+                self._size = size
+                raise ValueError('Timeout: Expected {0} replies, got {1}'.format(count, lines))
+            lines += buf.count(b'\n', size, size + n)
+            size += n
+        self._size = size
+
+    def ints(self, out, count):
+        """\
+        Parses `count` integer replies into `out`.
+
+        :param out: A mutable sequence with at least `count` items.
+        :param int count: The number of expected replies.
+        :return: `out`
+        :raise: ValueError if a reply is not an integer or if the number of
+                replies does not match.
+        """
+        values = self._view[:self._size].tobytes().split()
+        if len(values) != count:
+            raise ValueError('Expected {0} replies, got {1}'.format(count, len(values)))
+        for i, value in enumerate(values):
+            out[i] = int(value)
+        return out
+
+    def line_count(self):
+        """\
+        Returns the number of complete lines in the buffer.
+        """
+        return self._buf.count(b'\n', 0, self._size)
+
+    def pop_line(self):
+        """\
+        Removes the last line from the buffer.
+
+        :rtype: bytes
+        :return: The line without line terminator.
+        """
+        end = self._size
+        start = self._buf.rfind(b'\n', 0, max(0, end - 1)) + 1
+        self._size = start
+        return bytes(self._buf[start:end]).rstrip(b'\r\n')
+
+    def lines(self):
+        """\
+        Returns the received lines (bytes, including the line terminators).
+        """
+        return self._view[:self._size].tobytes().splitlines(True)
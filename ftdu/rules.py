@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Declarative input -> output rules.
+
+A :class:`RuleSet` describes what should happen if a condition becomes true,
+i.e. "when I1 rises, switch O1 off and O2 on for 10 seconds". An
+:class:`Engine` evaluates the rule sets of one or more ftDuinos in one loop:
+Each cycle reads the inputs of a ftDuino with one batched exchange, evaluates
+the rules which depend on changed inputs and writes the changed outputs with
+one batched write.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.rules import Engine, RuleSet, rising
+
+    traffic_light = RuleSet('traffic light', initial={'O1': True})
+    traffic_light.when(rising('I1'), {'O1': False, 'O2': True}, duration=10)
+
+    with ftdu.FtDuino() as ftd:
+        engine = Engine()
+        engine.add(ftd, traffic_light)
+        engine.run()
+
+Rules fire if their condition *becomes* true. The inputs read by the first
+cycle are the initial state, they don't fire any rule.
+
+Output values are the values accepted by the output attributes of
+:class:`ftdu.FtDuino` (``True``, ``False``, ``ftdu.LOW``, ``(mode, pwm)``)
+for O1 .. O8, a motor mode or ``(mode, pwm)`` for M1 .. M4 and a boolean
+for ``'LED'``.
+"""
+import heapq
+import itertools
+import threading
+import time
+from array import array
+from . import MOTOR_OFF, _VALUE_TYPECODE, _get_commands, _set_command
+
+
+class Condition:
+    """\
+    A predicate over the values of input ports / counters.
+
+    Conditions can be combined with ``&``, ``|`` and ``~``.
+    """
+    __slots__ = ('ports', '_func', 'description')
+
+    def __init__(self, ports, func, description=None):
+        """\
+        :param ports: The ports the condition depends on, i.e. ``('I1',)``.
+        :param func: Callable which accepts a dict of port names to values
+                and returns a boolean.
+        :param description: Optional description.
+        """
+        self.ports = tuple(port.upper() for port in ports)
+        self._func = func
+        self.description = description
+
+    def __call__(self, values):
+        return self._func(values)
+
+    def __and__(self, other):
+        a, b = self._func, other._func
+        return Condition(self.ports + other.ports, lambda v: a(v) and b(v),
+                         '({0} and {1})'.format(self.description, other.description))
+
+    def __or__(self, other):
+        a, b = self._func, other._func
+        return Condition(self.ports + other.ports, lambda v: a(v) or b(v),
+                         '({0} or {1})'.format(self.description, other.description))
+
+    def __invert__(self):
+        a = self._func
+        return Condition(self.ports, lambda v: not a(v), 'not {0}'.format(self.description))
+
+    def __repr__(self):
+        return '<Condition {0}>'.format(self.description)
+
+
+def rising(port):
+    """\
+    Condition which becomes true if the value of `port` changes from zero
+    to non-zero, i.e. a switch was closed.
+    """
+    port = port.upper()
+    return Condition((port,), lambda v: v[port] != 0, '{0} rising'.format(port))
+
+
+def falling(port):
+    """\
+    Condition which becomes true if the value of `port` changes to zero.
+    """
+    port = port.upper()
+    return Condition((port,), lambda v: v[port] == 0, '{0} falling'.format(port))
+
+
+def above(port, threshold):
+    """\
+    Condition which becomes true if the value of `port` exceeds `threshold`.
+    """
+    port = port.upper()
+    return Condition((port,), lambda v: v[port] > threshold, '{0} > {1}'.format(port, threshold))
+
+
+def below(port, threshold):
+    """\
+    Condition which becomes true if the value of `port` falls below `threshold`.
+    """
+    port = port.upper()
+    return Condition((port,), lambda v: v[port] < threshold, '{0} < {1}'.format(port, threshold))
+
+
+class Rule:
+    """\
+    A rule of a :class:`RuleSet`, see :py:func:`RuleSet.when`.
+    """
+    __slots__ = ('condition', 'outputs', 'duration', 'then', 'state', 'goto', 'then_goto',
+                 'retrigger', 'call', '_last', '_until', '_restore')
+
+    def __init__(self, condition, outputs, duration, then, state, goto, then_goto, retrigger, call):
+        self.condition = condition
+        self.outputs = dict((port.upper(), value) for port, value in (outputs or {}).items())
+        self.duration = duration
+        self.then = None if then is None else dict((port.upper(), value) for port, value in then.items())
+        self.state = state
+        self.goto = goto
+        self.then_goto = then_goto
+        self.retrigger = retrigger
+        self.call = call
+        self._last = False
+        # End of the current activation (or None) and the output values which are restored then
+        self._until = None
+        self._restore = None
+
+
+class RuleSet:
+    """\
+    A set of rules with an optional state (state machine).
+    """
+    def __init__(self, name=None, initial=None, state=None):
+        """\
+        :param name: Optional name.
+        :param dict initial: Optional output values which are written by the
+                first cycle.
+        :param state: Optional initial state, see :py:func:`when`.
+        """
+        self.name = name
+        self.initial = dict((port.upper(), value) for port, value in (initial or {}).items())
+        #: The current state.
+        self.state = state
+        self.rules = []
+        self._board = None
+
+    def when(self, condition, outputs=None, duration=None, then=None, state=None, goto=None,
+             then_goto=None, retrigger=False, call=None):
+        """\
+        Adds a rule.
+
+        :param Condition condition: The condition, i.e. ``rising('I1')``.
+        :param dict outputs: Output values which are set if the condition
+                becomes true, i.e. ``{'O1': False, 'O2': True}``.
+        :param duration: Optional seconds after which the outputs are set to
+                `then`.
+        :param dict then: Output values which are set after `duration`. By
+                default, the outputs of the rule get the values they had
+                before the rule fired.
+        :param state: If provided, the rule fires only in this state. The
+                condition is evaluated in any state, i.e. a condition which
+                became true in another state does not fire if the state is
+                entered.
+        :param goto: Optional state which is entered if the rule fires.
+        :param then_goto: Optional state which is entered after `duration`.
+        :param bool retrigger: Indicates if the rule may fire again before
+                `duration` elapsed (default: ``False``). A retriggered rule
+                keeps the outputs for `duration` after the last firing, the
+                outputs are restored to the values of the first firing.
+        :param call: Optional callable which is called with the rule set if
+                the rule fires.
+        :return: This rule set (to chain calls).
+        """
+        self.rules.append(Rule(condition, outputs, duration, then, state, goto, then_goto, retrigger, call))
+        return self
+
+
+class Engine:
+    """\
+    Evaluates rule sets of one or more ftDuinos.
+    """
+    def __init__(self, interval=0.01):
+        """\
+        :param float interval: Seconds between two cycles, see :py:func:`run`.
+        """
+        self.interval = interval
+        #: Number of cycles.
+        self.ticks = 0
+        #: Number of written commands.
+        self.writes = 0
+        self._boards = []
+        self._timers = []
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, ftd, *rulesets):
+        """\
+        Adds rule sets of the provided ftDuino.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino`.
+        :param rulesets: The :class:`RuleSet` instances.
+        :raise: ValueError if a rule set was already added or if a rule
+                depends on an unsupported port.
+        """
+        board = None
+        for b in self._boards:
+            if b.ftd is ftd:
+                board = b
+        if board is None:
+            board = _Board(ftd)
+            self._boards.append(board)
+        for ruleset in rulesets:
+            if ruleset._board is not None:
+                raise ValueError('The rule set "{0}" was already added'.format(ruleset.name))
+            board.add(ruleset)
+            ruleset._board = board
+
+    def tick(self, now=None):
+        """\
+        Runs one cycle: Reads the inputs, evaluates the rules, runs the
+        expired timers and writes the changed outputs.
+
+        :param now: Optional current time.
+        """
+        now = time.time() if now is None else now
+        for board in self._boards:
+            board.read()
+            for ruleset, rule in board.changed_rules():
+                self._evaluate(board, ruleset, rule, now)
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            until, _, board, ruleset, rule, outputs = heapq.heappop(timers)
+            if until != rule._until:
+                continue  # Rule was retriggered, a later timer restores the outputs
+            rule._until = rule._restore = None
+            board.pending.update(outputs)
+            if rule.then_goto is not None:
+                ruleset.state = rule.then_goto
+        for board in self._boards:
+            self.writes += board.write()
+        self.ticks += 1
+
+    def run(self, duration=None):
+        """\
+        Runs a cycle every :py:attr:`interval` seconds.
+
+        :param duration: Optional duration in seconds. If not provided, the
+                method runs until :py:func:`stop` is called.
+        """
+        clock = time.time
+        start = next_tick = clock()
+        self._stop.clear()
+        while not self._stop.is_set() and (duration is None or clock() - start < duration):
+            self.tick()
+            next_tick += self.interval
+            delay = next_tick - clock()
+            if delay < 0:  # Too slow, don't try to catch up
+                next_tick = clock()
+                delay = 0
+            self._stop.wait(delay)
+
+    def start(self):
+        """\
+        Runs the cycles in a background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='ftdu-rules')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """\
+        Stops :py:func:`run` / the background thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _evaluate(self, board, ruleset, rule, now):
+        truth = bool(rule.condition(board.values))
+        fire = truth and not rule._last
+        rule._last = truth
+        if not fire or (rule.state is not None and rule.state != ruleset.state) \
+                or (rule._until is not None and not rule.retrigger):
+            return
+        if rule.duration is not None:
+            if rule._until is None:
+                then = rule.then
+                if then is None:
+                    then = dict((port, board.current(port)) for port in rule.outputs)
+                rule._restore = then
+            rule._until = now + rule.duration
+            heapq.heappush(self._timers, (rule._until, next(self._seq), board, ruleset, rule, rule._restore))
+        board.pending.update(rule.outputs)
+        if rule.goto is not None:
+            ruleset.state = rule.goto
+        if rule.call is not None:
+            rule.call(ruleset)
+
+
+class _Board:
+    """\
+    The rule sets of one ftDuino.
+    """
+    def __init__(self, ftd):
+        self.ftd = ftd
+        self.rulesets = []
+        self.ports = ()
+        self.values = {}
+        #: Output values written to the ftDuino (shadow state).
+        self.shadow = {}
+        #: Output values to write.
+        self.pending = {}
+        self._index = {}
+        self._changed = ()
+        self._first = True
+        self._out = None
+
+    def add(self, ruleset):
+        ports = set(self.ports)
+        for port, value in ruleset.initial.items():
+            _set_command(port, value)  # Validate
+        for rule in ruleset.rules:
+            ports.update(rule.condition.ports)
+            for port, value in list(rule.outputs.items()) + list((rule.then or {}).items()):
+                _set_command(port, value)
+        ports = tuple(sorted(ports))
+        _get_commands(ports)  # Validate
+        self.rulesets.append(ruleset)
+        self.pending.update(ruleset.initial)
+        for rule in ruleset.rules:
+            for port in rule.condition.ports:
+                rules = self._index.setdefault(port, [])
+                if (ruleset, rule) not in rules:
+                    rules.append((ruleset, rule))
+        self.ports = ports
+        self._out = array(_VALUE_TYPECODE, [0]) * len(self.ports)
+        self._first = True
+
+    def read(self):
+        ports = self.ports
+        if not ports:
+            self._changed = ()
+            return
+        out = self.ftd._read_values(ports, self._out)
+        values = self.values
+        changed = []
+        for port, value in zip(ports, out):
+            if values.get(port) != value:
+                values[port] = value
+                changed.append(port)
+        self._changed = changed
+
+    def changed_rules(self):
+        """\
+        Returns the rules which depend on changed ports.
+        """
+        if self._first:
+            # Initial state, no rule fires
+            self._first = False
+            for rules in self._index.values():
+                for ruleset, rule in rules:
+                    rule._last = bool(rule.condition(self.values))
+            return []
+        seen = set()
+        res = []
+        index = self._index
+        for port in self._changed:
+            for item in index.get(port, ()):
+                if id(item[1]) not in seen:
+                    seen.add(id(item[1]))
+                    res.append(item)
+        return res
+
+    def current(self, port):
+        """\
+        Returns the value the output will have after this cycle.
+        """
+        try:
+            return self.pending[port]
+        except KeyError:
+            return self.shadow.get(port, MOTOR_OFF if port[:1] == 'M' else False)
+
+    def write(self):
+        pending, shadow = self.pending, self.shadow
+        cmds = [_set_command(port, value) for port, value in pending.items() if shadow.get(port, _UNSET) != value]
+        if cmds:
+            self.ftd.comm_batch(cmds)
+        shadow.update(pending)
+        pending.clear()
+        return len(cmds)
+
+
+_UNSET = object()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Prioritized execution of commands.
+
+A :class:`Scheduler` owns a ftDuino and executes the commands of many
+threads. The commands are queued in two lanes: :py:data:`CONTROL` for
+commands which change the state of the ftDuino (``motor_set``,
+``output_set``, ...) and :py:data:`BULK` for reads (``input_get``, ...).
+Queued control commands are always sent before queued reads. Since the
+reads are sent in batches of max. `max_batch` commands, a control command
+waits max. for the batch which is currently exchanged.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.scheduler import Scheduler
+
+    with Scheduler(ftdu.BaseFtDuino()) as scheduler:
+        logger = scheduler.device()  # Use one device per thread
+        ...
+        controller = scheduler.device()
+        controller.motor_set('M1', ftdu.MOTOR_BRAKE)  # Overtakes queued reads
+        print(scheduler.stats()['control']['p99'])
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+from . import FtDuino
+from .metrics import summary
+from .transport import Transport
+
+
+#: Lane of commands which change the state of the ftDuino.
+CONTROL = 'control'
+#: Lane of reads.
+BULK = 'bulk'
+
+#: Commands which are queued in the CONTROL lane by default.
+CONTROL_COMMANDS = frozenset(['output_set', 'motor_set', 'motor_counter', 'motor_counter_set_brake',
+                              'led_set', 'ultrasonic_enable', 'input_set_mode', 'counter_set_mode',
+                              'counter_clear', 'ftduino_id_set'])
+
+
+def lane_of(cmd):
+    """\
+    Returns the lane of the provided command.
+
+    :param cmd: The command (str or bytes).
+    :return: :py:data:`CONTROL` or :py:data:`BULK`
+    """
+    if isinstance(cmd, bytes):
+        cmd = cmd.decode('utf-8')
+    name = cmd.split(None, 1)[0].lower() if cmd.strip() else ''
+    return CONTROL if name in CONTROL_COMMANDS else BULK
+
+
+class Scheduler:
+    """\
+    Executes the commands of many threads with priorities.
+    """
+    def __init__(self, ftd, max_batch=8, history=10000):
+        """\
+        Starts the I/O thread.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino`. It must not be used by
+                other threads while the scheduler is running.
+        :param int max_batch: Max. number of commands per exchange.
+        :param int history: Number of latencies kept per lane for :py:func:`stats`.
+        """
+        if max_batch < 1:
+            raise ValueError('max_batch must be greater than zero, got {0}'.format(max_batch))
+        self.ftd = ftd
+        self.max_batch = max_batch
+        self._lanes = {CONTROL: deque(), BULK: deque()}
+        self._latencies = {CONTROL: deque(maxlen=history), BULK: deque(maxlen=history)}
+        self._counts = {CONTROL: 0, BULK: 0}
+        self._batches = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='ftdu-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, cmd, lane=None):
+        """\
+        Queues a command.
+
+        :param str cmd: The command.
+        :param lane: :py:data:`CONTROL` or :py:data:`BULK`. By default, the
+                lane is determined by :py:func:`lane_of`.
+        :rtype: concurrent.futures.Future
+        :return: A future of the result, see :py:func:`ftdu.BaseFtDuino.comm`.
+        """
+        fut = Future()
+        raw = self._submit((cmd + '\n').encode('utf-8'), lane or lane_of(cmd))
+        raw.add_done_callback(lambda f: _copy_result(f, fut))
+        return fut
+
+    def comm(self, cmd, lane=None, timeout=None):
+        """\
+        Executes a command and returns the result.
+
+        See :py:func:`submit` for the parameters.
+        """
+        return self.submit(cmd, lane).result(timeout)
+
+    def device(self):
+        """\
+        Returns a :class:`ftdu.FtDuino` which executes its commands via
+        this scheduler. Each thread should use its own device.
+
+        Commands of different lanes may be reordered, i.e. an ``output_set``
+        can overtake a previously written ``input_get``.
+        """
+        return FtDuino(transport=_SchedulerTransport(self))
+
+    def stats(self):
+        """\
+        Returns the number of commands and the latencies (seconds between
+        queueing and receiving the reply) per lane.
+
+        :rtype: dict
+        :return: ``{'control': {...}, 'bulk': {...}, 'batches': int}``, see
+                :py:func:`ftdu.metrics.summary`.
+        """
+        with self._cond:
+            res = dict((lane, summary(latencies)) for lane, latencies in self._latencies.items())
+            for lane, count in self._counts.items():
+                res[lane]['count'] = count
+            res['batches'] = self._batches
+        return res
+
+    def close(self):
+        """\
+        Executes the queued commands and stops the I/O thread.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _submit(self, payload, lane):
+        """\
+        Queues the command (bytes, incl. line terminator) and returns a future
+        of the reply line (bytes).
+        """
+        fut = Future()
+        with self._cond:
+            if self._closed:
+                raise ValueError('The scheduler is closed')
+            self._lanes[lane].append((payload, fut, time.perf_counter()))
+            self._cond.notify()
+        return fut
+
+    def _next_batch(self):
+        """\
+        Returns the lane and the commands of the next exchange, ``None`` if
+        the scheduler was closed.
+        """
+        with self._cond:
+            control, bulk = self._lanes[CONTROL], self._lanes[BULK]
+            while not control and not bulk:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            queue, lane = (control, CONTROL) if control else (bulk, BULK)
+            return lane, [queue.popleft() for _ in range(min(len(queue), self.max_batch))]
+
+    def _run(self):
+        exchange = self.ftd._exchange
+        clock = time.perf_counter
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            lane, cmds = batch
+            try:
+                replies = exchange(b''.join(payload for payload, _, _ in cmds), len(cmds))
+            except Exception as ex:
+                for _, fut, _ in cmds:
+                    fut.set_exception(ex)
+                continue
+            now = clock()
+            for (_, fut, queued), reply in zip(cmds, replies):
+                fut.set_result(reply)
+            with self._cond:
+                self._latencies[lane].extend(now - queued for _, _, queued in cmds)
+                self._counts[lane] += len(cmds)
+                self._batches += 1
+
+
+def _copy_result(source, target):
+    ex = source.exception()
+    if ex is not None:
+        target.set_exception(ex)
+    else:
+        target.set_result(source.result().decode('utf-8').rstrip('\r\n') or None)
+
+
+class _SchedulerTransport(Transport):
+    """\
+    Transport which queues each written command in the scheduler.
+    """
+    def __init__(self, scheduler, timeout=5.0):
+        super(_SchedulerTransport, self).__init__()
+        self._scheduler = scheduler
+        self.timeout = timeout
+        self._partial = b''
+        self._pending = deque()
+
+    def write(self, data):
+        lines = (self._partial + bytes(data)).split(b'\n')
+        self._partial = lines.pop()
+        submit = self._scheduler._submit
+        for line in lines:
+            self._pending.append(submit(line + b'\n', lane_of(line)))
+
+    def readline(self):
+        if not self._pending:
+            return b''
+        try:
+            return self._pending.popleft().result(self.timeout)
+        except TimeoutError:
+            return b''
+
+    def flush(self):
+        self._partial = b''
+        self._pending.clear()
+        super(_SchedulerTransport, self).flush()
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Publishes the port values of one ftDuino to many processes.
+
+Only one process can open a ftDuino. This process runs a
+:class:`SharedFtDuinoOwner` which samples the ftDuino and writes the samples
+into a named shared memory block. Other processes attach to the block with a
+:class:`SharedFtDuinoView` and read the values from memory, without any
+system call or round trip to the owner.
+
+.. code-block:: python
+
+    # Owner process
+    with ftdu.FtDuino() as ftd, SharedFtDuinoOwner(ftd, 'ftduino1', interval=0.01):
+        ...
+
+    # Reader processes
+    with SharedFtDuinoView('ftduino1') as view:
+        timestamp, values = view.latest()
+        i1 = view.value('I1')
+
+The samples are kept in a ring (the history). A sequence counter (seqlock)
+keeps the readers consistent: The owner makes the counter odd before it
+writes a sample and even afterwards. A reader retries if the counter was odd
+or changed while it copied the data.
+
+Requires Python 3.8 or later.
+"""
+import struct
+import threading
+import time
+from array import array
+from multiprocessing import shared_memory
+from . import SNAPSHOT_PORTS, _VALUE_TYPECODE, _get_commands
+from .shm import attach
+
+
+_MAGIC = b'FTDUSHM1'
+# magic, number of ports, history size, length of the port names
+_HEADER = struct.Struct('<8sIII')
+_COUNTER = struct.Struct('<Q')
+_SEQ_OFFSET = 64
+_COUNT_OFFSET = 72
+_NAMES_OFFSET = 128
+_MAX_NAMES = 128
+_DATA_OFFSET = _NAMES_OFFSET + _MAX_NAMES
+
+
+def _slot_struct(count):
+    return struct.Struct('<d{0}i'.format(count))
+
+
+class SharedFtDuinoOwner:
+    """\
+    Samples a ftDuino and publishes the samples into shared memory.
+    """
+    def __init__(self, ftd, name, ports=SNAPSHOT_PORTS, history=1024, interval=None):
+        """\
+        Creates the shared memory block.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino` or ``None`` if the samples
+                are provided via :py:func:`publish`.
+        :param str name: Name of the shared memory block.
+        :param ports: The published ports (I1 .. I8, C1 .. C4).
+        :param int history: Number of kept samples.
+        :param interval: If provided, a background thread samples the
+                ftDuino every `interval` seconds, see :py:func:`start`.
+        :raise: ValueError in case of an unsupported port or an invalid history size.
+        """
+        ports = tuple(port.upper() for port in ports)
+        _get_commands(ports)  # Validate
+        names = ','.join(ports).encode('ascii')
+        if not ports or len(names) > _MAX_NAMES:
+            raise ValueError('Provide 1 .. 12 ports, got {0}'.format(ports))
+        if history < 1:
+            raise ValueError('The history size must be greater than zero, got {0}'.format(history))
+        self.ftd = ftd
+        self.ports = ports
+        self.history_size = history
+        self.interval = interval
+        self._slot = _slot_struct(len(ports))
+        self._shm = shared_memory.SharedMemory(name, create=True,
+                                               size=_DATA_OFFSET + history * self._slot.size)
+        buf = self._buf = self._shm.buf
+        buf[:_DATA_OFFSET] = bytes(_DATA_OFFSET)
+        _HEADER.pack_into(buf, 0, _MAGIC, len(ports), history, len(names))
+        buf[_NAMES_OFFSET:_NAMES_OFFSET + len(names)] = names
+        self._seq = 0
+        self._count = 0
+        self._out = array(_VALUE_TYPECODE, [0]) * len(ports)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if self.interval:
+            self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def name(self):
+        """\
+        Name of the shared memory block.
+        """
+        return self._shm.name
+
+    def sample(self):
+        """\
+        Reads the ports with one batched exchange (see
+        :py:attr:`ftdu.BaseFtDuino.features`) and publishes the values.
+        """
+        values = self.ftd._read_values(self.ports, self._out)
+        self.publish(values)
+
+    def publish(self, values, timestamp=None):
+        """\
+        Publishes the provided values.
+
+        :param values: One value per port (in the order of :py:attr:`ports`).
+        :param timestamp: Optional timestamp, by default the current time.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        buf = self._buf
+        seq = self._seq
+        _COUNTER.pack_into(buf, _SEQ_OFFSET, seq + 1)
+        self._slot.pack_into(buf, _DATA_OFFSET + (self._count % self.history_size) * self._slot.size,
+                             timestamp, *values)
+        self._count += 1
+        _COUNTER.pack_into(buf, _COUNT_OFFSET, self._count)
+        self._seq = seq + 2
+        _COUNTER.pack_into(buf, _SEQ_OFFSET, seq + 2)
+
+    def start(self):
+        """\
+        Starts a background thread which calls :py:func:`sample` every
+        :py:attr:`interval` seconds.
+        """
+        if self._thread is not None:
+            return
+        if not self.interval:
+            raise ValueError('No sample interval provided')
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ftdu-shared-owner')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """\
+        Stops the background thread.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self):
+        """\
+        Stops sampling and removes the shared memory block.
+        """
+        self.stop()
+        if self._buf is not None:
+            self._buf = None
+            self._shm.close()
+            self._shm.unlink()
+
+    def _run(self):
+        interval = self.interval
+        clock = time.time
+        next_tick = clock()
+        while not self._stop.is_set():
+            self.sample()
+            next_tick += interval
+            delay = next_tick - clock()
+            if delay < 0:  # Too slow, don't try to catch up
+                next_tick = clock()
+                delay = 0
+            self._stop.wait(delay)
+
+
+class SharedFtDuinoView:
+    """\
+    Read-only view of the samples published by a :class:`SharedFtDuinoOwner`.
+    """
+    def __init__(self, name):
+        """\
+        Attaches to the shared memory block.
+
+        :param str name: Name of the shared memory block.
+        :raise: ValueError if the block was not created by a :class:`SharedFtDuinoOwner`.
+        """
+        self._shm = attach(name)
+        buf = self._buf = self._shm.buf
+        magic, count, history, names_len = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError('"{0}" is not a shared ftDuino'.format(name))
+        #: The ports (in the order of the values).
+        self.ports = tuple(bytes(buf[_NAMES_OFFSET:_NAMES_OFFSET + names_len]).decode('ascii').split(','))
+        self.history_size = history
+        self._slot = _slot_struct(count)
+        self._index = dict((port, i) for i, port in enumerate(self.ports))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def count(self):
+        """\
+        Returns the number of published samples.
+        """
+        return _COUNTER.unpack_from(self._buf, _COUNT_OFFSET)[0]
+
+    def latest(self):
+        """\
+        Returns the latest sample.
+
+        :return: A tuple ``(timestamp, values)`` or ``None`` if no sample was published.
+        """
+        res = self.history(1)
+        return res[0] if res else None
+
+    def value(self, port):
+        """\
+        Returns the latest value of the provided port.
+
+        :param port: Port name, i.e. 'I1'. The port name is case-insensitive.
+        :return: The value or ``None`` if no sample was published.
+        :raise: KeyError if the port is not published.
+        """
+        idx = self._index[port.upper()]
+        sample = self.latest()
+        return sample[1][idx] if sample else None
+
+    def history(self, n=None):
+        """\
+        Returns the latest samples (oldest first).
+
+        :param n: Optional max. number of samples. By default, all kept samples.
+        :rtype: list
+        :return: A list of ``(timestamp, values)`` tuples.
+        """
+        buf, slot, size = self._buf, self._slot, self.history_size
+        slot_size = slot.size
+        while True:
+            seq = _COUNTER.unpack_from(buf, _SEQ_OFFSET)[0]
+            if seq & 1:  # The owner is writing
+                time.sleep(0)
+                continue
+            count = _COUNTER.unpack_from(buf, _COUNT_OFFSET)[0]
+            k = min(count, size) if n is None else max(0, min(n, count, size))
+            start = (count - k) % size
+            if start + k <= size:
+                data = bytes(buf[_DATA_OFFSET + start * slot_size:_DATA_OFFSET + (start + k) * slot_size])
+            else:
+                data = bytes(buf[_DATA_OFFSET + start * slot_size:_DATA_OFFSET + size * slot_size]) \
+                       + bytes(buf[_DATA_OFFSET:_DATA_OFFSET + (start + k - size) * slot_size])
+            if _COUNTER.unpack_from(buf, _SEQ_OFFSET)[0] == seq:
+                break
+        return [(sample[0], sample[1:]) for sample in slot.iter_unpack(data)]
+
+    def wait(self, count, timeout=None, poll=0.001):
+        """\
+        Waits until more than `count` samples were published.
+
+        :param int count: The number of samples seen so far, see :py:attr:`count`.
+        :param timeout: Optional timeout in seconds.
+        :param float poll: Seconds between two checks.
+        :rtype: bool
+        :return: ``False`` if the timeout elapsed.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while self.count <= count:
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(poll)
+        return True
+
+    def close(self):
+        """\
+        Detaches from the shared memory block.
+        """
+        if self._buf is not None:
+            self._buf = None
+            self._shm.close()
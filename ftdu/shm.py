@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Shared memory helpers to exchange data between processes.
+
+:class:`Ring` is a single producer / single consumer queue of byte records
+in a :class:`multiprocessing.shared_memory.SharedMemory` block. The records
+are copied into the shared memory, nothing is pickled.
+
+Requires Python 3.8 or later.
+"""
+import struct
+import time
+from multiprocessing import shared_memory
+
+
+_COUNTER = struct.Struct('<Q')
+_LENGTH = struct.Struct('<I')
+# Producer and consumer counters live in different cache lines
+_HEAD_OFFSET = 0
+_TAIL_OFFSET = 64
+_DATA_OFFSET = 128
+
+
+def attach(name):
+    """\
+    Attaches to an existing shared memory block.
+
+    In contrast to ``SharedMemory(name)``, the block is not registered with
+    the resource tracker of this process which would remove the block when
+    this process exits.
+
+    :param str name: Name of the shared memory block.
+    :rtype: multiprocessing.shared_memory.SharedMemory
+    """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13
+        pass
+    from multiprocessing import resource_tracker
+    # A running tracker was inherited from the creator of the block (or is
+    # used by this process anyway), unregistering would affect the creator.
+    tracker = getattr(resource_tracker, '_resource_tracker', None)
+    private = tracker is not None and getattr(tracker, '_fd', 0) is None
+    shm = shared_memory.SharedMemory(name)
+    if private:
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class Ring:
+    """\
+    Single producer / single consumer queue of byte records in shared memory.
+
+    The producer only writes the head counter, the consumer only writes the
+    tail counter. An optional semaphore (i.e. ``multiprocessing.Semaphore(0)``)
+    is released for each record to let the consumer wait without polling.
+    """
+    def __init__(self, capacity=65536, name=None, semaphore=None):
+        """\
+        Creates a new ring or attaches to an existing one.
+
+        :param int capacity: Size of the data area in bytes (only used if a
+                new ring is created).
+        :param name: Name of an existing ring, see :py:attr:`name`.
+        :param semaphore: Optional semaphore which counts the records.
+        """
+        if name is None:
+            if capacity < 16:
+                raise ValueError('The capacity must be at least 16, got {0}'.format(capacity))
+            self._shm = shared_memory.SharedMemory(create=True, size=_DATA_OFFSET + capacity)
+            self._shm.buf[:_DATA_OFFSET] = bytes(_DATA_OFFSET)
+            self._owner = True
+        else:
+            self._shm = attach(name)
+            self._owner = False
+        self._buf = self._shm.buf
+        self.capacity = len(self._buf) - _DATA_OFFSET
+        self.semaphore = semaphore
+
+    @property
+    def name(self):
+        """\
+        Name of the shared memory block, used to attach to the ring.
+        """
+        return self._shm.name
+
+    def __len__(self):
+        """\
+        Returns the number of bytes (including the record headers) in the ring.
+        """
+        return self._head() - self._tail()
+
+    def put(self, data):
+        """\
+        Appends a record.
+
+        :param bytes data: The record.
+        :rtype: bool
+        :return: ``False`` if the ring is full.
+        """
+        size = _LENGTH.size + len(data)
+        if size > self.capacity:
+            raise ValueError('Record too large: {0} bytes, capacity {1}'.format(len(data), self.capacity))
+        head = self._head()
+        if size > self.capacity - (head - self._tail()):
+            return False
+        self._copy_in(head, _LENGTH.pack(len(data)))
+        self._copy_in(head + _LENGTH.size, data)
+        _COUNTER.pack_into(self._buf, _HEAD_OFFSET, head + size)
+        if self.semaphore is not None:
+            self.semaphore.release()
+        return True
+
+    def put_wait(self, data, timeout=None):
+        """\
+        Appends a record, waits until the ring has enough space.
+
+        :param bytes data: The record.
+        :param timeout: Optional timeout in seconds.
+        :raise: IOError if the timeout elapsed.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.put(data):
+            if deadline is not None and time.time() > deadline:
+                raise IOError('Timeout: Ring is full')
+            time.sleep(0.0001)
+
+    def get(self, timeout=0):
+        """\
+        Removes and returns the oldest record.
+
+        :param timeout: Seconds to wait for a record, ``None`` waits forever.
+                Waiting requires a semaphore.
+        :return: The record (bytes) or ``None`` if no record is available.
+        """
+        sem = self.semaphore
+        if sem is not None:
+            if not sem.acquire(timeout != 0, timeout if timeout else None):
+                return None
+        tail = self._tail()
+        if self._head() == tail:
+            return None
+        size = _LENGTH.unpack(self._copy_out(tail, _LENGTH.size))[0]
+        data = self._copy_out(tail + _LENGTH.size, size)
+        _COUNTER.pack_into(self._buf, _TAIL_OFFSET, tail + _LENGTH.size + size)
+        return data
+
+    def close(self):
+        """\
+        Detaches from the ring. The creator of the ring removes it.
+        """
+        if self._buf is None:
+            return
+        self._buf = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def _head(self):
+        return _COUNTER.unpack_from(self._buf, _HEAD_OFFSET)[0]
+
+    def _tail(self):
+        return _COUNTER.unpack_from(self._buf, _TAIL_OFFSET)[0]
+
+    def _copy_in(self, pos, data):
+        buf, capacity = self._buf, self.capacity
+        idx = pos % capacity
+        first = min(len(data), capacity - idx)
+        buf[_DATA_OFFSET + idx:_DATA_OFFSET + idx + first] = data[:first]
+        if first < len(data):
+            buf[_DATA_OFFSET:_DATA_OFFSET + len(data) - first] = data[first:]
+
+    def _copy_out(self, pos, size):
+        buf, capacity = self._buf, self.capacity
+        idx = pos % capacity
+        first = min(size, capacity - idx)
+        data = bytes(buf[_DATA_OFFSET + idx:_DATA_OFFSET + idx + first])
+        if first < size:
+            data += bytes(buf[_DATA_OFFSET:_DATA_OFFSET + size - first])
+        return data
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Load generation and soak tests against emulated ftDuinos.
+
+A :class:`Soak` drives a number of emulated ftDuinos (one thread per
+ftDuino) with a random mix of operations for a given duration. The
+connections are :class:`FaultyTransport` instances which delay the replies
+and inject latency spikes and lost replies.
+
+.. code-block:: python
+
+    from ftdu.soak import Soak
+
+    soak = Soak(boards=20, mix={'read': 6, 'snapshot': 2, 'write': 3, 'move': 1},
+                drop_rate=0.001, spike_rate=0.01, spike=0.2)
+    report = soak.run(duration=3600, interval=10, callback=print)
+    print(report.format())
+
+The report contains one :class:`Window` per `interval` (throughput, timeout
+rate, resident memory and the number of Python objects) and the latency
+distribution per operation. A growing memory usage or a throughput which
+drops over time indicates a leak or a scaling problem.
+
+Operations:
+
+``read``
+    Reads an input port (one command).
+``snapshot``
+    Reads all inputs and counters (batched exchange or ``multi_get``).
+``write``
+    Sets all outputs (batched exchange).
+``move``
+    Starts an encoder motor and asks if the motor is still running.
+
+The same operations are available as subcommand ``ftdu soak``.
+"""
+import gc
+import math
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+from . import BaseFtDuino, INPUT_PORTS, OUTPUT_PORTS, MOTOR_PORTS, MOTOR_LEFT, MOTOR_RIGHT, MAX, HIGH
+from .emulator import Emulator
+from .transport import Transport, TIMEOUT
+
+
+#: Default mix of operations (operation name to weight).
+DEFAULT_MIX = {'read': 6, 'snapshot': 2, 'write': 3, 'move': 1}
+
+#: Measurements of one interval, see :py:attr:`Report.windows`. ``ops`` is
+#: the number of operations per second, ``timeout_rate`` the share of
+#: operations which timed out, ``rss`` the resident memory in bytes (or
+#: ``None`` if unknown) and ``objects`` the number of objects tracked by the
+#: garbage collector.
+Window = namedtuple('Window', 'elapsed ops timeout_rate error_rate rss objects')
+
+
+class FaultyTransport(Transport):
+    """\
+    In-memory transport to an emulated ftDuino which delays the replies and
+    injects faults.
+
+    A reply is available `latency` seconds after the request was written
+    (plus `spike` seconds for a share of `spike_rate` of the writes). If a
+    reply is not available within `timeout` seconds, the read times out and
+    the reply arrives later, i.e. after the next request. A share of
+    `drop_rate` of the replies is lost.
+    """
+    def __init__(self, handler, latency=0.0, spike_rate=0.0, spike=0.05, drop_rate=0.0, timeout=TIMEOUT,
+                 seed=None):
+        """\
+        :param handler: Callable which answers requests,
+                        i.e. :py:func:`ftdu.emulator.Emulator.handle`.
+        :param float latency: Round trip time in seconds.
+        :param float spike_rate: Share of the writes (``0`` .. ``1``) which are
+                answered after an additional delay.
+        :param float spike: The additional delay in seconds.
+        :param float drop_rate: Share of the replies (``0`` .. ``1``) which are lost.
+        :param float timeout: Read timeout in seconds.
+        :param seed: Optional seed of the random faults.
+        """
+        self._handler = handler
+        self.latency = latency
+        self.spike_rate = spike_rate
+        self.spike = spike
+        self.drop_rate = drop_rate
+        self.timeout = timeout
+        self._random = random.Random(seed).random
+        self._pending = b''
+        # Tuples (time of arrival, reply)
+        self._replies = deque()
+        #: Number of injected latency spikes.
+        self.spikes = 0
+        #: Number of lost replies.
+        self.dropped = 0
+        #: Number of reads which timed out.
+        self.timeouts = 0
+
+    def write(self, data):
+        lines = (self._pending + bytes(data)).split(b'\n')
+        self._pending = lines.pop()
+        if not lines:
+            return len(data)
+        rnd = self._random
+        arrival = time.perf_counter() + self.latency
+        if self.spike_rate and rnd() < self.spike_rate:
+            self.spikes += 1
+            arrival += self.spike
+        handler, append = self._handler, self._replies.append
+        for line in lines:
+            reply = handler(line.decode('utf-8').rstrip('\r'))
+            if reply is None:
+                continue
+            if self.drop_rate and rnd() < self.drop_rate:
+                self.dropped += 1
+                continue
+            append((arrival, (reply + '\r\n').encode('utf-8')))
+        return len(data)
+
+    def readline(self):
+        if not self._wait():
+            return b''
+        return self._replies.popleft()[1]
+
+    def readinto(self, buf):
+        if not self._wait():
+            return 0
+        replies, now = self._replies, time.perf_counter()
+        n, size = 0, len(buf)
+        while replies and replies[0][0] <= now and n < size:
+            arrival, reply = replies[0]
+            k = min(len(reply), size - n)
+            buf[n:n + k] = reply[:k]
+            n += k
+            if k < len(reply):
+                replies[0] = arrival, reply[k:]
+            else:
+                replies.popleft()
+        return n
+
+    def flush(self):
+        # Replies which did not arrive yet are kept
+        self._pending = b''
+        replies, now = self._replies, time.perf_counter()
+        while replies and replies[0][0] <= now:
+            replies.popleft()
+
+    def close(self):
+        self._replies.clear()
+
+    def _wait(self):
+        """\
+        Waits max. `timeout` seconds for the next reply.
+
+        :return: ``True`` if a reply is available, ``False`` if the read timed out.
+        """
+        replies = self._replies
+        delay = replies[0][0] - time.perf_counter() if replies else None
+        if delay is None or delay > self.timeout:
+            time.sleep(self.timeout)
+            self.timeouts += 1
+            return False
+        if delay > 0:
+            time.sleep(delay)
+        return True
+
+
+class Soak:
+    """\
+    Runs a random mix of operations against emulated ftDuinos.
+    """
+    def __init__(self, boards=20, mix=None, latency=0.0002, spike_rate=0.0, spike=0.05, drop_rate=0.0,
+                 timeout=0.02, sync_interval=None, features=(), seed=None):
+        """\
+        :param int boards: Number of emulated ftDuinos.
+        :param dict mix: Maps operation names (see module docs) to weights,
+                default: :py:data:`DEFAULT_MIX`.
+        :param latency: Round trip time in seconds, see :class:`FaultyTransport`.
+        :param spike_rate: Share of exchanges with a latency spike.
+        :param spike: Duration of a latency spike in seconds.
+        :param drop_rate: Share of lost replies.
+        :param timeout: Read timeout in seconds.
+        :param sync_interval: Optional :py:attr:`ftdu.BaseFtDuino.sync_interval`.
+        :param features: Features of the emulated sketch, i.e. ``(ftdu.FEATURE_MULTI_GET,)``.
+        :param seed: Optional seed of the operations and the faults.
+        """
+        mix = DEFAULT_MIX if mix is None else mix
+        unknown = set(mix) - set(_OPERATIONS)
+        if unknown:
+            raise ValueError('Unknown operation(s): {0}'.format(', '.join(sorted(unknown))))
+        if boards < 1 or not any(weight > 0 for weight in mix.values()):
+            raise ValueError('Expected at least one board and one operation with a positive weight')
+        self.mix = dict(mix)
+        self._seed = random.randrange(1 << 32) if seed is None else seed
+        self._boards = []
+        for i in range(boards):
+            transport = FaultyTransport(Emulator(name='soak{0}'.format(i + 1), features=features).handle,
+                                        latency=latency, timeout=timeout, seed=self._seed + i)
+            ftd = BaseFtDuino(transport=transport)
+            ftd.ftduino_direct_get_version()
+            if sync_interval is not None:
+                ftd.sync_interval = sync_interval
+            # Faults are injected after the setup
+            transport.spike_rate, transport.spike, transport.drop_rate = spike_rate, spike, drop_rate
+            self._boards.append(_Board(ftd, transport, self._seed + boards + i))
+
+    def run(self, duration, interval=1.0, callback=None):
+        """\
+        Runs the operations for `duration` seconds.
+
+        :param float duration: Duration in seconds.
+        :param float interval: Seconds per :class:`Window`.
+        :param callback: Optional callable which receives each :class:`Window`
+                as soon as the interval is over.
+        :rtype: Report
+        """
+        if interval <= 0:
+            raise ValueError('The interval must be greater than zero, got {0}'.format(interval))
+        stop = threading.Event()
+        ops = [(name, weight) for name, weight in sorted(self.mix.items()) if weight > 0]
+        threads = [threading.Thread(target=board.run, args=(ops, stop), name='ftdu-soak')
+                   for board in self._boards]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        windows = []
+        prev, prev_time = (0, 0, 0), start
+        end = start + duration
+        try:
+            while True:
+                now = time.perf_counter()
+                if now >= end:
+                    break
+                time.sleep(min(interval - (now - start) % interval, end - now))
+                now = time.perf_counter()
+                totals = self._totals()
+                count, timeouts, errors = [total - p for total, p in zip(totals, prev)]
+                window = Window(now - start, count / (now - prev_time), timeouts / count if count else 0.0,
+                                errors / count if count else 0.0, _rss(), len(gc.get_objects()))
+                prev, prev_time = totals, now
+                windows.append(window)
+                if callback is not None:
+                    callback(window)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        return Report(len(self._boards), elapsed, windows, self._op_stats(),
+                      dict((name, sum(getattr(board.transport, name) for board in self._boards))
+                           for name in ('spikes', 'dropped', 'timeouts')),
+                      sum(board.ftd.resyncs for board in self._boards),
+                      [item for board in self._boards for item in board.exceptions])
+
+    def _totals(self):
+        """\
+        Returns the number of operations, timeouts and errors of all boards.
+        """
+        ops = timeouts = errors = 0
+        for board in self._boards:
+            for stat in list(board.stats.values()):
+                ops += stat.count
+                timeouts += stat.timeouts
+                errors += stat.errors
+        return ops, timeouts, errors
+
+    def _op_stats(self):
+        res = {}
+        for board in self._boards:
+            for name, stat in board.stats.items():
+                total = res.get(name)
+                if total is None:
+                    total = res[name] = _OpStats()
+                total.merge(stat)
+        return dict((name, stat.summary()) for name, stat in res.items())
+
+
+class Report:
+    """\
+    Result of :py:func:`Soak.run`.
+    """
+    def __init__(self, boards, duration, windows, operations, faults, resyncs, exceptions):
+        #: Number of ftDuinos.
+        self.boards = boards
+        #: Duration in seconds.
+        self.duration = duration
+        #: List of :class:`Window` instances.
+        self.windows = windows
+        #: Maps the operation names to dicts with the keys ``count``,
+        #: ``timeouts``, ``errors`` and the latency percentiles ``p50``,
+        #: ``p90``, ``p99``, ``p999`` and ``max`` in seconds.
+        self.operations = operations
+        #: Injected faults: dict with the keys ``spikes``, ``dropped`` and ``timeouts``.
+        self.faults = faults
+        #: Number of detected reply misalignments, see :py:attr:`ftdu.BaseFtDuino.resyncs`.
+        self.resyncs = resyncs
+        #: The latest unexpected exceptions (other than :class:`ValueError`
+        #: and :class:`IOError`), tuples ``(operation name, exception)``.
+        self.exceptions = exceptions
+
+    @property
+    def count(self):
+        """\
+        Returns the number of operations.
+        """
+        return sum(op['count'] for op in self.operations.values())
+
+    @property
+    def rss_growth(self):
+        """\
+        Returns the difference of the resident memory (bytes) between the
+        second and the last window (the first window includes the warm up)
+        or ``None`` if unknown.
+        """
+        rss = [window.rss for window in self.windows[1:] if window.rss is not None]
+        return rss[-1] - rss[0] if rss else None
+
+    @property
+    def objects_growth(self):
+        """\
+        Returns the difference of the number of objects between the second
+        and the last window (or ``0`` if there are less than two windows).
+        """
+        windows = self.windows[1:]
+        return windows[-1].objects - windows[0].objects if windows else 0
+
+    def format(self, windows=True):
+        """\
+        Returns a textual report.
+
+        :param bool windows: Indicates if a line per :class:`Window` should be included.
+        :rtype: str
+        """
+        lines = ['{0} boards, {1:.1f} s, {2} operations, {3:.0f} ops/s'
+                 .format(self.boards, self.duration, self.count, self.count / self.duration if self.duration else 0),
+                 'faults: {0} spikes, {1} lost replies, {2} read timeouts, {3} resyncs'
+                 .format(self.faults['spikes'], self.faults['dropped'], self.faults['timeouts'], self.resyncs)]
+        growth = self.rss_growth
+        lines.append('memory growth: {0}, objects growth: {1}'
+                     .format('{0:+.1f} MiB'.format(growth / 1048576.0) if growth is not None else 'unknown',
+                             self.objects_growth))
+        lines.extend('unexpected exception in {0}: {1!r}'.format(name, ex) for name, ex in self.exceptions)
+        if windows:
+            lines.append('')
+            lines.extend(format_window(window) for window in self.windows)
+        lines.append('')
+        lines.append('{0:<10} {1:>9} {2:>9} {3:>8} {4:>9} {5:>9} {6:>9} {7:>9} {8:>9}'
+                     .format('operation', 'count', 'timeouts', 'errors', 'p50 us', 'p90 us', 'p99 us', 'p99.9 us',
+                             'max us'))
+        for name, op in sorted(self.operations.items()):
+            lines.append('{0:<10} {1:>9} {2:>9} {3:>8} {4:9.0f} {5:9.0f} {6:9.0f} {7:9.0f} {8:9.0f}'
+                         .format(name, op['count'], op['timeouts'], op['errors'], op['p50'] * 1e6, op['p90'] * 1e6,
+                                 op['p99'] * 1e6, op['p999'] * 1e6, op['max'] * 1e6))
+        return '\n'.join(lines)
+
+
+def format_window(window):
+    """\
+    Returns a line which describes the provided :class:`Window`.
+
+    :rtype: str
+    """
+    return '{0:8.1f} s {1:9.0f} ops/s  timeouts {2:6.2f} %  errors {3:6.2f} %  rss {4}  objects {5}'.format(
+        window.elapsed, window.ops, window.timeout_rate * 100, window.error_rate * 100,
+        '{0:.1f} MiB'.format(window.rss / 1048576.0) if window.rss is not None else '?', window.objects)
+
+
+class _Board:
+    """\
+    A ftDuino driven by one thread.
+    """
+    def __init__(self, ftd, transport, seed):
+        self.ftd = ftd
+        self.transport = transport
+        self.seed = seed
+        # Operation name -> _OpStats
+        self.stats = {}
+        self.values = None
+        # The latest unexpected exceptions, tuples (operation name, exception)
+        self.exceptions = deque(maxlen=10)
+
+    def run(self, ops, stop):
+        rnd = random.Random(self.seed)
+        names = [name for name, _ in ops]
+        cum_weights = []
+        total = 0
+        for _, weight in ops:
+            total += weight
+            cum_weights.append(total)
+        stats = dict((name, self.stats.setdefault(name, _OpStats())) for name in names)
+        funcs = dict((name, _OPERATIONS[name]) for name in names)
+        transport, clock, choices = self.transport, time.perf_counter, rnd.choices
+        while not stop.is_set():
+            name = choices(names, cum_weights=cum_weights)[0]
+            timeouts = transport.timeouts
+            failed = False
+            start = clock()
+            try:
+                funcs[name](self, rnd)
+            except (ValueError, IOError):
+                failed = True
+            except Exception as ex:  # Unexpected, keep running but report it
+                failed = True
+                self.exceptions.append((name, ex))
+            stats[name].add(clock() - start, transport.timeouts != timeouts, failed)
+
+
+class _OpStats:
+    """\
+    Counters and a latency histogram with logarithmic buckets (constant
+    memory, independent of the duration).
+    """
+    __slots__ = ('count', 'timeouts', 'errors', 'max', 'buckets')
+
+    # Buckets per power of two
+    _RESOLUTION = 16
+    # 1 us .. 2 ** 26 us (67 s)
+    _BUCKETS = 26 * _RESOLUTION + 1
+
+    def __init__(self):
+        self.count = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.max = 0.0
+        self.buckets = [0] * self._BUCKETS
+
+    def add(self, duration, timeout, error):
+        self.count += 1
+        if timeout:
+            self.timeouts += 1
+        elif error:
+            self.errors += 1
+        if duration > self.max:
+            self.max = duration
+        us = duration * 1e6
+        idx = int(math.log(us, 2) * self._RESOLUTION) + 1 if us >= 1 else 0
+        self.buckets[min(idx, self._BUCKETS - 1)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.timeouts += other.timeouts
+        self.errors += other.errors
+        self.max = max(self.max, other.max)
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+
+    def percentile(self, p):
+        """\
+        Returns the upper bound of the bucket (seconds) which contains the
+        `p` percentile.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(math.ceil(p / 100.0 * self.count)))
+        seen = 0
+        for idx, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.max, 2 ** (idx / float(self._RESOLUTION)) / 1e6)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'timeouts': self.timeouts, 'errors': self.errors,
+                'p50': self.percentile(50), 'p90': self.percentile(90), 'p99': self.percentile(99),
+                'p999': self.percentile(99.9), 'max': self.max}
+
+
+def _read(board, rnd):
+    board.ftd.input_get(rnd.choice(INPUT_PORTS))
+
+
+def _snapshot(board, rnd):
+    board.values = board.ftd.snapshot(board.values)
+
+
+def _write(board, rnd):
+    board.ftd.write_outputs([HIGH] * len(OUTPUT_PORTS), [rnd.randint(0, MAX) for _ in OUTPUT_PORTS])
+
+
+def _move(board, rnd):
+    port = rnd.choice(MOTOR_PORTS)
+    board.ftd.motor_counter(port, rnd.choice((MOTOR_LEFT, MOTOR_RIGHT)), MAX, rnd.randint(1, 1000))
+    board.ftd.motor_counter_active(port)
+
+
+_OPERATIONS = {'read': _read, 'snapshot': _snapshot, 'write': _write, 'move': _move}
+
+
+def _rss():
+    """\
+    Returns the resident memory of this process in bytes or ``None`` if unknown.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak instead of current value, kB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if os.uname()[0] == 'Darwin' else rss * 1024
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Continuous sampling of the ultrasonic sensor.
+
+An :class:`UltrasonicStream` enables the sensor once and reads it in a
+background thread at a fixed rate. Other ports are read with the same
+batched exchange. Readings which did not change are skipped.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.streaming import UltrasonicStream
+
+    with ftdu.FtDuino() as ftd, UltrasonicStream(ftd, rate=20, ports=('I1',)) as stream:
+        while True:
+            timestamp, distance, (i1,) = stream.wait()
+            print(distance, i1)
+
+The ftDuino serializes the exchanges of the stream and of other threads, so
+the ftDuino can be used while the stream is running.
+"""
+import threading
+import time
+from array import array
+from collections import deque
+from . import _VALUE_TYPECODE, _get_commands
+
+
+class UltrasonicStream:
+    """\
+    Samples the ultrasonic sensor (and optionally other ports) in a
+    background thread.
+
+    Each sample is a tuple ``(timestamp, distance, values)`` where `values`
+    is a tuple of the values of :py:attr:`ports`.
+    """
+    def __init__(self, ftd, rate=20.0, ports=(), history=256, skip_duplicates=True):
+        """\
+        :param ftd: The :class:`ftdu.BaseFtDuino`.
+        :param float rate: Target number of samples per second.
+        :param ports: Other ports which are read with the sensor (I1 .. I8, C1 .. C4).
+        :param int history: Max. number of kept samples.
+        :param bool skip_duplicates: Indicates if a reading which is equal to
+                the previous one should be skipped.
+        :raise: ValueError in case of an unsupported port or if the rate is
+                not greater than zero.
+        """
+        if rate <= 0:
+            raise ValueError('The rate must be greater than zero, got {0}'.format(rate))
+        ports = tuple(port.upper() for port in ports)
+        cmds = ['ultrasonic_get'] + _get_commands(ports)
+        self.ftd = ftd
+        self.rate = rate
+        self.ports = ports
+        self.skip_duplicates = skip_duplicates
+        #: Number of exchanges with the ftDuino.
+        self.reads = 0
+        #: Number of skipped (unchanged) readings.
+        self.duplicates = 0
+        #: Number of ticks which took longer than the interval.
+        self.overruns = 0
+        self._payload = ''.join(cmd + '\n' for cmd in cmds).encode('utf-8')
+        self._count = len(cmds)
+        self._history = deque(maxlen=history)
+        self._cond = threading.Condition()
+        self._seq = 0
+        # Sequence number of the sample returned by wait()
+        self._returned_seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """\
+        Enables the ultrasonic sensor and starts the background thread.
+        """
+        if self._thread is not None:
+            return
+        self.ftd.ultrasonic_enable(True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ftdu-ultrasonic')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, disable=True):
+        """\
+        Stops the background thread.
+
+        :param bool disable: Indicates if the ultrasonic sensor should be disabled.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if disable:
+            self.ftd.ultrasonic_enable(False)
+
+    @property
+    def latest(self):
+        """\
+        Returns the latest sample or ``None`` if no sample is available.
+        """
+        with self._cond:
+            return self._history[-1] if self._history else None
+
+    def history(self, n=None):
+        """\
+        Returns the kept samples (oldest first).
+
+        :param n: Optional max. number of samples (the latest ones).
+        :rtype: list
+        """
+        with self._cond:
+            samples = list(self._history)
+        return samples if n is None else samples[-n:] if n > 0 else []
+
+    def wait(self, timeout=None):
+        """\
+        Waits for a sample which was not returned by a previous call.
+
+        :param timeout: Optional timeout in seconds.
+        :return: The sample or ``None`` if the timeout elapsed.
+        :raise: The exception which stopped the background thread.
+        """
+        with self._cond:
+            seq = self._returned_seq
+            if not self._cond.wait_for(lambda: self._seq != seq or self._error is not None, timeout):
+                return None
+            if self._error is not None:
+                raise self._error
+            self._returned_seq = self._seq
+            return self._history[-1]
+
+    def _run(self):
+        interval = 1.0 / self.rate
+        clock = time.time
+        ftd, payload, count = self.ftd, self._payload, self._count
+        out = array(_VALUE_TYPECODE, [0]) * count
+        previous = None
+        next_tick = clock()
+        try:
+            while not self._stop.is_set():
+                ftd._read_ints(payload, count, out)
+                timestamp = clock()
+                self.reads += 1
+                reading = tuple(out)
+                if self.skip_duplicates and reading == previous:
+                    self.duplicates += 1
+                else:
+                    previous = reading
+                    with self._cond:
+                        self._history.append((timestamp, reading[0], reading[1:]))
+                        self._seq += 1
+                        self._cond.notify_all()
+                next_tick += interval
+                delay = next_tick - clock()
+                if delay < 0:  # Too slow, don't try to catch up
+                    self.overruns += 1
+                    next_tick = clock()
+                    delay = 0
+                self._stop.wait(delay)
+        except Exception as ex:
+            with self._cond:
+                self._error = ex
+                self._cond.notify_all()
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Delayed and recurring actions without sleeping threads.
+
+A :class:`TimerWheel` keeps any number of timers and runs the expired ones
+from one thread. The wheel is hierarchical: The first level has one slot per
+tick (`resolution` seconds), each higher level covers a 64 times longer
+period. Scheduling and cancelling a timer is O(1), timers of higher levels
+are moved to the lower levels when their period begins.
+
+Usually, the timers are created by :py:func:`ftdu.BaseFtDuino.after` and
+:py:func:`ftdu.BaseFtDuino.every` which use the :py:func:`default_wheel`:
+
+.. code-block:: python
+
+    with ftdu.FtDuino() as ftd:
+        ftd.o1 = False
+        ftd.o2 = True
+        ftd.after(10, {'O1': True, 'O2': False})  # Does not block
+        blink = ftd.every(0.5, lambda: ...)
+        ...
+        blink.cancel()
+
+An action is either a callable or a dict of output values (see
+:py:func:`ftdu.BaseFtDuino.after`). The output values of all timers which
+expire within the same tick are merged and written with one batched write per
+ftDuino, after the callables of these timers were called.
+"""
+import math
+import threading
+import time
+from collections import deque
+from . import _set_command
+
+
+# Number of bits of the slot index per level, the first level has 256 slots,
+# the other levels 64 slots. The wheel covers 2 ** 26 ticks (7.7 days with
+# the default resolution), later timers are moved down the levels repeatedly.
+_BITS = (8, 6, 6, 6)
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_wheel():
+    """\
+    Returns the timer wheel which is used by :py:func:`ftdu.BaseFtDuino.after`
+    and :py:func:`ftdu.BaseFtDuino.every`. The wheel is created and started on
+    demand.
+
+    :rtype: TimerWheel
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = TimerWheel()
+            _default.start()
+        return _default
+
+
+class Timer:
+    """\
+    A scheduled action, see :py:func:`TimerWheel.schedule`.
+    """
+    __slots__ = ('_wheel', 'action', 'ftd', 'interval', '_cmds', '_period', '_expires', '_done', 'cancelled')
+
+    def __init__(self, wheel, action, ftd, interval, cmds, period):
+        self._wheel = wheel
+        #: The callable or the dict of output values.
+        self.action = action
+        self.ftd = ftd
+        #: The interval in seconds of a recurring timer, otherwise ``None``.
+        self.interval = interval
+        self._cmds = cmds
+        self._period = period
+        self._expires = 0
+        # Indicates if a one-shot timer was run
+        self._done = False
+        self.cancelled = False
+
+    def cancel(self):
+        """\
+        Cancels the timer. A cancelled timer does not run anymore. Cancelling
+        a timer which already ran has no effect.
+        """
+        self._wheel._cancel(self)
+
+    def __repr__(self):
+        return '<Timer action={0!r} interval={1}>'.format(self.action, self.interval)
+
+
+class TimerWheel:
+    """\
+    Hierarchical timer wheel.
+    """
+    def __init__(self, resolution=0.01, clock=time.monotonic):
+        """\
+        :param float resolution: Seconds per tick. Timers expire at the end
+                of a tick, they never run early.
+        :param clock: Callable which returns the current time in seconds.
+        """
+        if resolution <= 0:
+            raise ValueError('The resolution must be greater than zero, got {0}'.format(resolution))
+        self.resolution = resolution
+        self._clock = clock
+        self._start = clock()
+        self._levels = [[[] for _ in range(1 << bits)] for bits in _BITS]
+        # The last processed tick
+        self._tick = 0
+        self._count = 0
+        # Number of timers in the first level (incl. cancelled timers)
+        self._first_count = 0
+        #: Number of timer runs.
+        self.fired = 0
+        #: Number of batched writes.
+        self.writes = 0
+        #: The latest exceptions raised by actions, tuples ``(timer, exception)``.
+        self.errors = deque(maxlen=100)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def __len__(self):
+        """\
+        Returns the number of pending timers.
+        """
+        return self._count
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def schedule(self, delay, action, interval=None, ftd=None):
+        """\
+        Schedules an action.
+
+        :param float delay: Seconds until the first run.
+        :param action: A callable without arguments or a dict of output port
+                names to values (requires `ftd`).
+        :param interval: Optional interval in seconds of a recurring timer.
+        :param ftd: The :class:`ftdu.BaseFtDuino` which receives the output
+                values.
+        :rtype: Timer
+        :raise: ValueError in case of an invalid delay, interval or action.
+        """
+        if delay < 0:
+            raise ValueError('The delay must not be negative, got {0}'.format(delay))
+        if interval is not None and interval <= 0:
+            raise ValueError('The interval must be greater than zero, got {0}'.format(interval))
+        cmds = None
+        if isinstance(action, dict):
+            if ftd is None:
+                raise ValueError('Output values require a ftDuino')
+            cmds = [(port.upper(), _set_command(port.upper(), value)) for port, value in action.items()]
+        elif not callable(action):
+            raise ValueError('Expected a callable or a dict of output values, got {0!r}'.format(action))
+        period = None if interval is None else max(1, int(round(interval / self.resolution)))
+        timer = Timer(self, action, ftd, interval, cmds, period)
+        with self._cond:
+            now = self._clock() - self._start
+            if not self._count:
+                # Nothing pending, skip the idle ticks
+                self._tick = max(self._tick, int(now / self.resolution))
+            self._add(timer, max(self._tick + 1, int(math.ceil((now + delay) / self.resolution))))
+            self._count += 1
+            self._cond.notify()
+        return timer
+
+    def advance(self, now=None):
+        """\
+        Runs the timers which expired until `now`.
+
+        This method is called by the thread of the wheel, see :py:func:`start`.
+        It can be called by the main loop of a program instead.
+
+        :param now: Optional time (see `clock`), by default the current time.
+        :rtype: int
+        :return: The number of timers which were run.
+        """
+        now = self._clock() if now is None else now
+        target = int((now - self._start) / self.resolution)
+        expired = []
+        with self._cond:
+            levels = self._levels
+            first = levels[0]
+            mask = len(first) - 1
+            while self._tick < target:
+                if not self._first_count:
+                    # Skip the empty slots until the next cascade
+                    self._tick = min(target, self._tick | mask)
+                    if self._tick == target:
+                        break
+                self._tick += 1
+                tick = self._tick
+                idx = tick & mask
+                if not idx:
+                    self._cascade(tick)
+                slot = first[idx]
+                if slot:
+                    first[idx] = []
+                    self._first_count -= len(slot)
+                    expired.extend(timer for timer in slot if not timer.cancelled)
+            for timer in expired:
+                if timer._period is not None:
+                    self._add(timer, max(timer._expires + timer._period, self._tick + 1))
+                else:
+                    timer._done = True
+                    self._count -= 1
+        if expired:
+            self._run(expired)
+        return len(expired)
+
+    def start(self):
+        """\
+        Starts the thread which runs the expired timers.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._loop, name='ftdu-timers')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """\
+        Stops the thread. The pending timers are kept.
+        """
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopped = True
+            self._cond.notify()
+        thread.join()
+        self._thread = None
+
+    def _add(self, timer, expires):
+        """\
+        Puts the timer into the slot of the provided tick. The caller must
+        hold the lock.
+        """
+        timer._expires = expires
+        delta = expires - self._tick
+        shift = 0
+        last = len(_BITS) - 1
+        for level, bits in enumerate(_BITS):
+            limit = 1 << (shift + bits)
+            if delta < limit or level == last:
+                if delta >= limit:  # Beyond the wheel, moved down later
+                    expires = self._tick + limit - 1
+                self._levels[level][(expires >> shift) & ((1 << bits) - 1)].append(timer)
+                if not level:
+                    self._first_count += 1
+                return
+            shift += bits
+
+    def _cascade(self, tick):
+        """\
+        Moves the timers of the higher levels which expire within the next
+        period of the lower level down.
+        """
+        shift = _BITS[0]
+        for level in range(1, len(_BITS)):
+            bits = _BITS[level]
+            idx = (tick >> shift) & ((1 << bits) - 1)
+            slot = self._levels[level][idx]
+            self._levels[level][idx] = []
+            for timer in slot:
+                if not timer.cancelled:
+                    self._add(timer, timer._expires)
+            if idx:
+                break
+            shift += bits
+
+    def _cancel(self, timer):
+        with self._cond:
+            if not timer.cancelled and not timer._done:
+                timer.cancelled = True
+                self._count -= 1
+
+    def _run(self, expired):
+        batches = {}
+        for timer in expired:
+            self.fired += 1
+            if timer._cmds is not None:
+                cmds = batches.get(timer.ftd)
+                if cmds is None:
+                    cmds = batches[timer.ftd] = {}
+                cmds.update(timer._cmds)
+                continue
+            try:
+                timer.action()
+            except Exception as ex:
+                self.errors.append((timer, ex))
+        for ftd, cmds in batches.items():
+            try:
+                ftd.comm_batch(list(cmds.values()))
+                self.writes += 1
+            except Exception as ex:
+                self.errors.append((None, ex))
+
+    def _loop(self):
+        cond = self._cond
+        clock = self._clock
+        while True:
+            with cond:
+                while not self._count and not self._stopped:
+                    cond.wait()
+                if self._stopped:
+                    break
+                delay = self._start + (self._tick + 1) * self.resolution - clock()
+                if delay > 0:
+                    cond.wait(delay)
+                    continue
+            self.advance()
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Continuous recording of all exchanges with a ftDuino into a binary ring file.
+
+A :class:`TraceWriter` preallocates a file of a fixed size and memory-maps
+it. Each exchange (request, reply, timestamp and duration) becomes a compact
+binary record. If the file is full, the oldest records are overwritten, so
+the file always contains the latest exchanges and never grows.
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.trace import TraceWriter, read_trace, format_trace
+
+    with ftdu.FtDuino() as ftd, TraceWriter('session.trace', ftd=ftd):
+        ...
+
+    for line in format_trace(read_trace('session.trace')):
+        print(line)
+
+    # Replay the session
+    from ftdu.replay import ReplayFtDuino
+    ftd = ReplayFtDuino(trace=read_trace('session.trace'))
+
+A record consists of the length of the request, the length of the reply
+(``0xFFFF`` if the ftDuino did not answer), the duration in nanoseconds
+(32 bit), the timestamp of the request (seconds since the epoch, double),
+the request and the reply (without line terminators). Records are 8 byte
+aligned.
+"""
+import io
+import mmap
+import struct
+import time
+from collections import deque
+from time import perf_counter_ns
+from .transport import Transport, _unwrap
+
+
+#: Default file size (16 MiB).
+DEFAULT_SIZE = 16 * 1024 * 1024
+
+_MAGIC = b'FTDUTRC1'
+# magic, format version, capacity of the data area
+_HEADER = struct.Struct('<8sII')
+_FORMAT_VERSION = 1
+# head, tail, number of records, number of records ever written
+_STATE = struct.Struct('<QQQQ')
+_STATE_OFFSET = 16
+_DATA_OFFSET = 64
+# request length, reply length, duration (ns), timestamp
+_RECORD = struct.Struct('<HHId')
+_RECORD_SIZE = _RECORD.size
+_pack_record = _RECORD.pack_into
+_pack_state = _STATE.pack_into
+_pack_wrap = struct.Struct('<H').pack_into
+_unpack_lengths = struct.Struct('<HH').unpack_from
+_NO_REPLY = 0xFFFF
+# Request length of the marker which indicates that the next record starts at the beginning
+_WRAP = 0xFFFF
+_MAX_DURATION = 0xFFFFFFFF
+
+
+class TraceWriter:
+    """\
+    Writes binary trace records into a preallocated, memory-mapped ring file.
+    """
+    def __init__(self, path, size=DEFAULT_SIZE, ftd=None):
+        """\
+        Creates (or truncates) the trace file.
+
+        :param path: Path of the trace file.
+        :param int size: Size of the file in bytes.
+        :param ftd: Optional :class:`ftdu.BaseFtDuino`, see :py:func:`attach`.
+        """
+        capacity = (size - _DATA_OFFSET) & ~7
+        if capacity < 1024:
+            raise ValueError('The size must be at least {0} bytes, got {1}'.format(_DATA_OFFSET + 1024, size))
+        self.path = path
+        self.capacity = capacity
+        self._file = io.open(path, 'w+b')
+        self._file.truncate(_DATA_OFFSET + capacity)
+        self._mm = mmap.mmap(self._file.fileno(), _DATA_OFFSET + capacity)
+        _HEADER.pack_into(self._mm, 0, _MAGIC, _FORMAT_VERSION, capacity)
+        self._head = 0
+        self._tail = 0
+        self._count = 0
+        self._total = 0
+        #: Number of records which were too large for the file.
+        self.dropped = 0
+        self._update_state()
+        self._ftd = None
+        self._transport = None
+        if ftd is not None:
+            self.attach(ftd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        """\
+        Returns the number of records in the file.
+        """
+        return self._count
+
+    @property
+    def total(self):
+        """\
+        Returns the number of records ever written (incl. overwritten records).
+        """
+        return self._total
+
+    def attach(self, ftd):
+        """\
+        Records the exchanges of the provided ftDuino.
+
+        :param ftd: The :class:`ftdu.BaseFtDuino`.
+        """
+        if self._ftd is not None:
+            raise ValueError('The trace writer is attached to a ftDuino')
+        self._ftd = ftd
+        self._transport = _TracingTransport(ftd._transport, self.record)
+        ftd._transport = self._transport
+
+    def detach(self):
+        """\
+        Stops recording the exchanges of the ftDuino.
+        """
+        if self._ftd is None:
+            return
+        self._transport.flush()
+        _unwrap(self._ftd, self._transport)
+        self._ftd = self._transport = None
+
+    def record(self, timestamp, request, reply, duration):
+        """\
+        Writes a record.
+
+        :param float timestamp: Time of the request.
+        :param bytes request: The request without line terminator.
+        :param reply: The reply (bytes) without line terminator or ``None``.
+        :param int duration: Duration of the exchange in nanoseconds.
+        """
+        req_len = len(request)
+        if reply is None:
+            reply_len, data = _NO_REPLY, request
+        else:
+            reply_len, data = len(reply), request + reply
+        n = len(data)
+        size = (_RECORD_SIZE + n + 7) & ~7
+        capacity = self.capacity
+        if size > capacity or req_len >= _WRAP or (reply_len >= _NO_REPLY and reply is not None):
+            self.dropped += 1
+            return
+        mm = self._mm
+        head = self._head
+        if head + size > capacity:
+            while self._count and self._tail >= head:
+                self._pop()
+            if capacity - head >= 2:
+                _pack_wrap(mm, _DATA_OFFSET + head, _WRAP)
+            head = 0
+        while self._count and head <= self._tail < head + size:
+            self._pop()
+        pos = _DATA_OFFSET + head
+        _pack_record(mm, pos, req_len, reply_len, duration if duration < _MAX_DURATION else _MAX_DURATION,
+                     timestamp)
+        pos += _RECORD_SIZE
+        mm[pos:pos + n] = data
+        if not self._count:
+            self._tail = head
+        self._head = head + size
+        self._count += 1
+        self._total += 1
+        _pack_state(mm, _STATE_OFFSET, self._head, self._tail, self._count, self._total)
+
+    def flush(self):
+        """\
+        Writes the changes to disk.
+        """
+        self._mm.flush()
+
+    def close(self):
+        """\
+        Detaches from the ftDuino and closes the file.
+        """
+        if self._mm is None:
+            return
+        self.detach()
+        self._mm.flush()
+        self._mm.close()
+        self._file.close()
+        self._mm = None
+
+    def _pop(self):
+        """\
+        Removes the oldest record.
+        """
+        tail = self._tail
+        if self.capacity - tail < 4:
+            self._tail = 0
+            return
+        req_len, reply_len = _unpack_lengths(self._mm, _DATA_OFFSET + tail)
+        if req_len == _WRAP:
+            self._tail = 0
+            return
+        size = _RECORD.size + req_len + (reply_len if reply_len != _NO_REPLY else 0)
+        self._tail = tail + ((size + 7) & ~7)
+        self._count -= 1
+
+    def _update_state(self):
+        _pack_state(self._mm, _STATE_OFFSET, self._head, self._tail, self._count, self._total)
+
+
+class _TracingTransport(Transport):
+    """\
+    Transport which passes each exchange of another transport to a callback.
+    """
+    def __init__(self, transport, callback):
+        self.transport = transport
+        self._callback = callback
+        self._pending = deque()
+        self._partial = b''
+        self._rx = b''
+
+    def write(self, data):
+        now, start = time.time(), perf_counter_ns()
+        lines = (self._partial + bytes(data)).split(b'\n')
+        self._partial = lines.pop()
+        append = self._pending.append
+        for line in lines:
+            append((now, start, line))
+        return self.transport.write(data)
+
+    def readline(self):
+        line = self.transport.readline()
+        if self._pending:
+            self._complete([line.rstrip(b'\r\n')] if line.endswith(b'\n') else [None])
+        return line
+
+    def readinto(self, buf):
+        n = self.transport.readinto(buf)
+        if n:
+            lines = (self._rx + bytes(memoryview(buf)[:n])).split(b'\n')
+            self._rx = lines.pop()
+            if lines:
+                self._complete([line.rstrip(b'\r') for line in lines])
+        return n
+
+    def flush(self):
+        self.transport.flush()
+        if self._pending:  # Unanswered requests
+            self._complete([None] * len(self._pending))
+        self._partial = self._rx = b''
+
+    def close(self):
+        self.transport.close()
+
+    def _complete(self, replies):
+        pending, callback = self._pending, self._callback
+        end = perf_counter_ns()
+        for reply in replies:
+            if not pending:
+                break
+            t, start, request = pending.popleft()
+            callback(t, request, reply, end - start)
+
+
+def read_trace(path):
+    """\
+    Reads the records of a trace file (oldest first).
+
+    The records can be replayed by :class:`ftdu.replay.ReplayFtDuino`.
+
+    :param path: Path of the trace file.
+    :rtype: list
+    :return: A list of ``(timestamp, request, reply, duration)`` tuples. The
+            reply is ``None`` if the ftDuino did not answer, the duration is
+            provided in seconds.
+    """
+    with io.open(path, 'rb') as f:
+        data = f.read()
+    magic, version, capacity = _HEADER.unpack_from(data, 0)
+    if magic != _MAGIC:
+        raise ValueError('"{0}" is not a trace file'.format(path))
+    if version != _FORMAT_VERSION:
+        raise ValueError('Unsupported trace format version {0}'.format(version))
+    head, tail, count, _ = _STATE.unpack_from(data, _STATE_OFFSET)
+    res = []
+    pos = tail
+    while len(res) < count:
+        if capacity - pos < 2 or struct.unpack_from('<H', data, _DATA_OFFSET + pos)[0] == _WRAP:
+            pos = 0
+            continue
+        req_len, reply_len, duration, timestamp = _RECORD.unpack_from(data, _DATA_OFFSET + pos)
+        start = _DATA_OFFSET + pos + _RECORD.size
+        request = data[start:start + req_len].decode('utf-8')
+        reply = None
+        if reply_len != _NO_REPLY:
+            reply = data[start + req_len:start + req_len + reply_len].decode('utf-8')
+        res.append((timestamp, request, reply, duration / 1e9))
+        pos += (_RECORD.size + req_len + (reply_len if reply_len != _NO_REPLY else 0) + 7) & ~7
+    return res
+
+
+def format_trace(records):
+    """\
+    Returns a human-readable line per record.
+
+    :param records: Iterable of ``(timestamp, request, reply, duration)``
+            tuples, see :func:`read_trace`.
+    :rtype: generator
+    """
+    for timestamp, request, reply, duration in records:
+        t = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+        yield '{0}.{1:06d} {2:10.1f} us  {3} -> {4}'.format(t, int(timestamp % 1 * 1e6), duration * 1e6,
+                                                            request, '(no reply)' if reply is None else reply)
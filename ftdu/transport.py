@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Transports carry the bytes between a :class:`ftdu.BaseFtDuino` and a ftDuino.
+
+The default transport is :class:`SerialTransport` which uses pyserial.
+pyserial is imported when the first :class:`SerialTransport` is created.
+Alternatives are :class:`FdTransport` (plain file descriptor, i.e. a tty
+device, uses ``os.read`` / ``os.write``), :class:`SocketTransport` (TCP) and
+:class:`LoopbackTransport` (in-memory, i.e. for an :class:`ftdu.emulator.Emulator`).
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.transport import FdTransport
+
+    with ftdu.FtDuino(transport=FdTransport.open('/dev/ttyACM0')) as ftd:
+        ftd.led = True
+"""
+import errno
+import os
+import select
+import socket
+import time
+
+
+#: Baud rate of the ftDuino
+BAUDRATE = 115200
+
+#: Default read / write timeout in seconds
+TIMEOUT = 0.1
+
+
+class Transport:
+    """\
+    Interface of all transports.
+    """
+    def __init__(self):
+        # Remainder of the line which did not fit into the buffer of readinto
+        self._readinto_rest = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, data):
+        """\
+        Writes the provided bytes.
+
+        :param bytes data: The data to write.
+        """
+        raise NotImplementedError()
+
+    def readline(self):
+        """\
+        Reads a line.
+
+        :rtype: bytes
+        :return: The line including the line terminator. If the timeout
+                 elapsed, the data received so far (maybe empty) is returned.
+        """
+        raise NotImplementedError()
+
+    def readinto(self, buf):
+        """\
+        Reads the available bytes into the provided buffer.
+
+        Waits until at least one byte is available or the timeout elapsed.
+        The default implementation uses :py:func:`readline`, subclasses
+        should override it to avoid the copy. Subclasses which use the
+        default implementation must call :py:func:`__init__` and
+        :py:func:`flush` of this class.
+
+        :param buf: A writable buffer, i.e. a :class:`bytearray` or a
+                    :class:`memoryview`.
+        :rtype: int
+        :return: The number of bytes read (``0`` if the timeout elapsed).
+        """
+        data = self._readinto_rest or self.readline()
+        n = min(len(buf), len(data))
+        buf[:n] = data[:n]
+        self._readinto_rest = data[n:]
+        return n
+
+    def flush(self):
+        """\
+        Discards all pending input and output.
+
+        The default implementation discards the remainder of
+        :py:func:`readinto`.
+        """
+        self._readinto_rest = b''
+
+    def close(self):
+        """\
+        Closes the transport.
+        """
+        raise NotImplementedError()
+
+
+class SerialTransport(Transport):
+    """\
+    Transport which uses pyserial.
+    """
+    def __init__(self, path, timeout=TIMEOUT):
+        """\
+        Opens the serial port.
+
+        :param path: Device path, i.e. ``/dev/ttyACM0`` or ``COM3``.
+        :param float timeout: Read / write timeout in seconds.
+        """
+        import serial  # Imported on demand to keep "import ftdu" fast
+        self._conn = serial.Serial(path, BAUDRATE, timeout=timeout, writeTimeout=timeout)
+        time.sleep(0.25)
+        self.write = self._conn.write
+        self.readline = self._conn.readline
+
+    def readinto(self, buf):
+        conn = self._conn
+        view = memoryview(buf)
+        n = conn.readinto(view[:1])  # Waits max. timeout
+        if n:
+            available = min(conn.in_waiting, len(view) - 1)
+            if available:
+                n += conn.readinto(view[1:1 + available])
+        return n
+
+    @property
+    def timeout(self):
+        """\
+        Read / write timeout in seconds.
+        """
+        return self._conn.timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._conn.timeout = timeout
+        self._conn.write_timeout = timeout
+
+    def flush(self):
+        conn = self._conn
+        conn.reset_input_buffer()
+        conn.reset_output_buffer()
+
+    def close(self):
+        self._conn.close()
+
+
+class _BufferedTransport(Transport):
+    """\
+    Base class of transports which split the received bytes into lines.
+    """
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._buf = bytearray()
+
+    def readline(self):
+        buf = self._buf
+        idx = buf.find(b'\n')
+        deadline = None
+        while idx < 0:
+            if deadline is None:
+                deadline = time.time() + self.timeout
+            remaining = deadline - time.time()
+            data = self._recv(remaining) if remaining > 0 else None
+            if not data:  # Timeout or EOF
+                line = bytes(buf)
+                del buf[:]
+                return line
+            start = len(buf)
+            buf += data
+            idx = buf.find(b'\n', start)
+        line = bytes(buf[:idx + 1])
+        del buf[:idx + 1]
+        return line
+
+    def readinto(self, buf):
+        pending = self._buf
+        if pending:
+            n = min(len(buf), len(pending))
+            buf[:n] = pending[:n]
+            del pending[:n]
+            return n
+        return self._recv_into(buf, self.timeout)
+
+    def flush(self):
+        del self._buf[:]
+        while self._recv(0):
+            pass
+
+    def _recv(self, timeout):
+        """\
+        Returns the available bytes, waits max. `timeout` seconds.
+
+        :return: The data or ``None`` if the timeout elapsed, ``b''`` at EOF.
+        """
+        raise NotImplementedError()
+
+    def _recv_into(self, buf, timeout):
+        """\
+        Reads the available bytes into `buf`, waits max. `timeout` seconds.
+
+        :return: The number of bytes read (``0`` if the timeout elapsed or at EOF).
+        """
+        raise NotImplementedError()
+
+
+class FdTransport(_BufferedTransport):
+    """\
+    Transport which reads and writes a file descriptor with ``os.read`` and
+    ``os.write`` and waits with :py:func:`select.poll`.
+    """
+    def __init__(self, fd, timeout=TIMEOUT, close_fd=True):
+        """\
+        :param int fd: The file descriptor, i.e. of a tty or a socket.
+        :param float timeout: Read / write timeout in seconds.
+        :param bool close_fd: Indicates if the file descriptor should be
+                closed by :py:func:`close`.
+        """
+        super(FdTransport, self).__init__(timeout)
+        self._fd = fd
+        self._close_fd = close_fd
+        self._poll_in = _Poller(fd, select.POLLIN if hasattr(select, 'poll') else None)
+        self._poll_out = _Poller(fd, select.POLLOUT if hasattr(select, 'poll') else None, write=True)
+
+    @classmethod
+    def open(cls, path, timeout=TIMEOUT):
+        """\
+        Opens a tty in raw mode (POSIX only).
+
+        :param path: Device path, i.e. ``/dev/ttyACM0``.
+        :param float timeout: Read / write timeout in seconds.
+        """
+        import termios
+        import tty
+        fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            tty.setraw(fd)
+            attrs = termios.tcgetattr(fd)
+            attrs[4] = attrs[5] = termios.B115200
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        except Exception:
+            os.close(fd)
+            raise
+        time.sleep(0.25)
+        return cls(fd, timeout)
+
+    def write(self, data):
+        view = memoryview(data)
+        fd = self._fd
+        while view:
+            try:
+                n = os.write(fd, view)
+            except OSError as ex:
+                if ex.errno != errno.EAGAIN:
+                    raise
+                n = 0
+            view = view[n:]
+            if view and not self._poll_out.wait(self.timeout):
+                raise IOError('Write timeout')
+
+    def _recv(self, timeout):
+        if not self._poll_in.wait(timeout):
+            return None
+        try:
+            return os.read(self._fd, 4096)
+        except OSError as ex:
+            if ex.errno != errno.EAGAIN:
+                raise
+            return None
+
+    def _recv_into(self, buf, timeout):
+        if not self._poll_in.wait(timeout):
+            return 0
+        try:
+            return os.readv(self._fd, [buf])
+        except OSError as ex:
+            if ex.errno != errno.EAGAIN:
+                raise
+            return 0
+
+    def close(self):
+        if self._close_fd and self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+
+
+class SocketTransport(_BufferedTransport):
+    """\
+    Transport which uses a TCP connection.
+    """
+    def __init__(self, address, timeout=TIMEOUT, connect_timeout=5):
+        """\
+        :param address: Tuple (host, port) or a connected socket.
+        :param float timeout: Read / write timeout in seconds.
+        :param float connect_timeout: Timeout to establish the connection.
+        """
+        super(SocketTransport, self).__init__(timeout)
+        if isinstance(address, socket.socket):
+            sock = address
+        else:
+            sock = socket.create_connection(address, connect_timeout)
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(timeout)
+        self._sock = sock
+
+    def write(self, data):
+        self._sock.sendall(data)
+
+    def _recv(self, timeout):
+        sock = self._sock
+        if not select.select([sock], [], [], timeout)[0]:
+            return None
+        return sock.recv(4096)
+
+    def _recv_into(self, buf, timeout):
+        sock = self._sock
+        if not select.select([sock], [], [], timeout)[0]:
+            return 0
+        return sock.recv_into(buf)
+
+    def close(self):
+        self._sock.close()
+
+
+class LoopbackTransport(Transport):
+    """\
+    In-memory transport which passes each request line to a handler.
+
+    The handler gets the request (str, without line terminator) and
+    returns the reply (str) or ``None`` if the request is not answered.
+    """
+    def __init__(self, handler):
+        """\
+        :param handler: Callable which answers requests,
+                        i.e. :py:func:`ftdu.emulator.Emulator.handle`.
+        """
+        self._handler = handler
+        self._pending = b''
+        self._replies = []
+
+    def write(self, data):
+        lines = (self._pending + bytes(data)).split(b'\n')
+        self._pending = lines.pop()
+        handler = self._handler
+        for line in lines:
+            reply = handler(line.decode('utf-8').rstrip('\r'))
+            if reply is not None:
+                self._replies.append((reply + '\r\n').encode('utf-8'))
+        return len(data)
+
+    def readline(self):
+        return self._replies.pop(0) if self._replies else b''
+
+    def readinto(self, buf):
+        replies = self._replies
+        n, size = 0, len(buf)
+        while replies and n < size:
+            reply = replies[0]
+            k = min(len(reply), size - n)
+            buf[n:n + k] = reply[:k]
+            n += k
+            if k < len(reply):
+                replies[0] = reply[k:]
+            else:
+                del replies[0]
+        return n
+
+    def flush(self):
+        self._pending = b''
+        del self._replies[:]
+
+    def close(self):
+        self.flush()
+
+
+def _unwrap(ftd, wrapper):
+    """\
+    Removes the `wrapper` from the transport chain of the ftDuino. Wrappers
+    which were attached later (i.e. by :class:`ftdu.trace.TraceWriter`) are
+    kept.
+    """
+    outer = ftd._transport
+    if outer is wrapper:
+        ftd._transport = wrapper.transport
+        return
+    while outer is not None:
+        inner = getattr(outer, 'transport', None)
+        if inner is wrapper:
+            outer.transport = wrapper.transport
+            return
+        outer = inner
+
+
+class _Poller:
+    """\
+    Waits until a file descriptor is readable / writable.
+
+    Uses :py:func:`select.poll` if available, :py:func:`select.select` otherwise.
+    """
+    def __init__(self, fd, event, write=False):
+        self._fd = fd
+        self._write = write
+        self._poll = None
+        if event is not None:
+            self._poll = select.poll()
+            self._poll.register(fd, event)
+
+    def wait(self, timeout):
+        if self._poll is not None:
+            return bool(self._poll.poll(max(timeout, 0) * 1000))
+        fds = [self._fd]
+        if self._write:
+            return bool(select.select([], fds, [], max(timeout, 0))[1])
+        return bool(select.select(fds, [], [], max(timeout, 0))[0])
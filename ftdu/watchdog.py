@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Fail-safe which stops the motors and outputs if the program or the link stalls.
+
+A :class:`Watchdog` observes the communication with a ftDuino and, optionally,
+the ticks of the program's main loop. If a reply is overdue (``comm_timeout``)
+or the loop missed its deadline (``tick_timeout``), the watchdog sends one
+batch of commands which brakes all running motors and switches off all active
+outputs. The running motors and the active outputs are known from the commands
+sent so far (shadow state).
+
+.. code-block:: python
+
+    import ftdu
+    from ftdu.watchdog import Watchdog
+
+    with ftdu.FtDuino() as ftd, Watchdog(ftd, comm_timeout=0.5, tick_timeout=0.2) as watchdog:
+        while True:
+            watchdog.tick()
+            ...
+
+Each stall is recorded, see :py:attr:`Watchdog.stalls`.
+"""
+import threading
+import time
+from . import MOTOR_PORTS, OUTPUT_PORTS, MAX
+from .transport import Transport, _unwrap
+
+
+#: Stall kind: A reply is overdue.
+STALL_COMM = 'comm'
+#: Stall kind: The main loop missed its deadline.
+STALL_TICK = 'tick'
+
+
+class Watchdog:
+    """\
+    Monitors the communication with a ftDuino and the main loop.
+    """
+    def __init__(self, ftd, comm_timeout=0.5, tick_timeout=None, check_interval=None,
+                 all_ports=False, on_stall=None):
+        """\
+        :param ftd: The :class:`ftdu.BaseFtDuino`.
+        :param comm_timeout: Max. seconds between a request and (the next part
+                of) its reply, ``None`` to disable.
+        :param tick_timeout: Max. seconds between two calls of :py:func:`tick`,
+                ``None`` to disable. The deadline is armed by the first tick.
+        :param check_interval: Seconds between two checks, by default a
+                quarter of the smallest timeout.
+        :param bool all_ports: ``True`` to stop all motors and outputs,
+                ``False`` (default) to stop the active ones only.
+        :param on_stall: Optional callable which is called with the stall
+                record (a dict) after the fail-safe commands were sent.
+        """
+        timeouts = [t for t in (comm_timeout, tick_timeout) if t]
+        if not timeouts:
+            raise ValueError('Provide comm_timeout and / or tick_timeout')
+        self.ftd = ftd
+        self.comm_timeout = comm_timeout
+        self.tick_timeout = tick_timeout
+        self.check_interval = check_interval or min(timeouts) / 4.0
+        self.all_ports = all_ports
+        self.on_stall = on_stall
+        #: The recorded stalls (dicts), see :py:func:`check`.
+        self.stalls = []
+        self._transport = None
+        self._last_tick = None
+        self._stall = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        """\
+        Starts monitoring.
+        """
+        if self._thread is not None:
+            return
+        self._transport = _WatchedTransport(self.ftd._transport)
+        self.ftd._transport = self._transport
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ftdu-watchdog')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """\
+        Stops monitoring.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        _unwrap(self.ftd, self._transport)
+        self._transport = None
+
+    def tick(self):
+        """\
+        Signals that the main loop is alive.
+        """
+        self._last_tick = time.time()
+
+    @property
+    def active(self):
+        """\
+        Returns the running motors and active outputs (shadow state) as
+        tuple ``(motors, outputs)``.
+        """
+        transport = self._transport
+        if transport is None:
+            return (), ()
+        return tuple(sorted(transport.motors)), tuple(sorted(transport.outputs))
+
+    def fail_safe(self):
+        """\
+        Brakes the motors and switches the outputs off with one write.
+
+        The commands are sent as exchange of their own: If another thread
+        waits for a reply, the fail-safe waits until the reply was received
+        or the read timed out (see the timeout of the transport). The
+        replies of the fail-safe commands are read and discarded.
+
+        :rtype: list
+        :return: The sent commands.
+        """
+        motors, outputs = (MOTOR_PORTS, OUTPUT_PORTS) if self.all_ports else self.active
+        cmds = ['motor_set {0} brake {1}'.format(port, MAX) for port in motors] \
+            + ['output_set {0} 0 0'.format(port) for port in outputs]
+        if cmds:
+            transport = self._transport
+            with self.ftd._lock:
+                # Bypass the watched transport, the fail-safe is no progress of the program
+                target = transport.transport if transport is not None else self.ftd._transport
+                target.flush()
+                target.write(''.join(cmd + '\n' for cmd in cmds).encode('utf-8'))
+                for _ in cmds:
+                    if not target.readline().endswith(b'\n'):
+                        break  # Timeout, the remaining replies are discarded by the next flush
+                if transport is not None:
+                    transport.motors.clear()
+                    transport.outputs.clear()
+        return cmds
+
+    def check(self, now=None):
+        """\
+        Checks the deadlines and runs the fail-safe if a deadline was missed.
+
+        This method is called periodically by the monitoring thread.
+
+        The stall record is a dict with the keys ``kind`` (:py:data:`STALL_COMM`
+        or :py:data:`STALL_TICK`), ``since`` (time of the last progress),
+        ``detected`` (time of detection), ``overdue`` (seconds past the
+        deadline), ``pending`` (number of unanswered commands), ``commands``
+        (the sent fail-safe commands) and ``recovered`` (time of the next
+        progress or ``None``).
+
+        :rtype: bool
+        :return: ``True`` if a new stall was detected.
+        """
+        now = time.time() if now is None else now
+        transport = self._transport
+        kind = since = timeout = None
+        if self.comm_timeout and transport is not None and transport.pending > 0:
+            since, timeout = transport.last_progress, self.comm_timeout
+            if now - since > timeout:
+                kind = STALL_COMM
+        if kind is None and self.tick_timeout and self._last_tick is not None:
+            since, timeout = self._last_tick, self.tick_timeout
+            if now - since > timeout:
+                kind = STALL_TICK
+        stall = self._stall
+        if kind is None:
+            if stall is not None:
+                stall['recovered'] = now
+                self._stall = None
+            return False
+        if stall is not None and stall['kind'] == kind and stall['since'] == since:
+            return False  # Known stall
+        stall = self._stall = {'kind': kind, 'since': since, 'detected': now,
+                               'overdue': now - since - timeout,
+                               'pending': transport.pending if transport is not None else 0,
+                               'commands': [], 'recovered': None}
+        stall['commands'] = self.fail_safe()
+        self.stalls.append(stall)
+        if self.on_stall is not None:
+            self.on_stall(stall)
+        return True
+
+    def _run(self):
+        interval = self.check_interval
+        while not self._stop.wait(interval):
+            self.check()
+
+
+class _WatchedTransport(Transport):
+    """\
+    Transport which records the progress of another transport and the
+    running motors / active outputs.
+    """
+    def __init__(self, transport):
+        self.transport = transport
+        #: Number of unanswered commands.
+        self.pending = 0
+        self.last_progress = time.time()
+        self.motors = set()
+        self.outputs = set()
+
+    def write(self, data):
+        if b'_set' in data or b'motor_counter' in data:
+            self._track(bytes(data))
+        self.pending += data.count(b'\n')
+        self.last_progress = time.time()
+        return self.transport.write(data)
+
+    def readline(self):
+        line = self.transport.readline()
+        self._progress(line.count(b'\n'))
+        return line
+
+    def readinto(self, buf):
+        n = self.transport.readinto(buf)
+        if n:
+            self._progress(bytes(memoryview(buf)[:n]).count(b'\n'))
+        return n
+
+    def flush(self):
+        self.transport.flush()
+        self.pending = 0
+
+    def close(self):
+        self.transport.close()
+
+    def _progress(self, lines):
+        if lines:
+            self.pending = max(0, self.pending - lines)
+            self.last_progress = time.time()
+
+    def _track(self, data):
+        motors, outputs = self.motors, self.outputs
+        for line in data.split(b'\n'):
+            parts = line.decode('utf-8').lower().split()
+            if len(parts) < 3:
+                continue
+            cmd, port, mode = parts[0], parts[1].upper(), parts[2]
+            if cmd == 'output_set':
+                (outputs.add if mode != '0' else outputs.discard)(port)
+            elif cmd in ('motor_set', 'motor_counter'):
+                (motors.add if mode in ('left', 'right') else motors.discard)(port)
@@ -31,7 +31,7 @@ def read(*filenames, **kwargs):
     return sep.join(buf)
 
 version = re.search(r'''^__version__ = ["']([^'"]+)['"]''',
-                    read('ftdu.py'), flags=re.MULTILINE).group(1)
+                    read(os.path.join('ftdu', '__init__.py')), flags=re.MULTILINE).group(1)
 
 setup(
     name='ftdu',
@@ -43,10 +43,16 @@ setup(
     author='Lars Heuer',
     author_email='heuer@semagia.com',
     platforms=['any'],
+    python_requires='>=3.8',
     install_requires=['pyserial>=3.0'],
     packages=find_packages(exclude=['docs', 'tests', 'sandbox', 'htmlcov']),
-    py_modules=['ftdu'],
     include_package_data=True,
+    entry_points={
+        'console_scripts': [
+            'ftdu = ftdu.cli:main',
+            'ftdu-bridge = ftdu.bridge:main',
+        ],
+    },
     keywords=['fischertechnik', 'ftduino'],
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -55,9 +61,10 @@ setup(
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 2',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: Utilities',
     ],
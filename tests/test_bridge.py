@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the bridge.
+"""
+import os
+import socket
+import threading
+import pytest
+import ftdu
+from ftdu.bridge import Bridge, RemoteFtDuino
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+
+
+def _emulated(*names):
+    emus = dict((name, Emulator(name)) for name in names)
+    devices = dict((name, ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)))
+                   for name, emu in emus.items())
+    return emus, devices
+
+
+@pytest.fixture
+def bridge():
+    emus, devices = _emulated('a', 'b')
+    bridge = Bridge(devices, sample_ports=('I1', 'C1'), sample_interval=0.01)
+    address = bridge.start_thread()[0]
+    yield emus, bridge, address
+    bridge.stop()
+
+
+def test_remote(bridge):
+    emus, bridge, address = bridge
+    emus['a'].inputs['I1'] = 42
+    with RemoteFtDuino(address, device='a') as ftd:
+        assert ['a', 'b'] == ftd.devices()
+        assert 42 == ftd.i1
+        ftd.o2 = True
+        assert 'a' == ftd.ftduino_id_get()
+    assert (ftdu.HIGH, ftdu.MAX) == emus['a'].outputs['O2']
+    assert (0, 0) == emus['b'].outputs['O2']
+    assert bridge.stats()['a']['requests'] >= 3
+
+
+def test_unknown_device(bridge):
+    emus, bridge, address = bridge
+    with pytest.raises(ValueError):
+        RemoteFtDuino(address, device='c')
+
+
+def test_no_device_selected(bridge):
+    emus, bridge, address = bridge
+    with RemoteFtDuino(address) as ftd:
+        assert 'Fail' == ftd.comm('input_get I1')
+
+
+def test_single_device():
+    emus, devices = _emulated('a')
+    bridge = Bridge(devices)
+    address = bridge.start_thread()[0]
+    try:
+        with RemoteFtDuino(address) as ftd:
+            assert 0 == ftd.i1
+    finally:
+        bridge.stop()
+
+
+def test_many_clients(bridge):
+    emus, bridge, address = bridge
+    errors = []
+
+    def client(n):
+        try:
+            with RemoteFtDuino(address, device='b') as ftd:
+                for _ in range(50):
+                    ftd.counter_get('C1')
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    stats = bridge.stats()['b']
+    assert 400 == stats['requests']
+    assert stats['batches'] <= 400
+
+
+def test_pipelining(bridge):
+    emus, bridge, address = bridge
+    emus['a'].inputs['I2'] = 7
+    sock = socket.create_connection(address)
+    sock.sendall(b'@a\ninput_get I1\ninput_get I2\nled_set 1\n')
+    f = sock.makefile('rb')
+    assert [b'Ok', b'0', b'7', b'Ok'] == [f.readline().rstrip() for _ in range(4)]
+    f.close()
+    sock.close()
+
+
+def test_subscribe(bridge):
+    emus, bridge, address = bridge
+    emus['b'].inputs['I1'] = 3
+    emus['b'].counters['C1'] = 5
+    with RemoteFtDuino(address, device='b') as ftd:
+        with ftd.subscribe() as sub1, ftd.subscribe() as sub2:
+            assert ('I1', 'C1') == sub1.ports
+            for sub in (sub1, sub2):
+                for _ in range(3):
+                    timestamp, values = next(sub)
+                    assert (3, 5) == values
+        # Still usable
+        assert 3 == ftd.i1
+    assert bridge.stats()['b']['samples'] >= 3
+
+
+class _CountingTransport(LoopbackTransport):
+    def __init__(self, handler):
+        super(_CountingTransport, self).__init__(handler)
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super(_CountingTransport, self).write(data)
+
+
+@pytest.mark.parametrize('ports', [('I1', 'I2', 'C1'), ('I1', 'ultrasonic')])
+def test_one_exchange(ports):
+    emu = Emulator()
+    emu.inputs['I1'] = 4
+    transport = _CountingTransport(emu.handle)
+    bridge = Bridge({'a': ftdu.BaseFtDuino(transport=transport)}, sample_ports=ports)
+    device = bridge._devices['a']
+    assert ['4', 'Ok', 'Fail'] == device._execute(['input_get I1', 'led_set 1', 'unknown'])
+    assert 1 == transport.writes
+    device._read_samples()  # Detects the features, if necessary
+    writes = transport.writes
+    assert 4 == int(device._read_samples()[0])
+    assert 1 == transport.writes - writes
+
+
+def test_failed_exchange():
+    emu = Emulator()
+    transport = _CountingTransport(emu.handle)
+    bridge = Bridge({'a': ftdu.BaseFtDuino(transport=transport)})
+    device = bridge._devices['a']
+    error = IOError('Device disconnected')
+
+    def write(data):
+        emu.handle(data.decode('utf-8').splitlines()[0])  # First command was executed
+        raise error
+
+    transport.write = write
+    assert [error, error] == device._execute(['counter_clear C1', 'input_get I1'])
+    assert 1 == emu.count  # Not sent again
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='Unix domain sockets required')
+def test_unix(tmpdir):
+    emus, devices = _emulated('a')
+    path = str(tmpdir.join('ftdu.sock'))
+    bridge = Bridge(devices)
+    bridge.start_thread(port=None, path=path)
+    try:
+        assert os.path.exists(path)
+        with RemoteFtDuino(path) as ftd:
+            ftd.led = True
+        assert emus['a'].led
+    finally:
+        bridge.stop()
+
+
+def test_no_devices():
+    with pytest.raises(ValueError):
+        Bridge({})
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
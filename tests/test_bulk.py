@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the batched I/O API (using the emulator).
+"""
+from array import array
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        yield emu, ftd
+
+
+def test_comm_batch(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.inputs['I2'] = 3
+    assert ['0', '3', 'Ok'] == ftd.comm_batch(['input_get I1', 'input_get I2', 'led_set 1'])
+    assert emu.led
+
+
+def test_read_inputs(emu_ftd):
+    emu, ftd = emu_ftd
+    for i, port in enumerate(ftdu.INPUT_PORTS):
+        emu.inputs[port] = i * 100
+    assert not ftd.features  # Detected once, no multi_get support
+    count = emu.count
+    values = ftd.read_inputs()
+    assert emu.count == count + 8
+    assert isinstance(values, array)
+    assert [i * 100 for i in range(8)] == list(values)
+
+
+def test_read_inputs_out(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.inputs['I3'] = 33
+    emu.inputs['I7'] = 77
+    out = array('i', [-1] * 3)
+    assert out is ftd.read_inputs(out, ports=('I7', 'I3'))
+    assert [77, 33, -1] == list(out)
+
+
+def test_read_inputs_numpy(emu_ftd):
+    np = pytest.importorskip('numpy')
+    emu, ftd = emu_ftd
+    emu.inputs['I8'] = 8
+    out = np.zeros(8, dtype=np.int32)
+    ftd.read_inputs(out)
+    assert 8 == out[7]
+
+
+def test_read_inputs_error(emu_ftd):
+    emu, ftd = emu_ftd
+    with pytest.raises(ValueError):
+        ftd.read_inputs(ports=('I1', 'I9'))
+    # The transport is usable afterwards
+    assert 0 == ftd.input_get('I1')
+
+
+def test_read_counters(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.counters['C4'] = 4
+    assert [0, 0, 0, 4] == list(ftd.read_counters())
+
+
+def test_snapshot(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.inputs['I1'] = 1
+    emu.counters['C1'] = 2
+    values = ftd.snapshot()
+    assert len(ftdu.SNAPSHOT_PORTS) == len(values)
+    assert 1 == values[ftdu.SNAPSHOT_PORTS.index('I1')]
+    assert 2 == values[ftdu.SNAPSHOT_PORTS.index('C1')]
+
+
+def test_multi_get():
+    emu = Emulator(features=(ftdu.FEATURE_MULTI_GET,))
+    emu.inputs['I8'] = 8
+    emu.counters['C2'] = 2
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        assert frozenset([ftdu.FEATURE_MULTI_GET]) == ftd.features
+        count = emu.count
+        values = ftd.snapshot()
+        assert emu.count == count + 1
+        assert 8 == values[ftdu.SNAPSHOT_PORTS.index('I8')]
+        assert 2 == values[ftdu.SNAPSHOT_PORTS.index('C2')]
+        assert [8, 0] == list(ftd.read_inputs(ports=('I8', 'i1')))
+        assert [2] == list(ftd.read_counters(ports=('C2',)))
+        assert emu.count == count + 3
+        with pytest.raises(ValueError):
+            ftd.read_inputs(ports=('I1', 'I9'))
+
+
+def test_multi_get_detection():
+    emu = Emulator(features=(ftdu.FEATURE_MULTI_GET,))
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        assert '1.3.0 multi_get' == ftd.ftduino_direct_get_version()
+        count = emu.count
+        ftd.snapshot()  # Detected by the explicit call
+        assert emu.count == count + 1
+
+
+def test_multi_get_fallback():
+    emu = Emulator(features=(ftdu.FEATURE_MULTI_GET,))
+    emu.inputs['I2'] = 2
+
+    def handle(request):
+        return 'Fail' if request.startswith('multi_get') else emu.handle(request)
+
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(handle)) as ftd:
+        assert [0, 2] == list(ftd.read_inputs(ports=('I1', 'I2')))
+        assert not ftd.features
+        count = emu.count
+        ftd.snapshot()
+        assert emu.count == count + len(ftdu.SNAPSHOT_PORTS)
+
+
+@pytest.mark.parametrize('reply', [None, '1 x', '1'])
+def test_multi_get_keeps_feature(reply):
+    emu = Emulator(features=(ftdu.FEATURE_MULTI_GET,))
+    emu.inputs['I2'] = 2
+    replies = [reply]
+
+    def handle(request):
+        if request.startswith('multi_get') and replies:
+            emu.count += 1
+            return replies.pop()
+        return emu.handle(request)
+
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(handle)) as ftd:
+        with pytest.raises(ValueError):
+            ftd.read_inputs(ports=('I1', 'I2'))  # Timeout or malformed reply
+        assert ftdu.FEATURE_MULTI_GET in ftd.features
+        count = emu.count
+        assert [0, 2] == list(ftd.read_inputs(ports=('I1', 'I2')))
+        assert emu.count == count + 1
+
+
+def test_write_outputs(emu_ftd):
+    emu, ftd = emu_ftd
+    count = emu.count
+    ftd.write_outputs([ftdu.HIGH] * 8, array('i', range(0, 512, 64)))
+    assert emu.count == count + 8
+    assert [(ftdu.HIGH, pwm) for pwm in range(0, 512, 64)] \
+        == [emu.outputs[port] for port in ftdu.OUTPUT_PORTS]
+    ftd.write_outputs([ftdu.OFF, ftdu.HIGH], ports=('O2', 'O1'))
+    assert (ftdu.HIGH, ftdu.MAX) == emu.outputs['O1']
+    assert (ftdu.OFF, ftdu.MIN) == emu.outputs['O2']
+
+
+def test_write_outputs_illegal(emu_ftd):
+    emu, ftd = emu_ftd
+    with pytest.raises(ValueError):
+        ftd.write_outputs([ftdu.HIGH] * 7)
+    with pytest.raises(ValueError):
+        ftd.write_outputs([3] * 8)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
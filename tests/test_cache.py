@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the device cache (using the emulator).
+"""
+import os
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.cache import DeviceCache, identify
+from ftdu.calibration import Calibration, Linear
+
+
+def _board(name='ftDuino', features=()):
+    emu = Emulator(name=name, features=features)
+    return emu, ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle))
+
+
+def test_connect_probes_once(tmpdir):
+    path = str(tmpdir.join('sub', 'devices.json'))
+    emu, ftd = _board(features=(ftdu.FEATURE_MULTI_GET,))
+    entry = DeviceCache(path).connect(ftd)
+    assert os.path.isfile(path)
+    assert 'ftDuino' == entry['id']
+    assert [ftdu.FEATURE_MULTI_GET] == entry['features']
+    assert 'commands' not in entry
+    assert entry['rtt'] > 0
+    assert entry['timeout'] >= 0.05
+    # New connection, new cache instance: Known device, no probing
+    emu2, ftd2 = _board(features=(ftdu.FEATURE_MULTI_GET,))
+    entry2 = DeviceCache(path).connect(ftd2)
+    assert 2 == emu2.count  # ID and version only
+    assert entry['rtt'] == entry2['rtt']
+    count = emu2.count
+    ftd2.snapshot()
+    assert 1 == emu2.count - count  # multi_get without detection
+
+
+def test_cached_features(tmpdir):
+    path = str(tmpdir.join('devices.json'))
+    emu, ftd = _board(features=(ftdu.FEATURE_MULTI_GET,))
+    cache = DeviceCache(path)
+    device_id, version = identify(ftd)
+    cache.put(device_id, version, features=[])  # i.e. multi_get does not work with this board
+    cache.connect(ftd)
+    assert frozenset() == ftd.features
+    count = emu.count
+    ftd.read_inputs(ports=('I1', 'I2', 'I3'))
+    assert 3 == emu.count - count
+
+
+def test_version_change(tmpdir):
+    path = str(tmpdir.join('devices.json'))
+    emu, ftd = _board()
+    cache = DeviceCache(path)
+    cache.connect(ftd)
+    emu.version = '9.9.9'
+    count = emu.count
+    entry = cache.connect(ftd)
+    assert '9.9.9' == entry['version']
+    assert emu.count - count > 2  # Probed again
+    assert 2 == len(cache)
+    assert 2 == cache.remove('ftDuino')
+    assert 0 == len(DeviceCache(path))
+
+
+def test_calibration(tmpdir):
+    path = str(tmpdir.join('devices.json'))
+    _, ftd = _board(name='left')
+    cache = DeviceCache(path)
+    entry = cache.connect(ftd)
+    cal = Calibration(ftd)
+    cal.set('I1', Linear(scale=2, offset=1, unit='mm'))
+    cache.put(entry['id'], entry['version'], calibration=cal.as_dict())
+    entry = DeviceCache(path).connect(ftd)
+    cal = Calibration.from_dict(entry['calibration'], ftd)
+    assert 21 == cal.convert('I1', 10)
+
+
+def test_no_probe(tmpdir):
+    path = str(tmpdir.join('devices.json'))
+    emu, ftd = _board()
+    entry = DeviceCache(path).connect(ftd, probe=False)
+    assert 2 == emu.count
+    assert 'rtt' not in entry
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize('content', ['[]', '"devices"', '{"format": 1, "devices": []}'])
+def test_corrupt(tmpdir, content):
+    path = tmpdir.join('devices.json')
+    path.write(content)
+    cache = DeviceCache(str(path))
+    assert 0 == len(cache)
+    cache.put('ftDuino', '1.0', rtt=0.001)
+    assert 1 == len(DeviceCache(str(path)))
+
+
+def test_invalid(tmpdir):
+    path = tmpdir.join('devices.json')
+    path.write('no json')
+    cache = DeviceCache(str(path))
+    assert 0 == len(cache)
+    with pytest.raises(ValueError):
+        cache.put('', '1.0')
+    emu, ftd = _board(name='')
+    with pytest.raises(IOError):
+        cache.connect(ftd)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the calibration.
+"""
+from array import array
+import pytest
+import ftdu
+from ftdu import calibration
+from ftdu.calibration import Calibration, Linear, Table, conversion_from_dict
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        yield emu, ftd
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(calibration, '_numpy', lambda: None)
+    return request.param
+
+
+def test_input_get_mode(emu_ftd):
+    emu, ftd = emu_ftd
+    assert ftd.input_get_mode('I1') is None
+    ftd.input_set_mode('i1', 'Voltage')
+    assert 'voltage' == ftd.input_get_mode('I1')
+    assert 'voltage' == emu.input_modes['I1']
+
+
+def test_mode_conversions(emu_ftd):
+    emu, ftd = emu_ftd
+    ftd.input_set_mode('I1', ftdu.INPUT_MODE_VOLTAGE)
+    ftd.input_set_mode('I2', ftdu.INPUT_MODE_RESISTANCE)
+    cal = Calibration(ftd)
+    assert 'V' == cal.unit('I1')
+    assert 'Ohm' == cal.unit('I2')
+    assert cal.unit('I3') is None
+    assert 1.5 == cal.convert('I1', 1500)
+    assert 1500 == cal.convert('I2', 1500)
+    assert 1 == cal.convert('I3', 1)
+    assert 7 == cal.convert('C1', 7)
+    emu.inputs['I1'] = 2500
+    emu.inputs['I2'] = 470
+    assert [2.5, 470] == cal.convert_values(('I1', 'I2'), ftd.read_inputs(ports=('I1', 'I2')))
+
+
+def test_port_conversion_overrides_mode(emu_ftd):
+    emu, ftd = emu_ftd
+    ftd.input_set_mode('I1', ftdu.INPUT_MODE_VOLTAGE)
+    cal = Calibration(ftd)
+    cal.set('i1', Linear(2, 1, unit='cm'))
+    assert 'cm' == cal.unit('I1')
+    assert 21 == cal.convert('I1', 10)
+    cal.set('I1', None)
+    assert 'V' == cal.unit('I1')
+
+
+def test_table():
+    table = Table([(100, 10), (0, 0), (200, 0)])
+    assert 0 == table(-5)
+    assert 5 == table(50)
+    assert 10 == table(100)
+    assert 5 == table(150)
+    assert 0 == table(1000)
+
+
+@pytest.mark.parametrize('points', [[], [(1, 1), (1, 2)]])
+def test_table_invalid(points):
+    with pytest.raises(ValueError):
+        Table(points)
+
+
+def test_batch(backend):
+    values = array('i', [0, 50, 100, 150, 250])
+    assert [0, 5, 10, 5, 0] == list(Table([(0, 0), (100, 10), (200, 0)]).batch(values))
+    assert [1, 101, 201, 301, 501] == list(Linear(2, 1).batch(memoryview(values)))
+
+
+def test_convert_columns(backend):
+    rec_columns = {'timestamp': array('d', [1.0, 2.0]), 'I1': array('i', [1000, 2000]), 'C1': array('i', [3, 4])}
+    cal = Calibration(conversions={'I1': Linear(0.001, unit='V')})
+    res = cal.convert_columns(rec_columns)
+    assert rec_columns['timestamp'] is res['timestamp']
+    assert [1.0, 2.0] == list(res['I1'])
+    assert [3, 4] == list(res['C1'])
+
+
+def test_batch_large():
+    np = pytest.importorskip('numpy')
+    values = np.arange(1000000, dtype=np.int32)
+    res = Linear(0.001).batch(values)
+    assert 1000000 == len(res)
+    assert 999.999 == pytest.approx(res[-1])
+
+
+def test_as_dict():
+    cal = Calibration(conversions={'I1': Linear(0.5, 2, 'cm'), 'I2': Table([(0, 1), (10, 2)], '°C')})
+    cal2 = Calibration.from_dict(cal.as_dict())
+    assert cal.as_dict() == cal2.as_dict()
+    assert 7 == cal2.convert('I1', 10)
+    assert 1.5 == cal2.convert('I2', 5)
+    with pytest.raises(ValueError):
+        conversion_from_dict({'type': 'spline'})
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the ftdu command (using the emulator).
+"""
+import pytest
+from ftdu import cli
+from ftdu.metrics import percentile, summary
+from ftdu.recorder import Capture
+
+
+def test_help(capsys):
+    cli.main([])
+    assert 'monitor' in capsys.readouterr().out
+
+
+def test_monitor(capsys):
+    cli.main(['monitor', '--emulate', '--count', '3', '--rate', '1000'])
+    lines = capsys.readouterr().out.splitlines()
+    assert 4 == len(lines)
+    assert ['I1', 'I2', 'I3', 'I4', 'I5', 'I6', 'I7', 'I8', 'C1', 'C2', 'C3', 'C4'] == lines[0].split()
+    assert ['0'] * 12 == lines[1].split()
+
+
+def test_bench(capsys):
+    cli.main(['bench', '--emulate', '--count', '20'])
+    out = capsys.readouterr().out
+    assert 'cmd/s' in out
+    assert 'p99' in out
+
+
+def test_record(tmpdir, capsys):
+    path = str(tmpdir.join('run.cap'))
+    cli.main(['record', path, '--emulate', '--ports', 'I1', 'C1', '--count', '5', '--interval', '0.001'])
+    assert 'Recorded 5 samples' in capsys.readouterr().out
+    cap = Capture(path)
+    try:
+        assert [0] * 5 == list(cap.column('C1'))
+    finally:
+        cap.close()
+
+
+def test_record_requires_limit(tmpdir):
+    with pytest.raises(SystemExit):
+        cli.main(['record', str(tmpdir.join('run.cap')), '--emulate'])
+
+
+@pytest.mark.parametrize('rate', ['0', '-1', 'x'])
+def test_monitor_invalid_rate(rate, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(['monitor', '--emulate', '--rate', rate, '--count', '1'])
+    assert '--rate' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('args', [['bench', '--emulate', '--count', '0'],
+                                  ['profile', '--emulate', '--count', '0'],
+                                  ['monitor', '--emulate', '--count', '-1'],
+                                  ['record', 'run.cap', '--emulate', '--count', '0'],
+                                  ['record', 'run.cap', '--emulate', '--count', '1', '--interval', '0'],
+                                  ['record', 'run.cap', '--emulate', '--duration', '-1'],
+                                  ['scan', '--workers', '0']])
+def test_invalid_numbers(args, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(args)
+    assert 'greater than zero' in capsys.readouterr().err
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert 50 == percentile(values, 50)
+    assert 99 == percentile(values, 99)
+    assert 100 == percentile(values, 100)
+    assert 1 == percentile(values, 0)
+    assert 0 == percentile([], 50)
+
+
+def test_summary():
+    res = summary([3, 1, 2])
+    assert 3 == res['count']
+    assert 2 == res['mean']
+    assert 2 == res['p50']
+    assert 3 == res['max']
+    assert 0 == summary([])['p99']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the streaming export.
+"""
+import io
+import threading
+import pytest
+from ftdu.export import StreamExporter, CsvWriter, ChunkWriter
+from ftdu.recorder import Capture
+
+
+class _SlowWriter:
+    def __init__(self):
+        self.rows = []
+        self.event = threading.Event()
+        self.closed = False
+
+    def write_rows(self, rows):
+        self.event.wait()
+        self.rows.extend(rows)
+
+    def close(self):
+        self.closed = True
+
+
+class _FailingWriter:
+    def write_rows(self, rows):
+        raise IOError('disk full')
+
+    def close(self):
+        pass
+
+
+def test_csv(tmpdir):
+    path = str(tmpdir.join('test.csv'))
+    with StreamExporter(CsvWriter(path, ('I1', 'I2')), batch_size=3) as exporter:
+        for i in range(10):
+            assert exporter.put(float(i), (i, i * 2))
+    stats = exporter.stats
+    assert 10 == stats.enqueued == stats.written
+    assert 0 == stats.dropped
+    assert stats.batches >= 4
+    with io.open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert 'timestamp,I1,I2' == lines[0]
+    assert '9.0,9,18' == lines[-1]
+    assert 11 == len(lines)
+
+
+def test_chunks(tmpdir):
+    path = str(tmpdir.join('test.cap'))
+    with StreamExporter(ChunkWriter(path, ('I1',), chunk_size=4)) as exporter:
+        for i in range(10):
+            exporter.put(float(i), [i])
+    with Capture(path) as cap:
+        assert 10 == len(cap)
+        assert ('I1',) == cap.ports
+
+
+def test_drop_if_full():
+    writer = _SlowWriter()
+    exporter = StreamExporter(writer, maxsize=2, batch_size=1)
+    results = [exporter.put(float(i), [i]) for i in range(10)]
+    assert not all(results)
+    stats = exporter.stats
+    assert stats.dropped > 0
+    assert stats.dropped + stats.enqueued == 10
+    assert stats.max_depth <= 2
+    writer.event.set()
+    exporter.close()
+    assert writer.closed
+    assert stats.enqueued == stats.written == len(writer.rows)
+
+
+def test_block_if_full():
+    writer = _SlowWriter()
+    exporter = StreamExporter(writer, maxsize=1, batch_size=1, block=True)
+    timer = threading.Timer(0.05, writer.event.set)
+    timer.start()
+    for i in range(5):
+        assert exporter.put(float(i), [i])
+    exporter.close()
+    assert 5 == len(writer.rows)
+    assert 0 == exporter.stats.dropped
+    assert exporter.stats.blocked > 0
+
+
+def test_writer_error():
+    exporter = StreamExporter(_FailingWriter())
+    exporter.put(0.0, [1])
+    with pytest.raises(IOError):
+        exporter.close()
+
+
+def test_csv_illegal_row(tmpdir):
+    writer = CsvWriter(str(tmpdir.join('test.csv')), ('I1', 'I2'))
+    with pytest.raises(ValueError):
+        writer.write_rows([(0.0, (1,))])
+    writer.close()
+
+
+def test_illegal_args():
+    with pytest.raises(ValueError):
+        StreamExporter(_SlowWriter(), maxsize=0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
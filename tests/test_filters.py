@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the filters.
+"""
+import math
+from array import array
+import pytest
+from ftdu.filters import MovingAverage, Exponential, Median, Kalman, FilterBank
+
+
+def test_moving_average():
+    flt = MovingAverage(3)
+    assert [1, 1.5, 2, 3, 4] == [flt.update(v) for v in (1, 2, 3, 4, 5)]
+    flt.reset()
+    assert 10 == flt.update(10)
+
+
+def test_exponential():
+    flt = Exponential(0.5)
+    assert [4, 2, 1] == [flt.update(v) for v in (4, 0, 0)]
+
+
+def test_median():
+    flt = Median(3)
+    assert [5, 52.5, 5, 6, 6] == [flt.update(v) for v in (5, 100, 5, 6, 6)]
+    assert [1.5] == [Median(4).update(1.5)]
+
+
+def test_median_even_window():
+    flt = Median(2)
+    assert [1, 1.5, 2.5] == [flt.update(v) for v in (1, 2, 3)]
+
+
+def test_kalman():
+    flt = Kalman(process_noise=0.01, measurement_noise=4)
+    assert flt.update(-1) is None
+    values = [flt.update(v) for v in (100, 104, 96, 100, 102, 98)]
+    assert 100 == values[0]
+    assert all(95 < v < 105 for v in values)
+    assert abs(values[-1] - 100) < abs(98 - 100)
+    assert values[-1] == flt.update(-1)
+
+
+def test_kalman_batch():
+    res = Kalman().batch([-1, 10, -1])
+    assert math.isnan(res[0])
+    assert [10, 10] == list(res[1:])
+
+
+@pytest.mark.parametrize('flt', [MovingAverage(4), Exponential(0.3), Median(5), Kalman()])
+def test_batch_equals_update(flt):
+    values = array('i', [3, 7, 1, 9, 4, 4, 8, 2, 6])
+    expected = [flt.update(v) for v in values]
+    flt.reset()
+    res = flt.batch(values)
+    assert isinstance(res, array)
+    assert expected == pytest.approx(list(res))
+
+
+@pytest.mark.parametrize('cls, arg', [(MovingAverage, 0), (Median, 0), (Exponential, 0), (Exponential, 1.5)])
+def test_invalid(cls, arg):
+    with pytest.raises(ValueError):
+        cls(arg)
+
+
+def test_filter_bank():
+    bank = FilterBank({'i2': MovingAverage(2)}, ports=('I1', 'I2'))
+    assert [1, 10] == bank.update([1, 10])
+    assert [2, 15] == bank.update([2, 20])
+    bank.reset()
+    assert [3, 30] == bank.update([3, 30])
+    bank.reset()
+    columns = bank.filter_columns({'timestamp': [1.0, 2.0], 'I2': [2, 4]})
+    assert [1.0, 2.0] == columns['timestamp']
+    assert [2, 3] == list(columns['I2'])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
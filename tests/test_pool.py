@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the process pool and the shared memory ring (using the emulator).
+"""
+import multiprocessing
+import time
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.pool import FtDuinoPool
+from ftdu.shm import Ring
+from ftdu.transport import LoopbackTransport
+
+
+def _emulated(path):
+    emu = Emulator(path)
+    emu.inputs['I1'] = int(path[-1])
+    return ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle))
+
+
+def _double(values):
+    return [value * 2 for value in values]
+
+
+def test_ring():
+    ring = Ring(32)
+    try:
+        assert ring.put(b'abc')
+        assert ring.put(b'defghijk')
+        assert not ring.put(b'0123456789abcdef')
+        assert b'abc' == ring.get()
+        # Wraps around
+        assert ring.put(b'0123456789')
+        assert b'defghijk' == ring.get()
+        assert b'0123456789' == ring.get()
+        assert ring.get() is None
+        assert 0 == len(ring)
+        with pytest.raises(ValueError):
+            ring.put(b'x' * 32)
+    finally:
+        ring.close()
+
+
+def test_ring_attach():
+    sem = multiprocessing.Semaphore(0)
+    ring = Ring(64, semaphore=sem)
+    other = Ring(name=ring.name, semaphore=sem)
+    try:
+        assert other.get(0.01) is None
+        ring.put(b'')
+        ring.put(b'hello')
+        assert b'' == other.get(1)
+        assert b'hello' == other.get(None)
+        assert 64 == other.capacity
+    finally:
+        other.close()
+        ring.close()
+
+
+def test_pool():
+    with FtDuinoPool(['emu1', 'emu2', 'emu3'], factory=_emulated) as pool:
+        assert 3 == len(pool)
+        for path, ftd in pool.items():
+            assert int(path[-1]) == ftd.i1
+            assert path == ftd.ftduino_id_get()
+            ftd.o1 = True
+            assert [int(path[-1]), 0] == list(ftd.read_inputs(ports=('I1', 'I2')))
+        assert pool['emu2'].comm('unknown') == 'Fail'
+        assert [] == pool.samples()
+
+
+def test_pool_empty_write():
+    with FtDuinoPool(['emu1'], factory=_emulated) as pool:
+        ftd = pool['emu1']
+        assert [] == ftd.comm_batch([])
+        ftd._transport.write(b'')
+        assert 1 == ftd.i1
+
+
+def test_pool_samples():
+    with FtDuinoPool(['emu1', 'emu2'], factory=_emulated, sample_interval=0.001, process=_double) as pool:
+        deadline = time.time() + 5
+        samples = []
+        while len(set(path for path, ts, values in samples)) < 2 and time.time() < deadline:
+            samples.extend(pool.samples())
+            time.sleep(0.01)
+        # Commands are answered while sampling
+        assert 2 == pool['emu2'].i1
+        assert 0 == pool.dropped('emu1')
+    by_path = dict((path, values) for path, ts, values in samples)
+    assert 2.0 == by_path['emu1'][0]
+    assert 4.0 == by_path['emu2'][0]
+    assert len(ftdu.SNAPSHOT_PORTS) == len(by_path['emu1'])
+
+
+def test_pool_sample_limit():
+    with FtDuinoPool(['emu1'], factory=_emulated, sample_interval=0.001) as pool:
+        time.sleep(0.05)
+        assert 1 == len(pool.samples('emu1', limit=1))
+
+
+def test_pool_no_devices():
+    with pytest.raises(ValueError):
+        FtDuinoPool([])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the port objects of FtDuino (using the emulator).
+"""
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    with ftdu.FtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        yield emu, ftd
+
+
+def test_port_maps(emu_ftd):
+    emu, ftd = emu_ftd
+    assert 8 == len(ftd.inputs)
+    assert 8 == len(ftd.outputs)
+    assert 4 == len(ftd.counters)
+    assert 4 == len(ftd.motors)
+    assert ftd.inputs is ftd.inputs
+    assert ftd.inputs[1] is ftd.inputs['I1'] is ftd.inputs['i1']
+    assert ['M1', 'M2', 'M3', 'M4'] == [port.name for port in ftd.motors]
+
+
+@pytest.mark.parametrize('key', [0, 9, 'O1', 'I9', 'I', '', None, 'Ix'])
+def test_port_map_illegal(emu_ftd, key):
+    emu, ftd = emu_ftd
+    with pytest.raises(KeyError):
+        ftd.inputs[key]
+
+
+def test_input(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.inputs['I4'] = 815
+    assert 815 == ftd.inputs[4].value == ftd.i4
+    ftd.inputs[4].mode = ftdu.INPUT_MODE_RESISTANCE
+    assert 'resistance' == emu.input_modes['I4']
+    with pytest.raises(ValueError):
+        ftd.inputs[4].mode = 'illegal'
+
+
+def test_output(emu_ftd):
+    emu, ftd = emu_ftd
+    ftd.outputs[1].value = True
+    ftd.outputs['O2'].set(ftdu.LOW, 10)
+    ftd.outputs[3].set(ftdu.HIGH)
+    assert (ftdu.HIGH, ftdu.MAX) == emu.outputs['O1']
+    assert (ftdu.LOW, 10) == emu.outputs['O2']
+    assert (ftdu.HIGH, ftdu.MAX) == emu.outputs['O3']
+    with pytest.raises(ValueError):
+        ftd.outputs[1].set(3)
+    with pytest.raises(TypeError):
+        ftd.outputs[1].value = 42
+
+
+def test_counter(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.counters['C3'] = 12
+    counter = ftd.counters[3]
+    assert 12 == counter.value == ftd.c3
+    assert counter.clear() is None
+    assert 0 == counter.value
+    assert not counter.state
+    counter.mode = ftdu.COUNTER_EDGE_RISING
+    assert 'rising' == emu.counter_modes['C3']
+
+
+def test_motor(emu_ftd):
+    emu, ftd = emu_ftd
+    motor = ftd.motors['M2']
+    motor.left()
+    assert ('left', ftdu.MAX) == emu.motors['M2']
+    motor.right(pwm=100, steps=5)
+    assert ('right', 100) == emu.motors['M2']
+    assert motor.counter_active
+    motor.brake()
+    assert ('brake', ftdu.MAX) == emu.motors['M2']
+    motor.off()
+    assert ('off', ftdu.OFF) == emu.motors['M2']
+    motor.counter_brake = True
+    assert emu.motor_brakes['M2']
+
+
+def test_attributes(emu_ftd):
+    emu, ftd = emu_ftd
+    ftd.m4_left(pwm=ftdu.MAX / 2, steps=47)
+    assert ('left', 256) == emu.motors['M4']
+    assert 47 == emu.motor_counters['M4']
+    ftd.m4_off()
+    assert not ftd.m4_counter_active
+    assert ftd.c1_clear() is None
+    ftd.o8 = ftdu.HIGH, 1
+    assert (ftdu.HIGH, 1) == emu.outputs['O8']
+
+
+def test_docs():
+    assert 'I1' in ftdu.FtDuino.i1.__doc__
+    assert 'M3' in ftdu.FtDuino.m3_brake.__doc__
+    assert 'm3_brake' == ftdu.FtDuino.m3_brake.__name__
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the profiler (using the emulator).
+"""
+import json
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.profiler import Profiler
+from ftdu.cli import main
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    emu.inputs['I1'] = 7
+    with ftdu.FtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        yield emu, ftd
+
+
+def test_stages(emu_ftd):
+    emu, ftd = emu_ftd
+    assert not ftd.features
+    with Profiler(ftd) as profiler:
+        assert '7' == ftd.comm('input_get I1')
+        assert 7 == ftd.i1
+        assert ['7', '0'] == ftd.comm_batch(['input_get I1', 'counter_get C1'])
+        assert 7 == ftd.snapshot()[0]
+        assert [7, 0, 0] == list(ftd.read_inputs(ports=('I1', 'I2', 'I3')))
+        ftd.write_outputs([ftdu.HIGH] * 8)
+    stats = profiler.stats()
+    assert 2 == stats['input_get']['count']
+    assert ['decode', 'encode', 'wait', 'write'] == sorted(stats['input_get']['stages'])
+    assert ['decode', 'encode', 'wait', 'write'] == sorted(stats['input_get[2]']['stages'])
+    assert ['parse', 'wait', 'write'] == sorted(stats['input_get[12]']['stages'])
+    assert ['wait', 'write'] == sorted(stats['output_set[8]']['stages'])
+    assert ['parse', 'wait', 'write'] == sorted(stats['input_get[3]']['stages'])
+    assert 6 == len(profiler.events)
+    assert (1, 512) == emu.outputs['O8']
+
+
+def test_detach(emu_ftd):
+    _, ftd = emu_ftd
+    profiler = Profiler(ftd)
+    with pytest.raises(ValueError):
+        profiler.attach(ftd)
+    profiler.detach()
+    assert 'comm' not in ftd.__dict__
+    assert isinstance(ftd._transport, LoopbackTransport)
+    ftd.comm('input_get I1')
+    assert not profiler.events
+    profiler.detach()
+
+
+def test_reports(emu_ftd, tmpdir):
+    _, ftd = emu_ftd
+    with Profiler(ftd) as profiler:
+        for _ in range(10):
+            ftd.comm('led_set 1')
+    assert profiler.report().startswith('led_set ')
+    lines = profiler.folded().splitlines()
+    assert ['led_set;encode', 'led_set;write', 'led_set;wait', 'led_set;decode'] == [l.split()[0] for l in lines]
+    path = str(tmpdir.join('trace.json'))
+    profiler.chrome_trace(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+    assert 50 == len(events)
+    assert 'led_set' == events[0]['name']
+    assert ['encode', 'write', 'wait', 'decode'] == [e['name'] for e in events[1:5]]
+    profiler.clear()
+    assert {} == profiler.stats()
+
+
+def test_cli(capsys, tmpdir):
+    trace = str(tmpdir.join('trace.json'))
+    main(['profile', '--emulate', '--count', '5', '--trace', trace])
+    out = capsys.readouterr().out
+    assert 'input_get[12]' in out
+    assert 'wait' in out
+    with open(trace) as f:
+        assert json.load(f)['traceEvents']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
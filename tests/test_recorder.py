@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the recorder.
+"""
+import mmap
+import types
+import pytest
+from ftdu import recorder
+from ftdu.recorder import Recorder, Capture
+
+
+class _FakeFtDuino:
+    def __init__(self):
+        self.n = 0
+
+    def input_get(self, port):
+        self.n += 1
+        return self.n
+
+    def counter_get(self, port):
+        return 42
+
+
+def test_sample():
+    rec = Recorder(_FakeFtDuino(), ports=('I1', 'c1'), chunk_size=2)
+    assert ('I1', 'C1') == rec.ports
+    assert [1, 42] == rec.sample()
+    assert [2, 42] == rec.sample()
+    assert [3, 42] == rec.sample()
+    assert 3 == len(rec)
+    columns = rec.columns()
+    assert [1, 2, 3] == list(columns['I1'])
+    assert [42, 42, 42] == list(columns['C1'])
+    assert 3 == len(columns['timestamp'])
+
+
+def test_illegal_port():
+    with pytest.raises(ValueError):
+        Recorder(_FakeFtDuino(), ports=('O1',))
+
+
+def test_append_illegal():
+    rec = Recorder(ports=('I1', 'I2'))
+    with pytest.raises(ValueError):
+        rec.append(0.0, [1])
+    with pytest.raises(ValueError):
+        rec.sample()
+
+
+def test_capture_roundtrip(tmpdir):
+    path = str(tmpdir.join('test.cap'))
+    with Recorder(ports=('I1', 'I2'), chunk_size=3, path=path) as rec:
+        for i in range(7):
+            rec.append(float(i), [i, -i])
+        # Only the current chunk is kept in memory
+        assert 1 == len(rec.columns()['I1'])
+        assert 7 == len(rec)
+    with Capture(path) as cap:
+        assert ('I1', 'I2') == cap.ports
+        assert 7 == len(cap)
+        chunks = list(cap.chunks())
+        assert [3, 3, 1] == [len(chunk) for chunk in chunks]
+        assert [0, 1, 2] == chunks[0]['I1'].tolist()
+        assert [-3, -4, -5] == chunks[1]['I2'].tolist()
+        assert [6.0] == chunks[2].timestamps.tolist()
+        assert [-6] == chunks[2]['I2'].tolist()
+        with pytest.raises(KeyError):
+            chunks[0]['I3']
+        for chunk in chunks:
+            chunk.timestamps.release()
+            chunk['I1'].release()
+            chunk['I2'].release()
+
+
+def test_capture_numpy(tmpdir):
+    np = pytest.importorskip('numpy')
+    path = str(tmpdir.join('test.cap'))
+    with Recorder(ports=('I1',), chunk_size=4, path=path) as rec:
+        for i in range(10):
+            rec.append(i / 10.0, [i * 2])
+    cap = Capture(path)
+    assert list(range(0, 20, 2)) == cap.column('I1').tolist()
+    assert np.allclose(np.arange(10) / 10.0, cap.column('timestamp'))
+    chunk = next(cap.chunks(numpy=True))
+    assert not chunk['I1'].flags.writeable
+    del chunk
+
+
+def test_capture_alignment(tmpdir):
+    path = str(tmpdir.join('test.cap'))
+    with Recorder(ports=('I1',), chunk_size=3, path=path) as rec:
+        for i in range(4):
+            rec.append(float(i), [i])
+        rec.flush()  # Partial chunk
+        for i in range(4, 8):
+            rec.append(float(i), [i])
+    with Capture(path) as cap:
+        chunks = list(cap.chunks())
+        assert [3, 1, 3, 1] == [len(chunk) for chunk in chunks]
+        assert list(range(8)) == [value for chunk in chunks for value in chunk['I1'].tolist()]
+        for offset, _ in cap._offsets:
+            assert 0 == offset % 8
+        for chunk in chunks:
+            chunk.timestamps.release()
+            chunk['I1'].release()
+
+
+def test_capture_truncated(tmpdir):
+    path = str(tmpdir.join('test.cap'))
+    rec = Recorder(ports=('I1',), chunk_size=2, path=path)
+    for i in range(5):
+        rec.append(float(i), [i])
+    rec._file.flush()  # Simulate a crash: The last chunk is not written
+    with Capture(path) as cap:
+        assert 4 == len(cap)
+    rec.close()
+
+
+def test_not_a_capture(tmpdir):
+    path = tmpdir.join('test.cap')
+    path.write_binary(b'')
+    with pytest.raises(ValueError):
+        Capture(str(path))
+    path.write_binary(b'x' * 100)
+    with pytest.raises(ValueError):
+        Capture(str(path))
+
+
+def test_not_a_capture_closed(tmpdir, monkeypatch):
+    maps = []
+
+    def tracking_mmap(*args, **kw):
+        maps.append(mmap.mmap(*args, **kw))
+        return maps[-1]
+
+    monkeypatch.setattr(recorder, 'mmap', types.SimpleNamespace(mmap=tracking_mmap, ACCESS_READ=mmap.ACCESS_READ))
+    path = tmpdir.join('test.cap')
+    path.write_binary(b'FTDUREC1' + b'x' * 100)
+    with pytest.raises(ValueError):
+        Capture(str(path))
+    assert 1 == len(maps)
+    assert maps[0].closed
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
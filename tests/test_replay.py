@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the replay.
+"""
+import time
+import pytest
+import ftdu
+from ftdu.replay import ReplayFtDuino, dump_trace
+from ftdu.recorder import Recorder
+
+
+_TRACE = [
+    (0.0, 'input_get I1', '1'),
+    (0.1, 'output_set O1 1 512', None),
+    (0.2, 'input_get I1', '0'),
+    (0.3, 'counter_get_state C1', '1'),
+]
+
+
+def test_trace():
+    with ReplayFtDuino(trace=_TRACE) as ftd:
+        assert 1 == ftd.i1
+        ftd.o1 = True
+        assert 0 == ftd.i1
+        assert ftd.c1_state
+        with pytest.raises(EOFError):
+            ftd.i1
+
+
+def test_trace_strict():
+    ftd = ReplayFtDuino(trace=_TRACE)
+    with pytest.raises(ValueError):
+        ftd.i2
+
+
+def test_trace_not_strict():
+    ftd = ReplayFtDuino(trace=_TRACE, strict=False)
+    assert ftd.c1_state
+    with pytest.raises(EOFError):
+        ftd.i2
+
+
+def test_trace_file(tmpdir):
+    path = str(tmpdir.join('trace.jsonl'))
+    dump_trace(_TRACE, path)
+    ftd = ReplayFtDuino.from_trace_file(path)
+    assert 1 == ftd.input_get('I1')
+    assert ftd.comm('output_set O1 1 512') is None
+
+
+def test_trace_speed():
+    ftd = ReplayFtDuino(trace=_TRACE, speed=10)
+    start = time.time()
+    ftd.i1
+    ftd.o1 = True
+    ftd.i1
+    ftd.c1_state
+    # 0.3 recorded seconds / 10
+    assert time.time() - start >= 0.02
+
+
+def test_samples():
+    samples = [(0.0, 'I1', 1), (0.0, 'c1', 10), (1.0, 'I1', 2), (2.0, 'I1', 3)]
+    with ReplayFtDuino(samples=samples) as ftd:
+        assert 1 == ftd.i1
+        assert 2 == ftd.i1
+        assert 10 == ftd.c1
+        ftd.o1 = True
+        ftd.led = False
+        assert 3 == ftd.i1
+        with pytest.raises(EOFError):
+            ftd.i1
+        with pytest.raises(ValueError):
+            ftd.i2
+
+
+def test_samples_speed():
+    samples = [(100.0, 'I1', 1), (100.05, 'I1', 2), (100.1, 'I1', 3)]
+    ftd = ReplayFtDuino(samples=samples, speed=1)
+    assert 1 == ftd.i1
+    time.sleep(0.12)
+    with pytest.raises(EOFError):
+        ftd.i1
+
+
+def test_capture(tmpdir):
+    path = str(tmpdir.join('test.cap'))
+    with Recorder(ports=('I1', 'I2'), chunk_size=2, path=path) as rec:
+        for i in range(5):
+            rec.append(float(i), [i, i * 10])
+    ftd = ReplayFtDuino.from_capture(path)
+    assert [0, 1, 2, 3, 4] == [ftd.i1 for _ in range(5)]
+    assert 0 == ftd.i2
+
+
+def test_illegal_args():
+    with pytest.raises(ValueError):
+        ReplayFtDuino()
+    with pytest.raises(ValueError):
+        ReplayFtDuino(trace=_TRACE, samples=[])
+    with pytest.raises(ValueError):
+        ReplayFtDuino(trace=_TRACE, speed=0)
+
+
+def test_is_ftduino():
+    assert isinstance(ReplayFtDuino(trace=_TRACE), ftdu.BaseFtDuino)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the reply parser.
+"""
+import socket
+from array import array
+import pytest
+from ftdu.reply import ReplyBuffer
+from ftdu.transport import Transport, FdTransport
+
+
+class _LineTransport(Transport):
+    """\
+    Provides the lines via readline, uses the default readinto implementation.
+    """
+    def __init__(self, lines):
+        super(_LineTransport, self).__init__()
+        self._lines = list(lines)
+
+    def readline(self):
+        return self._lines.pop(0) if self._lines else b''
+
+
+def test_several_replies():
+    rx = ReplyBuffer()
+    rx.read(_LineTransport([b'1\r\n', b'-22\r\n', b'333\r\n']), 3)
+    out = array('i', [0] * 4)
+    assert out is rx.ints(out, 3)
+    assert [1, -22, 333, 0] == list(out)
+    assert [b'1\r\n', b'-22\r\n', b'333\r\n'] == rx.lines()
+
+
+def test_default_readinto_flush():
+    transport = _LineTransport([b'12345\r\n', b'6\r\n'])
+    buf = bytearray(3)
+    assert 3 == transport.readinto(buf)
+    assert b'123' == bytes(buf)
+    transport.flush()  # Discards the remainder of the first line
+    assert 3 == transport.readinto(buf)
+    assert b'6\r\n' == bytes(buf)
+
+
+def test_grow():
+    rx = ReplyBuffer(capacity=4)
+    lines = [('{0}\r\n'.format(i * 1000)).encode('ascii') for i in range(100)]
+    rx.read(_LineTransport(lines), 100)
+    assert [i * 1000 for i in range(100)] == rx.ints([0] * 100, 100)
+
+
+def test_long_line():
+    rx = ReplyBuffer(capacity=1)
+    rx.read(_LineTransport([b'1' * 200 + b'\r\n']), 1)
+    assert [int('1' * 200)] == rx.ints([0], 1)
+
+
+def test_timeout():
+    rx = ReplyBuffer()
+    with pytest.raises(ValueError):
+        rx.read(_LineTransport([b'1\r\n']), 2)
+
+
+def test_not_an_int():
+    rx = ReplyBuffer()
+    rx.read(_LineTransport([b'1\r\n', b'Fail\r\n']), 2)
+    with pytest.raises(ValueError):
+        rx.ints([0, 0], 2)
+
+
+def test_missing_reply():
+    rx = ReplyBuffer()
+    rx.read(_LineTransport([b'1\r\n', b'\r\n']), 2)
+    with pytest.raises(ValueError):
+        rx.ints([0, 0], 2)
+
+
+def test_fd_transport():
+    a, b = socket.socketpair()
+    transport = FdTransport(a.detach(), timeout=0.5)
+    b.sendall(b'1\r\n2\r\n3\r\n')
+    rx = ReplyBuffer()
+    rx.read(transport, 3)
+    assert [1, 2, 3] == rx.ints([0, 0, 0], 3)
+    transport.close()
+    b.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the rule engine (using the emulator).
+"""
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.rules import Engine, RuleSet, rising, falling, above, below
+
+
+def _board():
+    emu = Emulator()
+    return emu, ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle))
+
+
+def _traffic_light():
+    return RuleSet('traffic light', initial={'O1': True}) \
+        .when(rising('I1'), {'O1': False, 'O2': True}, duration=10)
+
+
+def test_traffic_light():
+    emu, ftd = _board()
+    engine = Engine()
+    engine.add(ftd, _traffic_light())
+    engine.tick(now=0)
+    assert (1, 512) == emu.outputs['O1']
+    assert (0, 0) == emu.outputs['O2']
+    engine.tick(now=1)
+    assert (0, 0) == emu.outputs['O2']
+    emu.inputs['I1'] = 1
+    engine.tick(now=2)
+    assert (0, 0) == emu.outputs['O1']
+    assert (1, 512) == emu.outputs['O2']
+    emu.inputs['I1'] = 0
+    engine.tick(now=5)
+    emu.inputs['I1'] = 1
+    engine.tick(now=6)  # Hold is active, no retrigger
+    engine.tick(now=11.9)
+    assert (1, 512) == emu.outputs['O2']
+    engine.tick(now=12)
+    assert (1, 512) == emu.outputs['O1']
+    assert (0, 0) == emu.outputs['O2']
+
+
+def test_retrigger_expires():
+    emu, ftd = _board()
+    engine = Engine()
+    engine.add(ftd, RuleSet().when(rising('I1'), {'O1': True}, duration=10, retrigger=True))
+    engine.tick(now=0)
+    for now, value in ((1, 1), (2, 0), (5, 1), (6, 0)):
+        emu.inputs['I1'] = value
+        engine.tick(now=now)
+    assert (1, 512) == emu.outputs['O1']
+    engine.tick(now=11)  # Deadline of the first firing was moved
+    assert (1, 512) == emu.outputs['O1']
+    engine.tick(now=15)
+    assert (0, 0) == emu.outputs['O1']
+    engine.tick(now=30)
+    assert (0, 0) == emu.outputs['O1']
+    assert not engine._timers
+
+
+def test_no_fire_on_initial_state():
+    emu, ftd = _board()
+    emu.inputs['I1'] = 1
+    engine = Engine()
+    engine.add(ftd, RuleSet().when(rising('I1'), {'O1': True}))
+    engine.tick(now=0)
+    assert (0, 0) == emu.outputs['O1']
+    emu.inputs['I1'] = 0
+    engine.tick(now=1)
+    emu.inputs['I1'] = 1
+    engine.tick(now=2)
+    assert (1, 512) == emu.outputs['O1']
+
+
+def test_coalesced_writes():
+    emu, ftd = _board()
+    engine = Engine()
+    rules = RuleSet(initial={'O1': False}) \
+        .when(rising('I1'), {'O1': True, 'M1': ftdu.MOTOR_LEFT}) \
+        .when(rising('I1'), {'O1': True, 'LED': True})
+    engine.add(ftd, rules)
+    engine.tick(now=0)
+    assert 1 == engine.writes
+    emu.inputs['I1'] = 1
+    engine.tick(now=1)
+    assert 4 == engine.writes  # O1 once, M1, LED
+    assert ('left', 512) == emu.motors['M1']
+    assert emu.led
+    engine.tick(now=2)
+    assert 4 == engine.writes
+
+
+def test_incremental_evaluation():
+    emu, ftd = _board()
+    calls = []
+    engine = Engine()
+    engine.add(ftd, RuleSet().when(above('I2', 100), call=calls.append))
+    engine.tick(now=0)
+    emu.inputs['I1'] = 1  # Not observed by any rule
+    engine.tick(now=1)
+    assert not calls
+    emu.inputs['I2'] = 200
+    engine.tick(now=2)
+    assert 1 == len(calls)
+
+
+def test_state_machine():
+    emu, ftd = _board()
+    engine = Engine()
+    machine = RuleSet(state='idle') \
+        .when(rising('I1'), {'M1': (ftdu.MOTOR_RIGHT, 300)}, state='idle', goto='running') \
+        .when(rising('I2') | below('I3', 10), {'M1': ftdu.MOTOR_BRAKE}, state='running', goto='idle')
+    emu.inputs['I3'] = 100
+    engine.add(ftd, machine)
+    engine.tick(now=0)
+    emu.inputs['I2'] = 1
+    engine.tick(now=1)  # Wrong state
+    assert ('off', 0) == emu.motors['M1']
+    emu.inputs['I1'] = 1
+    emu.inputs['I2'] = 0
+    engine.tick(now=2)
+    assert 'running' == machine.state
+    assert ('right', 300) == emu.motors['M1']
+    emu.inputs['I3'] = 5
+    engine.tick(now=3)
+    assert 'idle' == machine.state
+    assert ('brake', 512) == emu.motors['M1']
+
+
+def test_then_and_then_goto():
+    emu, ftd = _board()
+    engine = Engine()
+    rules = RuleSet(state='a').when(falling('I1') & rising('I2'), {'O1': True}, duration=1,
+                                     then={'O1': ftdu.LOW}, goto='b', then_goto='c')
+    emu.inputs['I1'] = 1
+    engine.add(ftd, rules)
+    engine.tick(now=0)
+    emu.inputs['I1'] = 0
+    emu.inputs['I2'] = 1
+    engine.tick(now=1)
+    assert 'b' == rules.state
+    engine.tick(now=2)
+    assert 'c' == rules.state
+    assert (2, 0) == emu.outputs['O1']
+
+
+def test_many_boards():
+    boards = [_board() for _ in range(3)]
+    engine = Engine()
+    for _, ftd in boards:
+        engine.add(ftd, _traffic_light(), RuleSet().when(rising('C1'), {'O8': True}))
+    engine.tick(now=0)
+    boards[1][0].inputs['I1'] = 1
+    boards[2][0].counters['C1'] = 3
+    engine.tick(now=1)
+    assert (0, 0) == boards[0][0].outputs['O2']
+    assert (1, 512) == boards[1][0].outputs['O2']
+    assert (0, 0) == boards[1][0].outputs['O8']
+    assert (1, 512) == boards[2][0].outputs['O8']
+
+
+def test_multi_get():
+    emu = Emulator(features=(ftdu.FEATURE_MULTI_GET,))
+    ftd = ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle))
+    engine = Engine()
+    engine.add(ftd, RuleSet().when(rising('I1') & above('C1', 2), {'O1': True}))
+    engine.tick(now=0)
+    count = emu.count
+    emu.inputs['I1'] = 1
+    emu.counters['C1'] = 3
+    engine.tick(now=1)
+    assert emu.count == count + 2  # multi_get, output_set
+    assert (1, 512) == emu.outputs['O1']
+
+
+def test_invalid():
+    _, ftd = _board()
+    engine = Engine()
+    with pytest.raises(ValueError):
+        engine.add(ftd, RuleSet().when(rising('I1'), {'X1': True}))
+    with pytest.raises(ValueError):
+        engine.add(ftd, RuleSet().when(rising('I1'), {'M1': 'up'}))
+    with pytest.raises(ValueError):
+        engine.add(ftd, RuleSet().when(rising('O1'), {'O2': True}))
+    rules = RuleSet()
+    engine.add(ftd, rules)
+    with pytest.raises(ValueError):
+        engine.add(ftd, rules)
+
+
+def test_run():
+    emu, ftd = _board()
+    engine = Engine(interval=0.001)
+    engine.add(ftd, _traffic_light())
+    engine.run(0.02)
+    assert engine.ticks > 1
+    assert (1, 512) == emu.outputs['O1']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
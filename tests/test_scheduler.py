@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the command scheduler (using the emulator).
+"""
+import threading
+import time
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.scheduler import Scheduler, CONTROL, BULK, lane_of
+from ftdu.transport import LoopbackTransport
+
+
+def _slow_handler(emu, delay=0.0005):
+    def handle(request):
+        time.sleep(delay)
+        return emu.handle(request)
+    return handle
+
+
+@pytest.fixture
+def emu_scheduler():
+    emu = Emulator()
+    with Scheduler(ftdu.BaseFtDuino(transport=LoopbackTransport(_slow_handler(emu))), max_batch=4) as scheduler:
+        yield emu, scheduler
+
+
+@pytest.mark.parametrize('cmd, lane', [('motor_set M1 brake 0', CONTROL),
+                                       ('OUTPUT_SET O1 0 0', CONTROL),
+                                       (b'led_set 1', CONTROL),
+                                       ('input_get I1', BULK),
+                                       ('', BULK)])
+def test_lane_of(cmd, lane):
+    assert lane == lane_of(cmd)
+
+
+def test_comm(emu_scheduler):
+    emu, scheduler = emu_scheduler
+    emu.inputs['I1'] = 12
+    assert '12' == scheduler.comm('input_get I1')
+    assert 'Ok' == scheduler.comm('led_set 1')
+    assert emu.led
+    stats = scheduler.stats()
+    assert 1 == stats[CONTROL]['count']
+    assert 1 == stats[BULK]['count']
+
+
+def test_device(emu_scheduler):
+    emu, scheduler = emu_scheduler
+    emu.inputs['I2'] = 5
+    ftd = scheduler.device()
+    assert 5 == ftd.i2
+    ftd.m1_brake()
+    assert ('brake', ftdu.MAX) == emu.motors['M1']
+    assert [0, 5] == list(ftd.read_inputs(ports=('I1', 'I2')))
+    assert ['Ok', '5'] == ftd.comm_batch(['led_set 1', 'input_get I2'])
+
+
+def test_control_overtakes_bulk(emu_scheduler):
+    emu, scheduler = emu_scheduler
+    order = []
+    bulk = [scheduler.submit('input_get I1') for _ in range(200)]
+    for fut in bulk:
+        fut.add_done_callback(lambda f: order.append(BULK))
+    control = scheduler.submit('motor_set M1 brake 0')
+    control.add_done_callback(lambda f: order.append(CONTROL))
+    assert 'Ok' == control.result(5)
+    for fut in bulk:
+        fut.result(5)
+    # Max. one batch of reads was in flight
+    assert order.index(CONTROL) <= 2 * scheduler.max_batch
+    stats = scheduler.stats()
+    assert stats[CONTROL]['max'] < stats[BULK]['max']
+
+
+def test_many_threads(emu_scheduler):
+    emu, scheduler = emu_scheduler
+    emu.inputs['I3'] = 3
+    errors = []
+
+    def reader():
+        ftd = scheduler.device()
+        try:
+            for _ in range(20):
+                assert 3 == ftd.i3
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert 80 == scheduler.stats()[BULK]['count']
+
+
+def test_error():
+    ftd = ftdu.BaseFtDuino(transport=LoopbackTransport(Emulator().handle))
+    scheduler = Scheduler(ftd)
+    ftd._transport.write = None  # Not callable
+    with pytest.raises(TypeError):
+        scheduler.comm('input_get I1', timeout=5)
+    scheduler.close()
+    with pytest.raises(ValueError):
+        scheduler.submit('input_get I1')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
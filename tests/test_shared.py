@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the shared memory publication (using the emulator).
+"""
+import multiprocessing
+import os
+import threading
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.shared import SharedFtDuinoOwner, SharedFtDuinoView
+from ftdu.transport import LoopbackTransport
+
+
+@pytest.fixture
+def name():
+    return 'ftdu-test-{0}'.format(os.getpid())
+
+
+def _read_latest(name, queue):
+    with SharedFtDuinoView(name) as view:
+        queue.put((view.ports, view.latest()[1]))
+
+
+def test_owner_view(name):
+    emu = Emulator()
+    emu.inputs['I1'] = 5
+    emu.counters['C2'] = 9
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd, \
+            SharedFtDuinoOwner(ftd, name, ports=('i1', 'C2'), history=4) as owner:
+        with SharedFtDuinoView(name) as view:
+            assert ('I1', 'C2') == view.ports
+            assert view.latest() is None
+            assert view.value('I1') is None
+            owner.sample()
+            assert 1 == view.count
+            assert (5, 9) == view.latest()[1]
+            assert 9 == view.value('c2')
+            with pytest.raises(KeyError):
+                view.value('I2')
+
+
+def test_history(name):
+    with SharedFtDuinoOwner(None, name, ports=('I1',), history=3) as owner:
+        with SharedFtDuinoView(name) as view:
+            assert [] == view.history()
+            for i in range(5):
+                owner.publish([i], timestamp=float(i))
+            assert [(2.0, (2,)), (3.0, (3,)), (4.0, (4,))] == view.history()
+            assert [(3.0, (3,)), (4.0, (4,))] == view.history(2)
+            assert [] == view.history(0)
+            assert 5 == view.count
+
+
+def test_other_process(name):
+    with SharedFtDuinoOwner(None, name, ports=('I1', 'I2')) as owner:
+        owner.publish([1, 2])
+        queue = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=_read_latest, args=(name, queue))
+        proc.start()
+        ports, values = queue.get(timeout=10)
+        proc.join()
+        assert ('I1', 'I2') == ports
+        assert (1, 2) == values
+        # The reader did not remove the block
+        owner.publish([3, 4])
+        with SharedFtDuinoView(name) as view:
+            assert (3, 4) == view.latest()[1]
+
+
+def test_consistency(name):
+    ports = ftdu.SNAPSHOT_PORTS
+    with SharedFtDuinoOwner(None, name, history=8) as owner:
+        stop = threading.Event()
+
+        def publish():
+            i = 0
+            while not stop.is_set():
+                owner.publish([i] * len(ports))
+                i += 1
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        try:
+            with SharedFtDuinoView(name) as view:
+                view.wait(0, timeout=5)
+                for _ in range(2000):
+                    for timestamp, values in view.history():
+                        assert len(set(values)) == 1
+        finally:
+            stop.set()
+            thread.join()
+
+
+def test_sampling_thread(name):
+    emu = Emulator()
+    emu.inputs['I3'] = 3
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd, \
+            SharedFtDuinoOwner(ftd, name, interval=0.001):
+        with SharedFtDuinoView(name) as view:
+            assert view.wait(2, timeout=5)
+            assert 3 == view.value('I3')
+            assert len(ftdu.SNAPSHOT_PORTS) == len(view.latest()[1])
+
+
+def test_invalid(name):
+    with pytest.raises(ValueError):
+        SharedFtDuinoOwner(None, name, ports=('O1',))
+    with pytest.raises(ValueError):
+        SharedFtDuinoOwner(None, name, history=0)
+    with pytest.raises(ValueError):
+        SharedFtDuinoOwner(None, name, ports=())
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
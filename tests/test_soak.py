@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the soak test harness.
+"""
+import time
+import pytest
+import ftdu
+from ftdu import cli
+from ftdu.emulator import Emulator
+from ftdu.soak import Soak, FaultyTransport, _OpStats
+
+
+def test_latency():
+    transport = FaultyTransport(Emulator().handle, latency=0.01, timeout=0.1)
+    start = time.perf_counter()
+    transport.write(b'input_get I1\n')
+    assert b'0\r\n' == transport.readline()
+    assert time.perf_counter() - start >= 0.01
+    assert 0 == transport.timeouts
+
+
+def test_late_reply():
+    emu = Emulator()
+    emu.inputs['I1'] = 1
+    transport = FaultyTransport(emu.handle, latency=0.05, timeout=0.01)
+    transport.write(b'input_get I1\n')
+    assert b'' == transport.readline()
+    transport.flush()
+    emu.inputs['I1'] = 2
+    time.sleep(0.05)
+    transport.write(b'input_get I1\n')
+    assert b'1\r\n' == transport.readline()  # The reply of the first request
+    assert 1 == transport.timeouts
+
+
+def test_dropped():
+    transport = FaultyTransport(Emulator().handle, drop_rate=1, timeout=0.001)
+    ftd = ftdu.BaseFtDuino(transport=transport)
+    assert ftd.comm('input_get I1') is None
+    assert 1 == transport.dropped
+    assert 1 == transport.timeouts
+
+
+def test_run():
+    soak = Soak(boards=3, drop_rate=0.01, spike_rate=0.01, spike=0.02, timeout=0.005, sync_interval=4, seed=1)
+    windows = []
+    report = soak.run(0.5, interval=0.1, callback=windows.append)
+    assert 4 <= len(report.windows) <= 5
+    assert windows == report.windows
+    assert report.count > 100
+    assert set(report.operations) == {'read', 'snapshot', 'write', 'move'}
+    assert report.faults['dropped'] > 0
+    assert report.resyncs > 0
+    assert not report.exceptions
+    read = report.operations['read']
+    assert 0 < read['p50'] <= read['p99'] <= read['max']
+    text = report.format()
+    assert '3 boards' in text
+    assert 'p99.9' in text
+
+
+def test_histogram():
+    stats = _OpStats()
+    for i in range(1, 1001):
+        stats.add(i / 1e6, False, False)
+    assert 1000 == stats.count
+    assert 0.00047 < stats.percentile(50) < 0.00053
+    assert 0.00097 < stats.percentile(99) <= 0.001
+    assert 0.001 == stats.percentile(100)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        Soak(boards=1, mix={'jump': 1})
+    with pytest.raises(ValueError):
+        Soak(boards=0)
+    with pytest.raises(ValueError):
+        Soak(boards=1, mix={'read': 0})
+
+
+def test_cli(capsys):
+    cli.main(['soak', '--boards', '2', '--duration', '0.2', '--interval', '0.1', '--mix', 'read=1,write=1',
+              '--multi-get', '--seed', '1'])
+    out = capsys.readouterr()[0]
+    assert '2 boards' in out
+    assert 'snapshot' not in out
+
+
+
+@pytest.mark.parametrize('args', [['--boards', '0'], ['--interval', '0'], ['--mix', 'jump=1'], ['--mix', 'read']])
+def test_cli_invalid(args):
+    with pytest.raises(SystemExit):
+        cli.main(['soak', '--duration', '0.1'] + args)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
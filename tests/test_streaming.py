@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the ultrasonic stream (using the emulator).
+"""
+import time
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.streaming import UltrasonicStream
+from ftdu.transport import LoopbackTransport
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    emu.ultrasonic = 42
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        yield emu, ftd
+
+
+def test_stream(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.inputs['I1'] = 7
+    with UltrasonicStream(ftd, rate=200, ports=('i1', 'C1')) as stream:
+        assert emu.ultrasonic_enabled
+        timestamp, distance, values = stream.wait(1)
+        assert 42 == distance
+        assert (7, 0) == values
+        emu.ultrasonic = 43
+        assert 43 == stream.wait(1)[1]
+        for _ in range(20):  # Concurrent exchanges of this thread
+            assert 7 == ftd.input_get('I1')
+            assert [7, 0] == list(ftd.read_inputs(ports=('I1', 'I2')))
+    assert not emu.ultrasonic_enabled
+    assert stream.latest[1] == 43
+
+
+def test_skip_duplicates(emu_ftd):
+    emu, ftd = emu_ftd
+    with UltrasonicStream(ftd, rate=500) as stream:
+        time.sleep(0.05)
+    assert stream.reads > 1
+    assert stream.duplicates == stream.reads - 1
+    assert 1 == len(stream.history())
+
+
+def test_history(emu_ftd):
+    emu, ftd = emu_ftd
+    with UltrasonicStream(ftd, rate=1000, history=3) as stream:
+        for distance in range(5):
+            emu.ultrasonic = distance
+            while stream.latest is None or stream.latest[1] != distance:
+                stream.wait(1)
+    history = stream.history()
+    assert [2, 3, 4] == [distance for ts, distance, values in history]
+    assert history[-2:] == stream.history(2)
+    assert [] == stream.history(0)
+
+
+def test_keep_duplicates(emu_ftd):
+    emu, ftd = emu_ftd
+    with UltrasonicStream(ftd, rate=500, skip_duplicates=False) as stream:
+        stream.wait(1)
+        stream.wait(1)
+    assert 0 == stream.duplicates
+    assert len(stream.history()) >= 2
+
+
+def test_error(emu_ftd):
+    emu, ftd = emu_ftd
+    stream = UltrasonicStream(ftd, rate=100)
+    stream.start()
+    stream.wait(1)
+    with ftd._lock:
+        ftd.close()  # Loopback answers nothing anymore
+        ftd._transport.write = lambda data: None
+    with pytest.raises(ValueError):
+        stream.wait(1)
+    stream.stop(disable=False)
+
+
+@pytest.mark.parametrize('kwargs', [dict(rate=0), dict(ports=('O1',))])
+def test_invalid(emu_ftd, kwargs):
+    emu, ftd = emu_ftd
+    with pytest.raises(ValueError):
+        UltrasonicStream(ftd, **kwargs)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the verification of the replies with sync commands.
+"""
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.profiler import Profiler
+
+
+class _Faulty:
+    """\
+    Answers via the emulator and drops / duplicates the replies of the
+    provided request numbers.
+    """
+    def __init__(self, emu, drop=(), extra=()):
+        self.emu = emu
+        self.drop = set(drop)
+        self.extra = set(extra)
+        self.n = 0
+
+    def __call__(self, request):
+        self.n += 1
+        reply = self.emu.handle(request)
+        if self.n in self.drop:
+            return None
+        if self.n in self.extra:
+            return '4711\r\n' + reply
+        return reply
+
+
+class _Transport(LoopbackTransport):
+    """\
+    Returns the lines of a reply which consists of several lines one by one.
+    """
+    def readline(self):
+        line = super(_Transport, self).readline()
+        line, sep, rest = line.partition(b'\n')
+        if rest:
+            self._replies.insert(0, rest)
+        return line + sep
+
+
+def _board(interval=4, drop=(), extra=()):
+    emu = Emulator()
+    faulty = _Faulty(emu)
+    ftd = ftdu.BaseFtDuino(transport=_Transport(faulty))
+    ftd.sync_interval = interval
+    faulty.n = 0
+    faulty.drop.update(drop)
+    faulty.extra.update(extra)
+    return emu, faulty, ftd
+
+
+def _cmds(emu):
+    for i in range(10):
+        emu.inputs['I{0}'.format(i % 8 + 1)] = i
+    return ['input_get I{0}'.format(i % 8 + 1) for i in range(10)]
+
+
+def test_aligned():
+    emu, faulty, ftd = _board()
+    cmds = _cmds(emu)
+    assert ['8', '9', '2', '3', '4', '5', '6', '7', '8', '9'] == ftd.comm_batch(cmds)
+    assert 13 == faulty.n  # 3 groups
+    assert 0 == ftd.resyncs
+
+
+@pytest.mark.parametrize('fault', [{'drop': [6]}, {'extra': [6]}, {'drop': [5]}, {'drop': [13]}, {'extra': [1]}])
+def test_recovery(fault):
+    emu, faulty, ftd = _board(**fault)
+    cmds = _cmds(emu)
+    assert ['8', '9', '2', '3', '4', '5', '6', '7', '8', '9'] == ftd.comm_batch(cmds)
+    assert 1 == ftd.resyncs
+
+
+def test_keeps_verified_groups():
+    emu, faulty, ftd = _board(drop=[7])  # Second group
+    ftd.comm_batch(_cmds(emu))
+    assert 13 + 8 == faulty.n  # The first group is not sent again
+
+
+def test_without_sync():
+    emu = Emulator()
+    ftd = ftdu.BaseFtDuino(transport=_Transport(_Faulty(emu, drop=[2])))
+    cmds = _cmds(emu)
+    assert ['8', '2', '3'] == ftd.comm_batch(cmds)[:3]  # Shifted
+
+
+def test_comm():
+    emu, faulty, ftd = _board(interval=1, extra=[1])
+    emu.inputs['I3'] = 42
+    assert 42 == ftd.input_get('I3')
+    assert '42' == ftd.comm('input_get I3')
+    assert 1 == ftd.resyncs
+
+
+def test_read_ints():
+    emu, faulty, ftd = _board(extra=[3])
+    emu.inputs['I2'] = 7
+    emu.counters['C4'] = 9
+    values = ftd.snapshot()
+    assert 7 == values[1]
+    assert 9 == values[-1]
+    assert 1 == ftd.resyncs
+    assert list(values) == list(ftd.snapshot())
+    assert 1 == ftd.resyncs
+
+
+def test_multi_get():
+    emu = Emulator(features=(ftdu.FEATURE_MULTI_GET,))
+    faulty = _Faulty(emu)
+    ftd = ftdu.BaseFtDuino(transport=_Transport(faulty))
+    ftd.sync_interval = 8
+    emu.inputs['I1'] = 3
+    faulty.n = 0
+    faulty.drop.add(1)
+    assert 3 == ftd.snapshot()[0]
+    assert 4 == faulty.n  # multi_get + sync, twice
+    assert ftdu.FEATURE_MULTI_GET in ftd.features
+
+
+def test_give_up():
+    emu, faulty, ftd = _board(drop=range(1, 100))
+    with pytest.raises(ValueError):
+        ftd.comm_batch(_cmds(emu))
+    with pytest.raises(ValueError):
+        ftd.snapshot()
+
+
+def test_profiler():
+    emu, faulty, ftd = _board(extra=[1])
+    with Profiler(ftd) as profiler:
+        ftd.comm_batch(_cmds(emu))
+        ftd.snapshot()
+    stats = profiler.stats()
+    assert 1 == stats['input_get[10]']['count']
+    assert ['parse', 'wait', 'write'] == sorted(stats['input_get[12]']['stages'])
+    assert 1 == ftd.resyncs
+
+
+def test_invalid():
+    emu, _, ftd = _board()
+    with pytest.raises(ValueError):
+        ftd.sync_interval = 0
+    ftd.sync_interval = None
+    assert ftd.sync_interval is None
+    emu.version = ''
+    ftd = ftdu.BaseFtDuino(transport=LoopbackTransport(emu.handle))
+    with pytest.raises(ValueError):
+        ftd.sync_interval = 8
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the timer wheel.
+"""
+import random
+import time
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.timers import TimerWheel
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _wheel():
+    clock = _Clock()
+    return clock, TimerWheel(resolution=1.0, clock=clock)
+
+
+def _board():
+    emu = Emulator()
+    return emu, ftdu.FtDuino(transport=LoopbackTransport(emu.handle))
+
+
+def test_order_and_levels():
+    clock, wheel = _wheel()
+    fired = []
+    delays = [3, 1, 255, 256, 300, 16384, 20000, 2 ** 26 + 5, 2 ** 27]
+    for delay in delays:
+        wheel.schedule(delay, lambda delay=delay: fired.append((delay, clock.now)))
+    assert len(delays) == len(wheel)
+    for t in sorted(delays):
+        clock.now = t - 1
+        wheel.advance()
+        clock.now = t
+        wheel.advance()
+    assert [(d, float(d)) for d in sorted(delays)] == fired
+    assert 0 == len(wheel)
+
+
+def test_random_delays():
+    clock, wheel = _wheel()
+    rnd = random.Random(42)
+    fired = {}
+    expected = {}
+    for i in range(3000):
+        delay = rnd.randint(0, 70000)
+        expected[i] = max(1, delay)
+        wheel.schedule(delay, lambda i=i: fired.__setitem__(i, clock.now))
+    for t in range(1, 70001):
+        clock.now = t
+        wheel.advance()
+    assert expected == dict((i, int(t)) for i, t in fired.items())
+
+
+def test_every_and_cancel():
+    clock, wheel = _wheel()
+    runs = []
+    timer = wheel.schedule(2, lambda: runs.append(clock.now), interval=2)
+    once = wheel.schedule(5, lambda: runs.append('once'))
+    once.cancel()
+    once.cancel()
+    for t in range(1, 8):
+        clock.now = t
+        wheel.advance()
+    assert [2, 4, 6] == runs
+    assert 1 == len(wheel)
+    timer.cancel()
+    clock.now = 20
+    assert 0 == wheel.advance()
+    assert 0 == len(wheel)
+
+
+def test_cancel_after_run():
+    clock, wheel = _wheel()
+    runs = []
+    timer = wheel.schedule(1, lambda: runs.append(1))
+    clock.now = 1
+    assert 1 == wheel.advance()
+    timer.cancel()
+    assert 0 == len(wheel)
+    assert not timer.cancelled
+    wheel.schedule(1, lambda: runs.append(2))
+    assert 1 == len(wheel)
+    clock.now = 2
+    assert 1 == wheel.advance()
+    assert [1, 2] == runs
+
+
+def test_cancel_after_run_thread():
+    emu, ftd = _board()
+    with TimerWheel(resolution=0.005) as wheel:
+        timer = wheel.schedule(0.01, {'O1': True}, ftd=ftd)
+        time.sleep(0.05)
+        timer.cancel()
+        wheel.schedule(0.01, {'O2': True}, ftd=ftd)
+        time.sleep(0.1)
+    assert (1, 512) == emu.outputs['O2']
+
+
+def test_late_advance():
+    clock, wheel = _wheel()
+    runs = []
+    wheel.schedule(1, lambda: runs.append(clock.now), interval=1)
+    clock.now = 10
+    assert 1 == wheel.advance()  # Missed runs are skipped
+    clock.now = 11
+    assert 1 == wheel.advance()
+    assert [10, 11] == runs
+
+
+def test_batched_outputs():
+    emu, ftd = _board()
+    clock, wheel = _wheel()
+    wheel.schedule(1, {'O1': True, 'M1': (ftdu.MOTOR_LEFT, 100)}, ftd=ftd)
+    wheel.schedule(1, {'O1': False, 'LED': True}, ftd=ftd)
+    count = emu.count
+    clock.now = 1
+    assert 2 == wheel.advance()
+    assert 1 == wheel.writes
+    assert 3 == emu.count - count  # O1 once
+    assert (0, 0) == emu.outputs['O1']
+    assert ('left', 100) == emu.motors['M1']
+    assert emu.led
+
+
+def test_errors():
+    clock, wheel = _wheel()
+    runs = []
+    wheel.schedule(1, lambda: 1 / 0)
+    wheel.schedule(1, lambda: runs.append(1))
+    clock.now = 1
+    assert 2 == wheel.advance()
+    assert [1] == runs
+    assert isinstance(wheel.errors[0][1], ZeroDivisionError)
+
+
+def test_invalid():
+    _, ftd = _board()
+    clock, wheel = _wheel()
+    with pytest.raises(ValueError):
+        wheel.schedule(-1, lambda: None)
+    with pytest.raises(ValueError):
+        wheel.schedule(1, lambda: None, interval=0)
+    with pytest.raises(ValueError):
+        wheel.schedule(1, {'O1': True})
+    with pytest.raises(ValueError):
+        wheel.schedule(1, {'I1': True}, ftd=ftd)
+    with pytest.raises(ValueError):
+        wheel.schedule(1, 'O1')
+    with pytest.raises(ValueError):
+        TimerWheel(resolution=0)
+
+
+def test_thread():
+    with TimerWheel(resolution=0.005) as wheel:
+        runs = []
+        wheel.schedule(0.02, lambda: runs.append('once'))
+        timer = wheel.schedule(0.01, lambda: runs.append('every'), interval=0.01)
+        time.sleep(0.2)
+        timer.cancel()
+    assert 'once' in runs
+    assert runs.count('every') > 3
+
+
+def test_ftd_after_every():
+    emu, ftd = _board()
+    ftd.o2 = True
+    ftd.after(0.05, {'O1': True, 'O2': False})
+    ticks = []
+    timer = ftd.every(0.01, lambda: ticks.append(ftd.i1))
+    assert (0, 0) == emu.outputs['O1']
+    for _ in range(20):  # The timers do not block the reads
+        ftd.i1
+    time.sleep(0.2)
+    timer.cancel()
+    assert (1, 512) == emu.outputs['O1']
+    assert (0, 0) == emu.outputs['O2']
+    assert len(ticks) > 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the binary trace recorder.
+"""
+import os
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.trace import TraceWriter, read_trace, format_trace
+from ftdu.replay import ReplayFtDuino, load_trace
+from ftdu.cli import main
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    emu.inputs['I1'] = 7
+    with ftdu.FtDuino(transport=LoopbackTransport(emu.handle)) as ftd:
+        yield emu, ftd
+
+
+def test_record_exchanges(emu_ftd, tmpdir):
+    emu, ftd = emu_ftd
+    path = str(tmpdir.join('session.trace'))
+    assert not ftd.features
+    with TraceWriter(path, size=4096, ftd=ftd) as writer:
+        assert 7 == ftd.i1
+        ftd.o1 = True
+        assert ['7', '0'] == ftd.comm_batch(['input_get I1', 'counter_get C1'])
+        assert 7 == ftd.snapshot()[0]
+        assert 16 == len(writer)
+    assert 4096 == os.path.getsize(path)
+    records = read_trace(path)
+    assert ['input_get I1', 'output_set O1 1 512', 'input_get I1', 'counter_get C1'] \
+        == [request for _, request, _, _ in records[:4]]
+    assert ['7', 'Ok', '7', '0'] == [reply for _, _, reply, _ in records[:4]]
+    assert 'counter_get C4' == records[-1][1]
+    assert all(duration >= 0 for _, _, _, duration in records)
+    lines = list(format_trace(records))
+    assert lines[0].endswith('input_get I1 -> 7')
+    # Trace is detached
+    ftd.i1
+    assert 16 == len(read_trace(path))
+
+
+def test_detach_keeps_later_wrappers(emu_ftd, tmpdir):
+    from ftdu.profiler import Profiler
+    emu, ftd = emu_ftd
+    writer = TraceWriter(str(tmpdir.join('session.trace')), size=4096, ftd=ftd)
+    with Profiler(ftd) as profiler:
+        wrapper = ftd._transport
+        writer.detach()
+        assert ftd._transport is wrapper
+        assert isinstance(wrapper.transport, LoopbackTransport)
+        ftd.comm('led_set 1')
+        assert 1 == len(profiler.events)
+        assert 0 == len(writer)
+    writer.close()
+    assert isinstance(ftd._transport, LoopbackTransport)
+
+
+def test_replay(emu_ftd, tmpdir):
+    _, ftd = emu_ftd
+    path = str(tmpdir.join('session.trace'))
+    with TraceWriter(path, ftd=ftd):
+        ftd.i1
+        ftd.o2 = True
+        ftd.counters['C1'].value
+    with ReplayFtDuino.from_binary_trace(path) as replay:
+        assert 7 == replay.i1
+        replay.o2 = True
+        assert 0 == replay.counters['C1'].value
+        with pytest.raises(EOFError):
+            replay.i1
+
+
+def test_wraparound(tmpdir):
+    path = str(tmpdir.join('ring.trace'))
+    with TraceWriter(path, size=1088) as writer:
+        for i in range(1000):
+            writer.record(float(i), 'input_get I{0}'.format(i).encode('utf-8'), str(i).encode('utf-8'), i)
+            records = read_trace(path)
+            assert len(writer) == len(records)
+            assert float(i) == records[-1][0]
+            assert [float(t) for t in range(i - len(records) + 1, i + 1)] == [r[0] for r in records]
+        assert 1000 == writer.total
+        assert len(writer) < 1000
+    assert ('input_get I999', '999') == read_trace(path)[-1][1:3]
+
+
+def test_no_reply_and_dropped(tmpdir):
+    path = str(tmpdir.join('x.trace'))
+    with TraceWriter(path, size=2048) as writer:
+        writer.record(1.0, b'led_set 1', None, 10)
+        writer.record(2.0, b'x' * 5000, b'', 10)
+        assert 1 == writer.dropped
+    assert [(1.0, 'led_set 1', None, 1e-8)] == read_trace(path)
+    assert list(format_trace(read_trace(path)))[0].endswith('led_set 1 -> (no reply)')
+
+
+def test_timeout(tmpdir):
+    path = str(tmpdir.join('timeout.trace'))
+    with ftdu.BaseFtDuino(transport=LoopbackTransport(lambda request: None)) as ftd, \
+            TraceWriter(path, ftd=ftd):
+        assert ftd.comm('led_set 1') is None
+    assert [('led_set 1', None)] == [(r[1], r[2]) for r in read_trace(path)]
+
+
+def test_invalid(tmpdir):
+    with pytest.raises(ValueError):
+        TraceWriter(str(tmpdir.join('small.trace')), size=100)
+    path = str(tmpdir.join('other'))
+    with open(path, 'wb') as f:
+        f.write(b'\0' * 100)
+    with pytest.raises(ValueError):
+        read_trace(path)
+
+
+def test_cli(emu_ftd, tmpdir, capsys):
+    _, ftd = emu_ftd
+    path = str(tmpdir.join('session.trace'))
+    with TraceWriter(path, ftd=ftd):
+        ftd.i1
+    main(['trace', path])
+    assert 'input_get I1 -> 7' in capsys.readouterr().out
+    json_path = str(tmpdir.join('session.json'))
+    main(['trace', path, '--json', json_path])
+    assert 'input_get I1' == load_trace(json_path)[0][1]
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the transports and the emulator.
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import pytest
+import ftdu
+from ftdu.emulator import Emulator, ACK, FAIL
+from ftdu.transport import LoopbackTransport, FdTransport, SocketTransport
+
+
+def _serve_socketpair(emu):
+    a, b = socket.socketpair()
+    thread = threading.Thread(target=emu.serve, args=(b,))
+    thread.daemon = True
+    thread.start()
+    return a
+
+
+def _serve_tcp(emu):
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+
+    def run():
+        conn, _ = server.accept()
+        server.close()
+        emu.serve(conn)
+        conn.close()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return server.getsockname()
+
+
+def _loopback(emu):
+    return LoopbackTransport(emu.handle)
+
+
+def _fd(emu):
+    sock = _serve_socketpair(emu)
+    return FdTransport(sock.detach(), timeout=1)
+
+
+def _tcp(emu):
+    return SocketTransport(_serve_tcp(emu), timeout=1)
+
+
+@pytest.fixture(params=[_loopback, _fd, _tcp], ids=['loopback', 'fd', 'tcp'])
+def emu_ftd(request):
+    emu = Emulator()
+    with ftdu.FtDuino(transport=request.param(emu)) as ftd:
+        yield emu, ftd
+
+
+def test_inputs(emu_ftd):
+    emu, ftd = emu_ftd
+    assert 0 == ftd.i1
+    emu.inputs['I2'] = 4711
+    assert 4711 == ftd.i2
+    ftd.i3_mode = ftdu.INPUT_MODE_VOLTAGE
+    assert 'voltage' == emu.input_modes['I3']
+
+
+def test_outputs(emu_ftd):
+    emu, ftd = emu_ftd
+    ftd.o1 = True
+    ftd.o2 = ftdu.LOW, 100
+    assert (ftdu.HIGH, ftdu.MAX) == emu.outputs['O1']
+    assert (ftdu.LOW, 100) == emu.outputs['O2']
+
+
+def test_counters(emu_ftd):
+    emu, ftd = emu_ftd
+    emu.counters['C1'] = 3
+    assert 3 == ftd.c1
+    ftd.c1_clear()
+    assert 0 == ftd.c1
+    ftd.c2_mode = ftdu.COUNTER_EDGE_ANY
+    assert 'any' == emu.counter_modes['C2']
+    assert not ftd.c1_state
+
+
+def test_motors(emu_ftd):
+    emu, ftd = emu_ftd
+    ftd.m1_left()
+    assert ('left', ftdu.MAX) == emu.motors['M1']
+    assert not ftd.m1_counter_active
+    ftd.m2_right(steps=10)
+    assert ftd.m2_counter_active
+    ftd.m2_counter_brake = True
+    assert emu.motor_brakes['M2']
+
+
+def test_misc(emu_ftd):
+    emu, ftd = emu_ftd
+    assert -1 == ftd.ultrasonic
+    ftd.ultrasonic_enable(True)
+    emu.ultrasonic = 23
+    assert 23 == ftd.ultrasonic
+    ftd.led = True
+    assert emu.led
+    assert emu.version == ftd.ftduino_direct_get_version()
+    ftd.ftduino_id_set('Pitje Puck')
+    assert 'Pitje Puck' == ftd.ftduino_id_get()
+
+
+def test_invalid_command(emu_ftd):
+    emu, ftd = emu_ftd
+    assert FAIL == ftd.comm('unknown')
+    assert FAIL == ftd.comm('input_get I9')
+    with pytest.raises(ValueError):
+        ftd.input_get('I9')
+    assert ACK == ftd.comm('led_set 1')
+
+
+def test_readline_timeout():
+    a, b = socket.socketpair()
+    transport = FdTransport(a.detach(), timeout=0.01)
+    b.sendall(b'partial')
+    assert b'partial' == transport.readline()
+    assert b'' == transport.readline()
+    b.sendall(b'one\r\ntwo\r\n')
+    assert b'one\r\n' == transport.readline()
+    transport.flush()
+    assert b'' == transport.readline()
+    transport.close()
+    b.close()
+
+
+def test_loopback_partial_write():
+    emu = Emulator()
+    transport = LoopbackTransport(emu.handle)
+    transport.write(b'input_')
+    assert b'' == transport.readline()
+    transport.write(b'get I1\ninput_get I2\n')
+    assert b'0\r\n' == transport.readline()
+    assert b'0\r\n' == transport.readline()
+    assert b'' == transport.readline()
+
+
+def test_serial_not_imported():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = 'import sys, ftdu, ftdu.transport; sys.exit("serial" in sys.modules)'
+    assert 0 == subprocess.call([sys.executable, '-c', code], cwd=root)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2019 - 2021 -- Lars Heuer
+# All rights reserved.
+#
+# License: BSD License
+#
+"""\
+Tests against the watchdog (using the emulator).
+"""
+import time
+import pytest
+import ftdu
+from ftdu.emulator import Emulator
+from ftdu.transport import LoopbackTransport
+from ftdu.watchdog import Watchdog, STALL_COMM, STALL_TICK
+
+
+def _handler(emu, slow_cmd, delay):
+    def handle(request):
+        if request.startswith(slow_cmd):
+            time.sleep(delay)
+        return emu.handle(request)
+    return handle
+
+
+@pytest.fixture
+def emu_ftd():
+    emu = Emulator()
+    with ftdu.FtDuino(transport=LoopbackTransport(_handler(emu, 'led_set', 0.3))) as ftd:
+        yield emu, ftd
+
+
+def test_shadow_state(emu_ftd):
+    emu, ftd = emu_ftd
+    with Watchdog(ftd) as watchdog:
+        ftd.m1_left()
+        ftd.m2_right()
+        ftd.o3 = True
+        ftd.o4 = True
+        ftd.m2_brake()
+        ftd.o4 = False
+        ftd.write_outputs([ftdu.HIGH], ports=('O5',))
+        assert (('M1',), ('O3', 'O5')) == watchdog.active
+        assert ['motor_set M1 brake 512', 'output_set O3 0 0', 'output_set O5 0 0'] == watchdog.fail_safe()
+    assert ('brake', ftdu.MAX) == emu.motors['M1']
+    assert (0, 0) == emu.outputs['O3']
+    assert (0, 0) == emu.outputs['O5']
+    assert isinstance(ftd._transport, LoopbackTransport)
+
+
+def test_comm_stall(emu_ftd):
+    emu, ftd = emu_ftd
+    stalls = []
+    with Watchdog(ftd, comm_timeout=0.05, on_stall=stalls.append) as watchdog:
+        ftd.m1_left()
+        assert ('left', ftdu.MAX) == emu.motors['M1']
+        ftd.led = True  # Takes 0.3 seconds
+        assert 0 == ftd.i1
+        time.sleep(0.05)
+    assert ('brake', ftdu.MAX) == emu.motors['M1']
+    assert 1 == len(watchdog.stalls)
+    stall = watchdog.stalls[0]
+    assert stalls == [stall]
+    assert STALL_COMM == stall['kind']
+    assert 1 == stall['pending']
+    assert ['motor_set M1 brake 512'] == stall['commands']
+    assert stall['recovered'] is not None
+    assert stall['detected'] - stall['since'] >= 0.05
+
+
+def test_tick_stall(emu_ftd):
+    emu, ftd = emu_ftd
+    with Watchdog(ftd, comm_timeout=None, tick_timeout=0.05) as watchdog:
+        ftd.o1 = True
+        time.sleep(0.1)  # Not armed yet
+        assert not watchdog.stalls
+        for _ in range(5):
+            watchdog.tick()
+            time.sleep(0.01)
+        time.sleep(0.15)
+        watchdog.tick()
+        time.sleep(0.03)
+    assert (0, 0) == emu.outputs['O1']
+    assert 1 == len(watchdog.stalls)
+    assert STALL_TICK == watchdog.stalls[0]['kind']
+    assert watchdog.stalls[0]['recovered'] is not None
+
+
+def test_all_ports(emu_ftd):
+    emu, ftd = emu_ftd
+    watchdog = Watchdog(ftd, all_ports=True)
+    assert 12 == len(watchdog.fail_safe())
+    assert ('brake', ftdu.MAX) == emu.motors['M4']
+
+
+def test_check(emu_ftd):
+    emu, ftd = emu_ftd
+    watchdog = Watchdog(ftd, tick_timeout=1)
+    watchdog.tick()
+    now = time.time()
+    assert not watchdog.check(now)
+    assert watchdog.check(now + 2)
+    assert not watchdog.check(now + 3)  # Same stall
+    assert 1 == len(watchdog.stalls)
+    assert watchdog.stalls[0]['overdue'] == pytest.approx(1, abs=0.1)
+
+
+def test_stop_keeps_later_wrappers(emu_ftd, tmpdir):
+    from ftdu.trace import TraceWriter
+    emu, ftd = emu_ftd
+    watchdog = Watchdog(ftd)
+    watchdog.start()
+    writer = TraceWriter(str(tmpdir.join('session.trace')), size=4096, ftd=ftd)
+    watchdog.stop()
+    assert ftd._transport is writer._transport
+    assert isinstance(writer._transport.transport, LoopbackTransport)
+    ftd.o1 = True
+    assert 1 == len(writer)
+    writer.close()
+    assert isinstance(ftd._transport, LoopbackTransport)
+
+
+def test_fail_safe_replies(emu_ftd):
+    emu, ftd = emu_ftd
+    with Watchdog(ftd) as watchdog:
+        ftd.o1 = True
+        ftd.m1_left()
+        watchdog.fail_safe()
+        assert not ftd._transport.transport._replies  # Replies were read
+        emu.inputs['I1'] = 7
+        assert 7 == ftd.i1
+
+
+def test_invalid(emu_ftd):
+    emu, ftd = emu_ftd
+    with pytest.raises(ValueError):
+        Watchdog(ftd, comm_timeout=None)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])